@@ -1,65 +1,369 @@
+import base64
+import itertools
+import os
+import threading
+import time
 import flet as ft
 from flet import Audio
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from app.models import KeySetting
+from app.core.manifest import Resolution
+from app.core.metrics import LatencyMetrics
+from app.core.shared import SharedAssets
+from app.core.theory import KEYS, MODES, chord_to_asset_path
+from app.core.update_scheduler import UpdateScheduler
+
+DEFAULT_SAMPLE = "audio/C_Ionian_I_maj_drop2_root__oct4.wav"
+
+# Overrides the detected client output sample rate, e.g. DIATONIC_OUTPUT_RATE=48000
+OUTPUT_RATE_ENV = "DIATONIC_OUTPUT_RATE"
+
+def detect_output_rate(page: ft.Page) -> int:
+    """Best guess at the client's output sample rate
+
+    Flet can't query the audio device, so DIATONIC_OUTPUT_RATE wins when set;
+    otherwise iOS and Android clients, whose audio sessions run at 48 kHz,
+    get 48000 and everything else the spec's 44100.
+    """
+    configured = os.environ.get(OUTPUT_RATE_ENV)
+    if configured:
+        try:
+            return int(configured)
+        except ValueError:
+            print(f"Warning: ignoring {OUTPUT_RATE_ENV}={configured!r}")
+    platform = getattr(page, "platform", None)
+    if platform in (ft.PagePlatform.IOS, ft.PagePlatform.ANDROID):
+        return 48000
+    return 44100
+
+@dataclass(frozen=True)
+class Source:
+    """What a voice plays: an asset URL the client resolves, or an inline base64 WAV
+
+    Bank files on disk go by URL so a tap sends a short path; only rendered
+    chords and generated clicks travel inline.
+    """
+    src: str = ""
+    src_base64: str = ""
+
+    def __len__(self) -> int:
+        """Characters held, counted against the sample cache's byte budget"""
+        return len(self.src) + len(self.src_base64)
+
+@dataclass
+class Voice:
+    """A sounding sample bound to a pooled Audio control"""
+    voice_id: str
+    audio: Audio
+    path: str
+    gain: float
+    # perf_counter() at play_sample, cleared once the client reports playing
+    started_at: Optional[float] = None
+    # Set on a stolen control until the client plays the new source; events
+    # before that belong to the sample it was taken from
+    awaiting_play: bool = False
 
 class AudioEngine:
-    """Manages audio playback with flet Audio control"""
-    
-    def __init__(self, page: ft.Page):
+    """Manages audio playback with flet Audio control
+
+    Sample data (bank, manifest, caches, renderer) lives in a SharedAssets,
+    which several engines may share; the engine itself only holds one
+    session's voices.
+    """
+
+    def __init__(self, page: ft.Page, cache_bytes: int = 32 * 1024 * 1024,
+                 assets_dir: str = "assets", max_voices: int = 8,
+                 steal_policy: str = "oldest", render_missing: bool = True,
+                 render_cache_dir: Optional[str] = None,
+                 metrics: Optional[LatencyMetrics] = None,
+                 scheduler: Optional[UpdateScheduler] = None,
+                 output_rate: Optional[int] = None,
+                 shared: Optional[SharedAssets] = None):
         self.page = page
-        self.audio_controls: Dict[str, Audio] = {}
-        self.active_voices: Dict[str, str] = {}
-        self.max_voices = 8
-        
+        self.metrics = metrics or LatencyMetrics(enabled=False)
+        self.scheduler = scheduler or UpdateScheduler(page, metrics=self.metrics)
+        # Insertion-ordered, so the first entry is always the oldest voice
+        self.active_voices: "OrderedDict[str, Voice]" = OrderedDict()
+        self.max_voices = max_voices
+        self.steal_policy = steal_policy
+        self._free_controls: List[Audio] = []
+        self._voice_ids = itertools.count()
+        # Taps run on the event loop, audio state callbacks on flet's worker threads
+        self._voice_lock = threading.RLock()
+        self.controls_created = 0
+        self.allocations = 0
+        self.steals = 0
+        if shared is None:
+            shared = SharedAssets(assets_dir, output_rate or detect_output_rate(page), cache_bytes,
+                                  render_missing, render_cache_dir)
+        self.shared = shared
+        self.assets_dir = shared.assets_dir
+        self.output_rate = shared.output_rate
+        self.bank_format = shared.bank_format
+        self.render_format = shared.render_format
+        self.sample_cache = shared.sample_cache
+        self.bank = shared.bank
+        self.manifest = shared.manifest
+        self.renderer = shared.renderer
+        self._warm_generation = 0
+        self._warm_lock = threading.Lock()
+
+    def _read(self, path: str) -> Optional[str]:
+        """Read a sample from the packed bank or disk as a base64 payload"""
+        name = Path(path).name
+        if self.bank is not None and name in self.bank:
+            raw = self.bank.wav_bytes(name)
+        else:
+            try:
+                raw = (self.assets_dir / path).read_bytes()
+            except FileNotFoundError:
+                return None
+
+        return base64.b64encode(raw).decode("ascii")
+
+    def _load(self, path: str, record: bool = True) -> Optional[Source]:
+        """Return the source of a sample, reading or rendering it on a cache miss
+
+        Bank samples are cached by sample id, so every key/mode/degree alias
+        of a note set shares one entry: the URL of a file on disk, or the
+        payload of a sample only in the packed bank. Samples sounding exactly as requested come from the
+        bank; when it only has an approximation, rendering wins if enabled.
+        """
+        resolution = self.manifest.resolve(path)
+        if resolution is not None and (resolution.sounds_exact or self.renderer is None):
+            return self._load_resolved(resolution, record)
+        if self.renderer is not None:
+            data = self.renderer.render(path)
+            if data is not None:
+                return Source(src_base64=data)
+        if resolution is not None:
+            return self._load_resolved(resolution, record)
+        return None
+
+    def _load_resolved(self, resolution: Resolution, record: bool) -> Optional[Source]:
+        """Cached source of a resolved bank sample, built on a miss"""
+        source = self.sample_cache.get(resolution.sample_id, record=record)
+        if source is not None:
+            return source
+        if self.manifest.on_disk:
+            source = Source(src=resolution.path)
+        else:
+            data = self._read(resolution.path)
+            if data is None:
+                return None
+            source = Source(src_base64=data)
+        self.sample_cache.put(resolution.sample_id, source)
+        return source
+
+    def _preload_paths(self, key_setting: KeySetting) -> List[str]:
+        """Asset paths of the 7 degrees for the active tension/voicing"""
+        return [chord_to_asset_path(key_setting, degree_idx) for degree_idx in range(7)]
+
     def preload_assets(self, key_setting: KeySetting):
-        """Preload audio samples for current key/mode (stub for MVP)"""
-        pass
-    
+        """Preload audio samples for current key/mode into the sample and render caches"""
+        for path in self._preload_paths(key_setting):
+            self._load(path, record=False)
+
+    def neighbour_settings(self, key_setting: KeySetting) -> List[KeySetting]:
+        """Key settings a user is likely to switch to next
+
+        Neighbours are the keys a semitone and a fifth away plus the adjacent
+        modes and the parallel Ionian/Aeolian mode.
+        """
+        key_idx = KEYS.index(key_setting.tonic)
+        mode_idx = MODES.index(key_setting.mode)
+
+        keys = [KEYS[(key_idx + step) % 12] for step in (7, 5, 1, 11)]
+        modes = [MODES[(mode_idx + step) % 7] for step in (1, 6)]
+        parallel = "Aeolian" if key_setting.mode == "Ionian" else "Ionian"
+        if parallel not in modes and parallel != key_setting.mode:
+            modes.insert(0, parallel)
+
+        neighbours = [replace(key_setting, mode=mode) for mode in modes]
+        neighbours += [replace(key_setting, tonic=key) for key in keys]
+        return neighbours
+
+    def warm(self, key_setting: KeySetting):
+        """Preload the current and neighbouring key settings in the background
+
+        A newer call supersedes any warm-up still in progress.
+        """
+        snapshot = replace(key_setting, tensions=list(key_setting.tensions))
+        with self._warm_lock:
+            self._warm_generation += 1
+            generation = self._warm_generation
+        self.shared.warmer.submit(self._warm_worker, snapshot, generation)
+
+    def _warm_worker(self, key_setting: KeySetting, generation: int):
+        """Background warm-up task"""
+        for setting in [key_setting] + self.neighbour_settings(key_setting):
+            if generation != self._warm_generation:
+                return
+            self.preload_assets(setting)
+
     def play_sample(self, path: str, sustain: bool = False, gain: float = 1.0) -> str:
         """Play audio sample and return voice ID"""
-        if not Path(f"assets/{path}").exists():
-            print(f"Warning: Audio file not found: assets/{path}")
-            path = "audio/C_Ionian_I_maj_drop2_root__oct4.wav"
-            if not Path(f"assets/{path}").exists():
+        started_at = time.perf_counter()
+        with self.metrics.phase("resolve"):
+            source = self._load(path)
+        if source is None:
+            print(f"Warning: Audio sample unavailable: assets/{path}")
+            path = DEFAULT_SAMPLE
+            source = self._load(path)
+            if source is None and (self.assets_dir / path).is_file():
+                source = Source(src=path)
+            if source is None:
                 print("Error: No audio samples available")
                 return "error"
-        
-        voice_id = f"voice_{len(self.audio_controls)}"
-        audio = Audio(
-            src=path,
-            autoplay=True,
-            volume=gain,
-            on_state_changed=lambda e: self._on_audio_complete(voice_id, e),
-        )
-        
-        self.page.overlay.append(audio)
-        self.audio_controls[voice_id] = audio
-        self.active_voices[voice_id] = path
-        
-        if len(self.active_voices) > self.max_voices:
-            oldest_voice = list(self.active_voices.keys())[0]
-            self.stop_voice(oldest_voice)
-        
-        self.page.update()
+        return self._start_voice(path, source, gain, started_at)
+
+    def play_data(self, name: str, data: str, gain: float = 1.0) -> str:
+        """Play an already encoded base64 WAV (e.g. a metronome click) and return voice ID"""
+        return self._start_voice(name, Source(src_base64=data), gain, time.perf_counter())
+
+    def prefetch(self, path: str) -> bool:
+        """Make sure a sample is loaded so a later play_sample doesn't read or render"""
+        return self._load(path, record=False) is not None
+
+    def _start_voice(self, path: str, source: Source, gain: float, started_at: float) -> str:
+        """Bind a source to a pooled control and send it to the client"""
+        with self._voice_lock:
+            voice_id = f"voice_{next(self._voice_ids)}"
+            with self.metrics.phase("voice_alloc"):
+                voice = self._allocate_voice(voice_id, path, gain)
+            voice.started_at = started_at
+            audio = voice.audio
+            # An unchanged source does not reload on the client, so autoplay won't fire
+            restart = audio.src == source.src and audio.src_base64 == source.src_base64
+
+            audio.data = voice_id
+            # The client prefers src_base64, so a URL source clears it
+            audio.src = source.src
+            audio.src_base64 = source.src_base64
+            audio.volume = gain
+            if audio not in self.page.overlay:
+                self.page.overlay.append(audio)
+
+            if restart:
+                # play() needs the control on the client, so send it after the update
+                self.scheduler.after_flush(lambda: self._invoke(audio, "play"))
+        self.scheduler.request()
         return voice_id
-    
-    def _on_audio_complete(self, voice_id: str, event):
-        """Handle audio completion"""
-        if event.data == "completed":
-            if voice_id in self.active_voices:
-                del self.active_voices[voice_id]
-    
+
+    def _allocate_voice(self, voice_id: str, path: str, gain: float) -> Voice:
+        """Take a control from the pool, stealing a voice when all are busy"""
+        self.allocations += 1
+        stolen = None
+
+        if len(self.active_voices) >= self.max_voices:
+            victim = self._pick_victim()
+            stolen = self.active_voices.pop(victim)
+            self._invoke(stolen.audio, "pause")
+            audio = stolen.audio
+            self.steals += 1
+        elif self._free_controls:
+            audio = self._free_controls.pop()
+        else:
+            with self.metrics.phase("control_create"):
+                audio = Audio(autoplay=True, on_state_changed=self._on_state_changed)
+            self.controls_created += 1
+
+        voice = Voice(voice_id=voice_id, audio=audio, path=path, gain=gain,
+                      awaiting_play=stolen is not None)
+        self.active_voices[voice_id] = voice
+        return voice
+
+    @staticmethod
+    def _invoke(audio: Audio, method: str):
+        """Call play/pause on a control, skipping controls not yet sent to the client
+
+        A control still waiting for its first page update isn't sounding yet.
+        """
+        if audio.page is not None:
+            getattr(audio, method)()
+
+    def _pick_victim(self) -> str:
+        """Choose the voice to steal according to steal_policy"""
+        if self.steal_policy == "quietest":
+            # Bounded by max_voices; ties resolve to the oldest voice
+            return min(self.active_voices.values(), key=lambda v: v.gain).voice_id
+        return next(iter(self.active_voices))
+
+    def _release_voice(self, voice_id: str):
+        """Return a voice's control to the pool and detach it from the overlay
+
+        The overlay removal reaches the client with the next page update.
+        """
+        with self._voice_lock:
+            voice = self.active_voices.pop(voice_id, None)
+            if voice is None:
+                return
+            if voice.audio in self.page.overlay:
+                self.page.overlay.remove(voice.audio)
+            self._free_controls.append(voice.audio)
+
+    def voice_stats(self) -> Dict[str, int]:
+        """Voice pool counters"""
+        return {
+            "active": len(self.active_voices),
+            "free": len(self._free_controls),
+            "controls_created": self.controls_created,
+            "allocations": self.allocations,
+            "steals": self.steals,
+            "overlay_size": len(self.page.overlay),
+        }
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Sample cache hit/miss counters and memory usage"""
+        return self.sample_cache.stats()
+
+    def bank_coverage(self) -> Dict:
+        """Sample bank coverage and resolver statistics"""
+        return self.manifest.coverage()
+
+    def _on_state_changed(self, event):
+        """Handle audio completion and record time to first sound
+
+        A stolen control may still report "completed" for the sample it was
+        taken from after data names its new voice; such events are ignored.
+        """
+        with self.metrics.phase("state_callback"):
+            with self._voice_lock:
+                voice = self.active_voices.get(event.control.data)
+                if voice is None:
+                    return
+                if event.data == "playing":
+                    voice.awaiting_play = False
+                    if voice.started_at is not None:
+                        self.metrics.record("tap_to_playing",
+                                            (time.perf_counter() - voice.started_at) * 1000)
+                        voice.started_at = None
+                elif event.data == "completed" and not voice.awaiting_play:
+                    self._release_voice(voice.voice_id)
+
     def stop_voice(self, voice_id: str):
         """Stop specific audio voice"""
-        if voice_id in self.audio_controls:
-            audio = self.audio_controls[voice_id]
-            audio.pause()
-            if voice_id in self.active_voices:
-                del self.active_voices[voice_id]
-    
+        with self._voice_lock:
+            voice = self.active_voices.get(voice_id)
+            if voice is not None:
+                self._invoke(voice.audio, "pause")
+                self._release_voice(voice_id)
+
     def stop_all(self):
         """Stop all playing voices"""
-        for voice_id in list(self.active_voices.keys()):
+        for voice_id in list(self.active_voices):
             self.stop_voice(voice_id)
+
+    def close(self):
+        """Silence this session's voices and drop its pending warm-ups and control pool
+
+        The shared assets stay loaded for other sessions.
+        """
+        with self._warm_lock:
+            self._warm_generation += 1
+        self.stop_all()
+        with self._voice_lock:
+            self._free_controls.clear()
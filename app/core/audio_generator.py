@@ -1,113 +1,433 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
 import numpy as np
 from scipy.io import wavfile
-from pathlib import Path
+
+from app.core.bank import (
+    BANK_NAME, DEFAULT_FORMAT, BankFormat, read_wav, wav_file_bytes, write_packed_bank
+)
+from app.core.manifest import MANIFEST_NAME
+from app.core.synth import notes_matrix, render_chords, to_pcm, to_pcm16
+
+# Bump whenever the synthesis itself changes so every manifest entry is stale
+RENDER_VERSION = 2
+
+# Content-addressed samples live in this subdirectory of the bank
+SAMPLES_DIR = "samples"
+
+# sample_format.normalize_peak_db; converted samples are renormalized to it
+NORMALIZE_PEAK_DB = -1.0
 
 def generate_chord_sample(notes_midi: list, duration_sec: float = 1.0, 
                          sample_rate: int = 44100) -> np.ndarray:
-    """Generate a simple chord audio sample using sine waves"""
-    t = np.linspace(0, duration_sec, int(sample_rate * duration_sec))
-    
-    audio = np.zeros_like(t)
-    for midi_note in notes_midi:
-        freq = 440.0 * (2.0 ** ((midi_note - 69) / 12.0))
-        audio += np.sin(2 * np.pi * freq * t)
-    
-    audio = audio / len(notes_midi)
-    
-    fade_samples = int(0.01 * sample_rate)
-    fade_in = np.linspace(0, 1, fade_samples)
-    fade_out = np.linspace(1, 0, fade_samples)
-    audio[:fade_samples] *= fade_in
-    audio[-fade_samples:] *= fade_out
-    
-    audio_16bit = (audio * 32767).astype(np.int16)
-    stereo = np.stack([audio_16bit, audio_16bit], axis=1)
-    
-    return stereo
+    """Generate a single chord as 16-bit stereo via the batch synthesizer"""
+    audio = render_chords(notes_matrix([notes_midi]), duration_sec=duration_sec,
+                          sample_rate=sample_rate)
+    return to_pcm16(audio[0])
 
 def generate_dummy_samples():
     """Generate a few dummy samples for testing"""
+    from app.core.theory import chord_to_asset_path, degree_to_chord
+    from app.models import KeySetting
+
     Path("assets/audio").mkdir(parents=True, exist_ok=True)
     
+    key_setting = KeySetting(tonic="C", mode="Ionian")
     test_chords = [
-        ("C_Ionian_I_maj_drop2_root__oct4.wav", [60, 64, 67]),
-        ("C_Ionian_V_maj_drop2_root__oct4.wav", [67, 71, 74]),
-        ("C_Ionian_vi_min_drop2_root__oct4.wav", [69, 72, 76]),
-        ("C_Ionian_IV_maj_drop2_root__oct4.wav", [65, 69, 72]),
+        (chord_to_asset_path(key_setting, degree_idx), degree_to_chord(key_setting, degree_idx)["notes"])
+        for degree_idx in (0, 4, 5, 3)
     ]
     
-    for filename, notes in test_chords:
-        audio = generate_chord_sample(notes, duration_sec=1.5)
-        wavfile.write(f"assets/audio/{filename}", 44100, audio)
+    manifest = load_manifest(Path("assets/audio"))
+    audio = render_chords(notes_matrix([notes for _, notes in test_chords]), duration_sec=1.5)
+    for (path, notes), buffer in zip(test_chords, to_pcm16(audio)):
+        filename = Path(path).name
+        wavfile.write(f"assets/{path}", 44100, buffer)
+        digest = sample_id({"notes": notes, "duration_sec": 1.5, "sample_rate": 44100})
+        manifest["samples"][digest] = {"file": filename, "notes": sorted(notes),
+                                       "duration_sec": 1.5, "sample_rate": 44100}
+        manifest["aliases"][filename] = digest
         print(f"Generated: {filename}")
+    save_manifest(Path("assets/audio"), manifest)
 
-def generate_all_chord_samples():
-    """Generate all chord samples for production use"""
+def build_chord_jobs(only: Optional[Iterable[Tuple[str, Optional[str]]]] = None,
+                     duration_sec: float = 1.5,
+                     sample_rate: int = 44100, bit_depth: int = 16,
+                     channels: int = 2) -> List[Dict]:
+    """List render jobs for the production bank, optionally limited to (key, mode) pairs"""
     from app.core.theory import (
-        KEYS, MODES, MODE_INTERVALS, MODE_QUALITIES,
-        DEGREE_NAMES, note_to_midi
+        KEYS, MODES, DEGREE_NAMES, VOICINGS, INVERSIONS,
+        chord_notes, chord_quality, tension_mask
     )
 
-    output_dir = Path("assets/audio")
-    output_dir.mkdir(parents=True, exist_ok=True)
+    selected = list(only) if only else None
 
     voicings = ["drop2"]
     inversions = ["root"]
     tension_sets = [[], [7]]
     octaves = [3, 4, 5]
 
-    total_count = 0
+    jobs = []
 
-    for key in KEYS:
-        for mode in MODES:
-            intervals = MODE_INTERVALS[mode]
-            qualities = MODE_QUALITIES[mode]
+    for key_idx, key in enumerate(KEYS):
+        for mode_idx, mode in enumerate(MODES):
+            if selected is not None and not any(
+                    k == key and (m is None or m == mode) for k, m in selected):
+                continue
 
             for degree_idx in range(7):
                 degree_name = DEGREE_NAMES[degree_idx]
-                base_quality = qualities[degree_idx]
 
                 for octave in octaves:
-                    tonic_midi = note_to_midi(key, octave)
-                    root_midi = tonic_midi + intervals[degree_idx]
-
                     for voicing in voicings:
                         for inversion in inversions:
                             for tensions in tension_sets:
-                                quality = base_quality
-                                third_interval = 3 if base_quality in ["min", "dim"] else 4
-                                fifth_interval = 6 if base_quality == "dim" else 7
-
-                                notes = [root_midi, root_midi + third_interval, root_midi + fifth_interval]
-
-                                if 7 in tensions:
-                                    if base_quality == "maj":
-                                        seventh_interval = 11
-                                    elif base_quality == "min":
-                                        seventh_interval = 10
-                                    elif base_quality == "dim":
-                                        seventh_interval = 9
-                                    notes.append(root_midi + seventh_interval)
-                                    quality += "7"
+                                quality = chord_quality(mode, degree_idx, tensions)
+                                notes = chord_notes(key_idx, mode_idx, degree_idx,
+                                                    tension_mask(tensions),
+                                                    VOICINGS.index(voicing),
+                                                    INVERSIONS.index(inversion), octave)
 
                                 tensions_str = "-".join(map(str, tensions)) if tensions else ""
 
                                 filename = (f"{key}_{mode}_{degree_name}_{quality}_"
                                            f"{voicing}_{inversion}_{tensions_str}_oct{octave}.wav")
 
-                                audio = generate_chord_sample(notes, duration_sec=1.5)
-                                filepath = output_dir / filename
-                                wavfile.write(filepath, 44100, audio)
+                                jobs.append({
+                                    "filename": filename,
+                                    "notes": notes,
+                                    "duration_sec": duration_sec,
+                                    "sample_rate": sample_rate,
+                                    "bit_depth": bit_depth,
+                                    "channels": channels,
+                                })
 
-                                total_count += 1
-                                if total_count % 50 == 0:
-                                    print(f"Generated {total_count} samples...")
+    return jobs
 
-    print(f"\nCompleted: Generated {total_count} chord samples in total")
+def sample_id(job: Dict) -> str:
+    """Content address of a job: its sorted note set plus every render parameter
 
-if __name__ == "__main__":
-    import sys
-    if len(sys.argv) > 1 and sys.argv[1] == "--all":
-        generate_all_chord_samples()
+    Jobs that sound the same notes (C Ionian I, C Lydian I, F Ionian V...)
+    share one id and therefore one rendered sample. Bit depth and channel
+    count only take part when they differ from the spec's format, so ids of
+    existing banks stay valid.
+    """
+    params = {
+        "notes": sorted(job["notes"]),
+        "duration_sec": job["duration_sec"],
+        "sample_rate": job["sample_rate"],
+        "render_version": RENDER_VERSION,
+    }
+    for field in ("bit_depth", "channels"):
+        if job.get(field, getattr(DEFAULT_FORMAT, field)) != getattr(DEFAULT_FORMAT, field):
+            params[field] = job[field]
+    payload = json.dumps(params, sort_keys=True).encode()
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+def load_manifest(output_dir: Path) -> Dict[str, Dict]:
+    """Load the samples (id -> params) and aliases (filename -> id) of a bank directory
+
+    Manifests from before content addressing have neither and are treated as
+    empty, so everything is rendered again under the new layout.
+    """
+    manifest_path = Path(output_dir) / MANIFEST_NAME
+    manifest: Dict[str, Dict] = {"samples": {}, "aliases": {}}
+    if not manifest_path.exists():
+        return manifest
+
+    with open(manifest_path, 'r') as f:
+        data = json.load(f)
+    manifest["samples"].update(data.get("samples", {}))
+    manifest["aliases"].update(data.get("aliases", {}))
+    if "format" in data:
+        manifest["format"] = data["format"]
+    return manifest
+
+def save_manifest(output_dir: Path, manifest: Dict[str, Dict]):
+    """Atomically write the bank manifest"""
+    manifest_path = Path(output_dir) / MANIFEST_NAME
+    tmp_path = manifest_path.with_suffix(".json.tmp")
+
+    data = {"render_version": RENDER_VERSION, "samples": manifest["samples"],
+            "aliases": manifest["aliases"]}
+    if "format" in manifest:
+        data["format"] = manifest["format"]
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def dedup_ratio(manifest: Dict[str, Dict]) -> float:
+    """Aliases per unique rendered sample"""
+    samples = len(manifest["samples"])
+    return len(manifest["aliases"]) / samples if samples else 0.0
+
+def _render_jobs(jobs: List[Dict], output_dir: str) -> List[str]:
+    """Render a batch of unique samples in one vectorized pass (runs in a worker process)
+
+    Jobs are grouped by duration and output format, which fix the buffer shape.
+    """
+    groups: Dict[Tuple[float, BankFormat], List[Dict]] = {}
+    for job in jobs:
+        fmt = BankFormat(job["sample_rate"], job.get("bit_depth", 16), job.get("channels", 2))
+        groups.setdefault((job["duration_sec"], fmt), []).append(job)
+
+    for (duration_sec, fmt), group in groups.items():
+        audio = render_chords(notes_matrix([job["notes"] for job in group]),
+                              duration_sec=duration_sec, sample_rate=fmt.sample_rate)
+        pcm = to_pcm(audio, fmt.bit_depth, fmt.channels)
+        for job, buffer in zip(group, pcm):
+            with open(Path(output_dir) / job["file"], 'wb') as f:
+                f.write(wav_file_bytes(buffer, fmt))
+
+    return [job["id"] for job in jobs]
+
+def generate_all_chord_samples(jobs: Optional[int] = None,
+                               only: Optional[Iterable[Tuple[str, Optional[str]]]] = None,
+                               output_dir: Optional[str] = None,
+                               force: bool = False,
+                               fmt: BankFormat = DEFAULT_FORMAT) -> int:
+    """Generate all chord samples for production use
+
+    Samples are content-addressed: every key/mode/degree filename becomes an
+    alias of the id of its sounding note set, and each id is rendered once to
+    samples/<id>.wav. Work is spread over a process pool and ids already in
+    the manifest with their file present are skipped. Samples no longer
+    referenced by any alias are removed. Returns the number of rendered files.
+
+    Samples are rendered natively in fmt; the bank goes to assets/<fmt.subdir>
+    unless output_dir is given.
+    """
+    output_path = Path(output_dir or f"assets/{fmt.subdir}")
+    (output_path / SAMPLES_DIR).mkdir(parents=True, exist_ok=True)
+
+    all_jobs = build_chord_jobs(only, sample_rate=fmt.sample_rate, bit_depth=fmt.bit_depth,
+                                channels=fmt.channels)
+    manifest = load_manifest(output_path)
+    if BankFormat.from_dict(manifest.get("format")) != fmt:
+        # Another format's samples can't be reused; they become unreferenced below
+        manifest["aliases"] = {}
+    manifest["format"] = fmt.to_dict()
+
+    unique: Dict[str, Dict] = {}
+    for job in all_jobs:
+        digest = sample_id(job)
+        manifest["aliases"][job["filename"]] = digest
+        if digest not in unique:
+            unique[digest] = {
+                "file": f"{SAMPLES_DIR}/{digest}.wav",
+                "notes": sorted(job["notes"]),
+                "duration_sec": job["duration_sec"],
+                "sample_rate": job["sample_rate"],
+            }
+            if fmt != DEFAULT_FORMAT:
+                unique[digest].update(bit_depth=fmt.bit_depth, channels=fmt.channels)
+
+    pending = []
+    for digest, params in unique.items():
+        current = manifest["samples"].get(digest)
+        if (force or current is None or current["file"] != params["file"]
+                or not (output_path / params["file"]).exists()):
+            pending.append(dict(params, id=digest))
+
+    skipped = len(unique) - len(pending)
+    print(f"{len(all_jobs)} chords in selection sound {len(unique)} unique note sets "
+          f"(dedup {len(all_jobs) / max(len(unique), 1):.2f}x); "
+          f"{skipped} up to date, {len(pending)} to render")
+
+    workers = jobs or os.cpu_count() or 1
+    batch_size = max(1, min(32, len(pending) // (workers * 4) or 1))
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+
+    start = time.perf_counter()
+    total_count = 0
+
+    def record(done: List[str]):
+        nonlocal total_count
+        for digest in done:
+            manifest["samples"][digest] = unique[digest]
+        previous = total_count
+        total_count += len(done)
+        if total_count // 50 != previous // 50:
+            print(f"Generated {total_count} samples...")
+
+    if workers == 1:
+        for batch in batches:
+            record(_render_jobs(batch, str(output_path)))
     else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for done in executor.map(_render_jobs, batches, [str(output_path)] * len(batches)):
+                record(done)
+
+    elapsed = time.perf_counter() - start
+
+    referenced = set(manifest["aliases"].values())
+    for digest in [d for d in manifest["samples"] if d not in referenced]:
+        stale = manifest["samples"].pop(digest)
+        if stale["file"].startswith(f"{SAMPLES_DIR}/"):
+            (output_path / stale["file"]).unlink(missing_ok=True)
+
+    save_manifest(output_path, manifest)
+
+    rate = total_count / elapsed if elapsed > 0 else 0.0
+    print(f"\nCompleted: Generated {total_count} chord samples in {elapsed:.2f}s "
+          f"({rate:.1f} files/sec, {workers} jobs)")
+    print(f"Bank: {len(manifest['aliases'])} chord names -> {len(manifest['samples'])} samples "
+          f"(dedup ratio {dedup_ratio(manifest):.2f}x)")
+    return total_count
+
+def convert_bank(source_dir: str, fmt: BankFormat, output_dir: Optional[str] = None,
+                 batch_size: int = 64) -> int:
+    """Convert an existing bank to another format offline
+
+    For banks that can't simply be rendered again in the target format.
+    Samples of equal length are resampled together as one matrix with a
+    polyphase filter (scipy.signal.resample_poly), renormalized to the peak
+    target, then written with the target bit depth and channel layout.
+    Aliases carry over to the new sample ids. Returns the number of converted
+    samples.
+    """
+    from math import gcd
+
+    from scipy.signal import resample_poly
+
+    source = Path(source_dir)
+    output_path = Path(output_dir or f"assets/{fmt.subdir}")
+    if output_path.resolve() == source.resolve():
+        raise ValueError("Conversion needs a different output directory than its source")
+    (output_path / SAMPLES_DIR).mkdir(parents=True, exist_ok=True)
+
+    manifest = load_manifest(source)
+    if not manifest["samples"]:
+        print(f"No manifest entries in {source}; nothing to convert")
+        return 0
+    source_format = BankFormat.from_dict(manifest.get("format"))
+    divisor = gcd(fmt.sample_rate, source_format.sample_rate)
+    up, down = fmt.sample_rate // divisor, source_format.sample_rate // divisor
+    peak = np.float32(10 ** (NORMALIZE_PEAK_DB / 20))
+
+    # Group by length so each group resamples as one (N, frames) matrix
+    groups: Dict[int, List[Tuple[str, np.ndarray]]] = {}
+    for digest, params in sorted(manifest["samples"].items()):
+        _, pcm = read_wav(str(source / params["file"]))
+        mono = pcm.mean(axis=1, dtype=np.float32) / np.float32(source_format.full_scale)
+        groups.setdefault(len(mono), []).append((digest, mono))
+
+    start = time.perf_counter()
+    converted: Dict[str, Dict] = {"samples": {}, "aliases": {}, "format": fmt.to_dict()}
+    renamed: Dict[str, str] = {}
+    for group in groups.values():
+        for i in range(0, len(group), batch_size):
+            chunk = group[i:i + batch_size]
+            audio = np.stack([mono for _, mono in chunk])
+            if up != down:
+                audio = resample_poly(audio, up, down, axis=1).astype(np.float32)
+            audio *= peak / np.maximum(np.abs(audio).max(axis=1, keepdims=True), 1e-9)
+            for (digest, _), buffer in zip(chunk, to_pcm(audio, fmt.bit_depth, fmt.channels)):
+                params = dict(manifest["samples"][digest], sample_rate=fmt.sample_rate)
+                if fmt != DEFAULT_FORMAT:
+                    params.update(bit_depth=fmt.bit_depth, channels=fmt.channels)
+                new_id = sample_id(params)
+                params["file"] = f"{SAMPLES_DIR}/{new_id}.wav"
+                with open(output_path / params["file"], 'wb') as f:
+                    f.write(wav_file_bytes(buffer, fmt))
+                converted["samples"][new_id] = params
+                renamed[digest] = new_id
+
+    converted["aliases"] = {name: renamed[digest] for name, digest in manifest["aliases"].items()
+                            if digest in renamed}
+    save_manifest(output_path, converted)
+    print(f"Converted {len(renamed)} samples from {source_format} to {fmt} "
+          f"(x{up}/{down}) into {output_path} in {time.perf_counter() - start:.2f}s")
+    return len(renamed)
+
+def pack_bank(bank_dir: str = "assets/audio", output_path: Optional[str] = None) -> int:
+    """Pack every unique sample in the bank manifest into a single packed bank file
+
+    Entries are keyed by sample id; the filename aliases are stored in the
+    bank's index. The bank takes the format of its first sample.
+    """
+    bank_path = Path(bank_dir)
+    output = Path(output_path) if output_path else bank_path / BANK_NAME
+    manifest = load_manifest(bank_path)
+    samples = manifest["samples"]
+    ids = sorted(samples)
+    if not ids:
+        print(f"No manifest entries in {bank_path}; nothing to pack")
+        return 0
+
+    fmt, _ = read_wav(str(bank_path / samples[ids[0]]["file"]))
+
+    def entries():
+        for digest in ids:
+            sample_format, pcm = read_wav(str(bank_path / samples[digest]["file"]))
+            if sample_format != fmt:
+                print(f"Skipping {digest}: not {fmt}")
+                continue
+            yield digest, pcm
+
+    start = time.perf_counter()
+    write_packed_bank(str(output), entries(), fmt.sample_rate, fmt.channels,
+                      aliases=manifest["aliases"], bit_depth=fmt.bit_depth)
+    size_mb = output.stat().st_size / (1024 * 1024)
+    print(f"Packed {len(ids)} samples ({len(manifest['aliases'])} aliases) into {output} "
+          f"({size_mb:.1f} MB) in {time.perf_counter() - start:.2f}s")
+    return len(ids)
+
+def _parse_only(value: str) -> Tuple[str, Optional[str]]:
+    """Parse a --only argument of the form KEY or KEY,MODE"""
+    parts = [p.strip() for p in value.split(",")]
+    return parts[0], (parts[1] if len(parts) > 1 and parts[1] else None)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render the chord sample bank")
+    parser.add_argument("--all", action="store_true",
+                        help="render the full production bank instead of the dummy set")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--only", type=_parse_only, action="append", metavar="KEY[,MODE]",
+                        help="limit rendering to a key or key/mode pair (repeatable)")
+    parser.add_argument("--force", action="store_true",
+                        help="re-render even if the manifest says a sample is current")
+    parser.add_argument("--pack", action="store_true",
+                        help=f"also pack the bank into a single memory-mappable {BANK_NAME}")
+    parser.add_argument("--verify", action="store_true",
+                        help="check pitch, peak level and fades of the result (see app.core.verify)")
+    parser.add_argument("--rate", type=int, default=DEFAULT_FORMAT.sample_rate,
+                        help="sample rate of the bank, e.g. 48000 to match the output device")
+    parser.add_argument("--bit-depth", type=int, default=DEFAULT_FORMAT.bit_depth,
+                        choices=(16, 24), help="PCM bit depth")
+    parser.add_argument("--channels", type=int, default=DEFAULT_FORMAT.channels, choices=(1, 2),
+                        help="1 for a mono bank (half the size; played to both channels)")
+    parser.add_argument("--convert-from", metavar="DIR", default=None,
+                        help="resample an existing bank directory instead of rendering")
+    args = parser.parse_args()
+
+    fmt = BankFormat(args.rate, args.bit_depth, args.channels)
+    bank_dir = f"assets/{fmt.subdir}"
+    if args.convert_from:
+        convert_bank(args.convert_from, fmt, bank_dir)
+    elif args.all or args.only:
+        generate_all_chord_samples(jobs=args.jobs, only=args.only, force=args.force, fmt=fmt)
+    elif fmt == DEFAULT_FORMAT:
         generate_dummy_samples()
+    else:
+        parser.error("a bank in another format needs --all, --only or --convert-from")
+
+    if args.pack:
+        pack_bank(bank_dir)
+
+    if args.verify:
+        from app.core.verify import verify_bank
+
+        report_path = "data/bank_verification.json"
+        summary = verify_bank(bank_dir, jobs=args.jobs, report_path=report_path)["summary"]
+        print(f"Verified {summary['samples']} samples: {summary['failed']} failed, "
+              f"max pitch error {summary['max_abs_cents']} cents (report: {report_path})")
@@ -0,0 +1,253 @@
+import json
+import mmap
+import os
+import struct
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+BANK_NAME = "bank.dpb"
+MAGIC = b"DPBANK\x00\x01"
+BANK_VERSION = 1
+
+SUPPORTED_BIT_DEPTHS = (16, 24)
+
+@dataclass(frozen=True)
+class BankFormat:
+    """Sample rate, integer PCM bit depth and channel count of a sample bank"""
+    sample_rate: int = 44100
+    bit_depth: int = 16
+    channels: int = 2
+
+    def __post_init__(self):
+        if self.bit_depth not in SUPPORTED_BIT_DEPTHS:
+            raise ValueError(f"Unsupported bit depth {self.bit_depth}; use one of {SUPPORTED_BIT_DEPTHS}")
+        if self.channels not in (1, 2):
+            raise ValueError(f"Unsupported channel count {self.channels}")
+
+    @property
+    def sample_width(self) -> int:
+        return self.bit_depth // 8
+
+    @property
+    def full_scale(self) -> int:
+        return (1 << (self.bit_depth - 1)) - 1
+
+    @property
+    def subdir(self) -> str:
+        """Bank directory under assets/; the spec's format keeps the plain "audio" """
+        if self == DEFAULT_FORMAT:
+            return "audio"
+        layout = "mono" if self.channels == 1 else "stereo"
+        return f"audio_{self.sample_rate}_{self.bit_depth}bit_{layout}"
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "BankFormat":
+        """Format recorded in a manifest; manifests without one are the spec's default"""
+        return cls(**data) if data else DEFAULT_FORMAT
+
+# audio_engine.sample_format in the spec
+DEFAULT_FORMAT = BankFormat()
+
+def encode_pcm(pcm: np.ndarray, bit_depth: int = 16) -> bytes:
+    """Little-endian interleaved PCM bytes; 24-bit samples come in int32"""
+    if bit_depth == 16:
+        return np.asarray(pcm, dtype="<i2").tobytes()
+    # Keep the low three bytes of each little-endian int32
+    return np.asarray(pcm, dtype="<i4").view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+
+def decode_pcm(raw, bit_depth: int = 16, channels: int = 2) -> np.ndarray:
+    """(frames, channels) samples from PCM bytes: int16 (zero-copy) or int32 for 24-bit"""
+    if bit_depth == 16:
+        return np.frombuffer(raw, dtype="<i2").reshape(-1, channels)
+    triples = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+    values = triples[:, 0] | (triples[:, 1] << 8) | (triples[:, 2] << 16)
+    values = np.where(values >= 1 << 23, values - (1 << 24), values)
+    return values.reshape(-1, channels)
+
+def wav_file_bytes(pcm: np.ndarray, fmt: BankFormat) -> bytes:
+    """A complete WAV file for (frames, channels) PCM in the given format"""
+    frames = len(pcm)
+    return wav_header(frames, fmt.sample_rate, fmt.channels, fmt.sample_width) + \
+        encode_pcm(pcm, fmt.bit_depth)
+
+def read_wav(path: str) -> Tuple[BankFormat, np.ndarray]:
+    """Memory-map a PCM WAV file: (format, (frames, channels) samples)
+
+    16-bit data is a read-only view of the mapping, which stays mapped until
+    the array is dropped; 24-bit data is decoded to int32 and the mapping
+    closed.
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        fmt, body, size = _wav_data_chunk(path, mapped)
+    except (ValueError, struct.error) as e:
+        mapped.close()
+        if isinstance(e, struct.error):
+            raise ValueError(f"{path} is truncated") from e
+        raise
+    if fmt.bit_depth == 16:
+        return fmt, decode_pcm(memoryview(mapped)[body:body + size], fmt.bit_depth, fmt.channels)
+    samples = decode_pcm(mapped[body:body + size], fmt.bit_depth, fmt.channels)
+    mapped.close()
+    return fmt, samples
+
+def _wav_data_chunk(path: str, mapped) -> Tuple[BankFormat, int, int]:
+    """Format, offset and size of a WAV file's data chunk"""
+    riff, _, wave = struct.unpack_from("<4sI4s", mapped, 0)
+    if riff != b"RIFF" or wave != b"WAVE":
+        raise ValueError(f"{path} is not a WAV file")
+
+    offset, fmt = 12, None
+    while offset + 8 <= len(mapped):
+        chunk, size = struct.unpack_from("<4sI", mapped, offset)
+        body = offset + 8
+        if chunk == b"fmt ":
+            tag, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", mapped, body)
+            if tag not in (1, 0xFFFE):
+                raise ValueError(f"{path} is not integer PCM")
+            fmt = BankFormat(sample_rate=rate, bit_depth=bits, channels=channels)
+        elif chunk == b"data":
+            if fmt is None:
+                raise ValueError(f"{path} has no fmt chunk before its data")
+            return fmt, body, size
+        offset = body + size + (size & 1)
+    raise ValueError(f"{path} has no data chunk")
+
+# magic, version, sample rate, channels, sample width (bytes), entry count, index offset, index length
+_HEADER = struct.Struct("<8sHIHHIQQ")
+_ALIGN = 16
+
+def write_packed_bank(output_path: str, entries: Iterable[Tuple[str, np.ndarray]],
+                      sample_rate: int, channels: int = 2,
+                      aliases: Optional[Dict[str, str]] = None, bit_depth: int = 16):
+    """Write samples into one packed bank file
+
+    Layout: fixed header, then each sample's raw little-endian PCM (16-byte
+    aligned), then a JSON index of name -> [offset, frames] plus any
+    alias -> name map. The file is written to a temporary name and moved into
+    place.
+    """
+    output = Path(output_path)
+    tmp_path = output.with_name(output.name + ".tmp")
+    index: Dict[str, List[int]] = {}
+
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * _HEADER.size)
+        for name, pcm in entries:
+            pcm = np.asarray(pcm).reshape(-1, channels)
+            padding = -f.tell() % _ALIGN
+            f.write(b"\0" * padding)
+            index[name] = [f.tell(), len(pcm)]
+            f.write(encode_pcm(pcm, bit_depth))
+
+        index_offset = f.tell()
+        index_bytes = json.dumps({"entries": index, "aliases": aliases or {}},
+                                 sort_keys=True).encode()
+        f.write(index_bytes)
+
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, BANK_VERSION, sample_rate, channels, bit_depth // 8,
+                             len(index), index_offset, len(index_bytes)))
+
+    os.replace(tmp_path, output)
+
+def wav_header(frames: int, sample_rate: int, channels: int, sample_width: int = 2) -> bytes:
+    """44-byte PCM WAV header for a data chunk of the given size"""
+    data_size = frames * channels * sample_width
+    return struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, 1,
+                       channels, sample_rate, sample_rate * channels * sample_width,
+                       channels * sample_width, sample_width * 8, b"data", data_size)
+
+def read_bank_format(path: str) -> BankFormat:
+    """Format of a packed bank from its header alone, without mapping the file"""
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError(f"{path} is not a version {BANK_VERSION} packed bank")
+    magic, version, sample_rate, channels, sample_width, *_ = _HEADER.unpack(header)
+    if magic != MAGIC or version != BANK_VERSION:
+        raise ValueError(f"{path} is not a version {BANK_VERSION} packed bank")
+    return BankFormat(sample_rate, sample_width * 8, channels)
+
+class PackedBank:
+    """Memory-mapped reader for a packed bank; samples are zero-copy slices"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            self._file.close()
+            raise ValueError(f"Can't map {path}: {e}") from e
+        self._view = memoryview(self._mmap)
+
+        try:
+            (magic, version, self.sample_rate, self.channels, self.sample_width,
+             count, index_offset, index_length) = _HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC or version != BANK_VERSION:
+                raise ValueError("bad magic or version")
+            self.format = BankFormat(self.sample_rate, self.sample_width * 8, self.channels)
+
+            index = json.loads(bytes(self._view[index_offset:index_offset + index_length]))
+            self._index: Dict[str, Tuple[int, int]] = {
+                name: (offset, frames) for name, (offset, frames) in index["entries"].items()
+            }
+            # Chord filename -> sample name, for banks of content-addressed samples
+            self.aliases: Dict[str, str] = index.get("aliases", {})
+        except (ValueError, struct.error, KeyError, TypeError) as e:
+            # A truncated header or index must not leak the file and mapping
+            self.close()
+            raise ValueError(f"{path} is not a valid version {BANK_VERSION} packed bank") from e
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the mapping, 0 once closed"""
+        if self._mmap is None or self._mmap.closed:
+            return 0
+        return len(self._mmap)
+
+    def names(self) -> List[str]:
+        """Sample names in the bank"""
+        return list(self._index)
+
+    def pcm(self, name: str) -> memoryview:
+        """Raw interleaved PCM bytes of a sample, without copying"""
+        offset, frames = self._index[name]
+        return self._view[offset:offset + frames * self.channels * self.sample_width]
+
+    def frames(self, name: str) -> np.ndarray:
+        """(frames, channels) samples: a read-only int16 view of the mapping, or int32 for 24-bit"""
+        return decode_pcm(self.pcm(name), self.format.bit_depth, self.channels)
+
+    def wav_bytes(self, name: str) -> bytes:
+        """A complete WAV file for one sample (copies only that sample)"""
+        _, frames = self._index[name]
+        return wav_header(frames, self.sample_rate, self.channels, self.sample_width) + self.pcm(name)
+
+    def close(self):
+        """Close the bank file and mapping
+
+        Slices and arrays from pcm() and frames() that are still alive keep
+        the mapping open; it is unmapped once the last of them is dropped.
+        """
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Live exports hold the mmap object; dropping ours lets it unmap with them
+            self._mmap = None
+        self._file.close()
@@ -0,0 +1,216 @@
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.core.bank import BANK_NAME, DEFAULT_FORMAT, BankFormat, read_bank_format
+from app.core.theory import ChordKey, chord_key_notes, parse_asset_path
+
+MANIFEST_NAME = "manifest.json"
+
+# Resolution kinds, best first; exact and alias sound identical to the request
+EXACT = "exact"
+ALIAS = "alias"
+OCTAVE = "octave"
+APPROXIMATE = "approximate"
+
+@dataclass
+class Resolution:
+    """Asset chosen for a requested chord path
+
+    sample_id identifies the audio content; every alias of the same note set
+    resolves to the same id.
+    """
+    path: str
+    kind: str
+    sample_id: str
+
+    @property
+    def sounds_exact(self) -> bool:
+        return self.kind in (EXACT, ALIAS)
+
+def bank_formats(assets_dir: str = "assets") -> Dict[str, BankFormat]:
+    """Format of each sample bank directory under assets_dir (audio, audio_48000_16bit_mono...)
+
+    Read from the packed bank header when there is one, else from the
+    generator's manifest; banks from before format variants are the spec's
+    default format.
+    """
+    formats: Dict[str, BankFormat] = {}
+    root = Path(assets_dir)
+    if not root.is_dir():
+        return formats
+    for entry in os.scandir(root):
+        if not (entry.is_dir() and entry.name.startswith("audio")):
+            continue
+        bank_dir = Path(entry.path)
+        try:
+            if (bank_dir / BANK_NAME).exists():
+                formats[entry.name] = read_bank_format(str(bank_dir / BANK_NAME))
+            elif (bank_dir / MANIFEST_NAME).exists():
+                with open(bank_dir / MANIFEST_NAME, 'r') as f:
+                    formats[entry.name] = BankFormat.from_dict(json.load(f).get("format"))
+            elif entry.name == "audio":
+                formats[entry.name] = DEFAULT_FORMAT
+        except (ValueError, TypeError, json.JSONDecodeError) as e:
+            print(f"Warning: ignoring sample bank {entry.name}: {e}")
+    return formats
+
+def choose_bank(formats: Dict[str, BankFormat],
+                output_rate: int) -> Tuple[str, BankFormat]:
+    """Bank directory to play from: one at the output rate if any, so nothing is
+    resampled at runtime, then the smallest (mono, 16-bit)"""
+    if not formats:
+        return "audio", DEFAULT_FORMAT
+    subdir = min(formats, key=lambda name: (formats[name].sample_rate != output_rate,
+                                            formats[name].channels,
+                                            formats[name].bit_depth, name))
+    return subdir, formats[subdir]
+
+class AssetManifest:
+    """In-memory index of the sample bank, built once so taps never stat files
+
+    on_disk tells whether sample paths are files the client can load by URL;
+    paths into a packed bank are not.
+    """
+
+    def __init__(self, aliases: Dict[str, Tuple[str, str]], on_disk: bool = True):
+        """aliases maps chord asset paths to (sample path, sample id)"""
+        self.on_disk = on_disk
+        self.entries: Dict[ChordKey, Tuple[str, str]] = {}
+        self.by_notes: Dict[Tuple[int, ...], Tuple[str, str]] = {}
+        self.by_degree: Dict[Tuple[str, str, int], List[ChordKey]] = {}
+        self.unparsed = 0
+        self.resolutions = {EXACT: 0, ALIAS: 0, OCTAVE: 0, APPROXIMATE: 0, "miss": 0}
+
+        for path, sample in aliases.items():
+            key = parse_asset_path(path)
+            if key is None:
+                self.unparsed += 1
+                continue
+            self.entries[key] = sample
+            self.by_degree.setdefault(key[:3], []).append(key)
+            try:
+                self.by_notes.setdefault(tuple(chord_key_notes(key)), sample)
+            except ValueError:
+                pass
+
+    @classmethod
+    def from_paths(cls, paths: List[str], on_disk: bool = True) -> "AssetManifest":
+        """Bank of one file per chord name, each its own sample"""
+        return cls({path: (path, path) for path in paths}, on_disk)
+
+    @classmethod
+    def from_bank(cls, bank, subdir: str = "audio") -> "AssetManifest":
+        """Index a PackedBank, using its alias map when it has one"""
+        if bank.aliases:
+            return cls({f"{subdir}/{name}": (f"{subdir}/{sample}", sample)
+                        for name, sample in bank.aliases.items()}, on_disk=False)
+        return cls.from_paths([f"{subdir}/{name}" for name in bank.names()], on_disk=False)
+
+    @classmethod
+    def scan(cls, assets_dir: str = "assets", subdir: str = "audio") -> "AssetManifest":
+        """Build from the generator's manifest.json, or list the directory once"""
+        bank_dir = Path(assets_dir) / subdir
+        manifest_path = bank_dir / MANIFEST_NAME
+
+        if manifest_path.exists():
+            with open(manifest_path, 'r') as f:
+                data = json.load(f)
+            samples = data.get("samples", {})
+            return cls({
+                f"{subdir}/{name}": (f"{subdir}/{samples[sample]['file']}", sample)
+                for name, sample in data.get("aliases", {}).items() if sample in samples
+            })
+
+        if bank_dir.is_dir():
+            names = [entry.name for entry in os.scandir(bank_dir)
+                     if entry.is_file() and entry.name.endswith(".wav")]
+        else:
+            names = []
+        return cls.from_paths([f"{subdir}/{name}" for name in names])
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, path: str) -> bool:
+        key = parse_asset_path(path)
+        return key is not None and key in self.entries
+
+    def resolve(self, path: str) -> Optional[Resolution]:
+        """Find the best available asset for a chord_to_asset_path path
+
+        Preference: the exact file; any file sounding the same notes (another
+        key/mode/degree spelling); the same chord in the nearest octave; then
+        the same key/mode/degree with the most matching voicing, inversion
+        and tension options.
+        """
+        key = parse_asset_path(path)
+        if key is None:
+            self.resolutions["miss"] += 1
+            return None
+
+        found = self.entries.get(key)
+        if found is not None:
+            self.resolutions[EXACT] += 1
+            return Resolution(found[0], EXACT, found[1])
+
+        try:
+            found = self.by_notes.get(tuple(chord_key_notes(key)))
+        except ValueError:
+            found = None
+        if found is not None:
+            self.resolutions[ALIAS] += 1
+            return Resolution(found[0], ALIAS, found[1])
+
+        candidates = self.by_degree.get(key[:3], [])
+        if not candidates:
+            self.resolutions["miss"] += 1
+            return None
+
+        def distance(candidate: ChordKey) -> Tuple[int, int]:
+            mismatches = sum(candidate[i] != key[i] for i in (3, 4, 5))
+            return mismatches, abs(candidate[6] - key[6])
+
+        best = min(candidates, key=distance)
+        kind = OCTAVE if distance(best)[0] == 0 else APPROXIMATE
+        self.resolutions[kind] += 1
+        path, sample_id = self.entries[best]
+        return Resolution(path, kind, sample_id)
+
+    def coverage(self) -> Dict:
+        """Bank coverage over the dimensions present in the bank
+
+        "coverage" is the fraction of the full key x mode x degree x
+        (voicing, inversion, tensions, octave) grid spanned by the bank's own
+        option values that has a sample.
+        """
+        keys = self.entries.keys()
+        dims = [sorted({k[i] for k in keys}, key=str) for i in range(7)]
+        grid = 1
+        for values in dims:
+            grid *= max(len(values), 1)
+
+        samples = len({sample_id for _, sample_id in self.entries.values()})
+
+        per_mode: Dict[str, int] = {}
+        for key in keys:
+            per_mode[key[1]] = per_mode.get(key[1], 0) + 1
+
+        return {
+            "entries": len(self.entries),
+            "unparsed": self.unparsed,
+            "distinct_sounds": len(self.by_notes),
+            "samples": samples,
+            "dedup_ratio": len(self.entries) / samples if samples else 0.0,
+            "keys": dims[0],
+            "modes": dims[1],
+            "voicings": dims[3],
+            "inversions": dims[4],
+            "tension_sets": ["-".join(map(str, t)) for t in dims[5]],
+            "octaves": dims[6],
+            "per_mode": per_mode,
+            "coverage": len(self.entries) / grid if self.entries else 0.0,
+            "resolutions": dict(self.resolutions),
+        }
@@ -0,0 +1,136 @@
+import csv
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Deque, Dict, List
+
+# acceptance_criteria.latency.tap_to_sound_ms in the spec
+TARGET_MS = 30.0
+MAX_MS = 60.0
+
+# Phases of a tap, in the order they happen
+PHASES = [
+    "theory",          # chord_to_asset_path / degree_to_chord
+    "resolve",         # manifest lookup and sample cache/bank read
+    "voice_alloc",     # taking a pooled Audio control
+    "control_create",  # constructing a new Audio control (pool misses only)
+    "page_update",     # page.update() round trip to the client
+    "tap_total",       # handler entry to return
+    "tap_to_playing",  # play_sample until the client reports "playing"
+    "state_callback",  # on_state_changed handler
+]
+
+# Phases measured end to end against the spec's budget
+BUDGET_PHASES = ("tap_total", "tap_to_playing")
+
+STAT_COLUMNS = ["phase", "count", "mean", "p50", "p95", "p99", "max", "over_target", "over_max"]
+
+class LatencyMetrics:
+    """Rolling per-phase latency samples in milliseconds
+
+    Recording is a deque append; percentiles are only computed when a
+    snapshot is taken. When disabled, phase() returns a no-op context.
+    """
+
+    def __init__(self, window: int = 1000, enabled: bool = True):
+        self.window = window
+        self.enabled = enabled
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, ms: float):
+        """Add one sample to a phase"""
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self._samples.get(phase)
+            if samples is None:
+                samples = self._samples[phase] = deque(maxlen=self.window)
+                self._counts[phase] = 0
+            samples.append(ms)
+            self._counts[phase] += 1
+
+    def phase(self, name: str):
+        """Context manager timing the enclosed block as one sample of name"""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95/p99/max/mean over the rolling window of every phase"""
+        # Imported here so recording (and app startup) doesn't need numpy
+        import numpy as np
+
+        with self._lock:
+            samples = {phase: np.fromiter(values, dtype=np.float64, count=len(values))
+                       for phase, values in self._samples.items()}
+            counts = dict(self._counts)
+
+        ordered = [p for p in PHASES if p in samples] + sorted(set(samples) - set(PHASES))
+        stats = {}
+        for phase in ordered:
+            values = samples[phase]
+            if not len(values):
+                continue
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            stats[phase] = {
+                "count": counts[phase],
+                "mean": float(values.mean()),
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "max": float(values.max()),
+                "over_target": int((values > TARGET_MS).sum()),
+                "over_max": int((values > MAX_MS).sum()),
+            }
+        return stats
+
+    def over_budget(self) -> List[str]:
+        """End-to-end phases whose p95 exceeds the spec's max"""
+        stats = self.snapshot()
+        return [phase for phase in BUDGET_PHASES
+                if phase in stats and stats[phase]["p95"] > MAX_MS]
+
+    def dump(self, path: str) -> Path:
+        """Write the snapshot to a .json or .csv file, chosen by suffix"""
+        output = Path(path)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        stats = self.snapshot()
+
+        if output.suffix == ".csv":
+            with open(output, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(STAT_COLUMNS)
+                for phase, row in stats.items():
+                    writer.writerow([phase] + [row[c] for c in STAT_COLUMNS[1:]])
+        else:
+            with open(output, 'w') as f:
+                json.dump({"target_ms": TARGET_MS, "max_ms": MAX_MS, "window": self.window,
+                           "phases": stats}, f, indent=2)
+        return output
+
+    def reset(self):
+        """Drop all samples"""
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+def format_stats(stats: Dict[str, Dict[str, float]]) -> str:
+    """Fixed-width table of a snapshot for the debug overlay and logs"""
+    lines = [f"{'phase':<15}{'n':>7}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}"]
+    for phase, row in stats.items():
+        lines.append(f"{phase:<15}{row['count']:>7}{row['p50']:>8.2f}{row['p95']:>8.2f}"
+                     f"{row['p99']:>8.2f}{row['max']:>8.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,72 @@
+import base64
+from pathlib import Path
+from typing import Optional, Tuple
+
+from app.core.bank import BankFormat, wav_file_bytes
+from app.core.sample_cache import SampleCache
+from app.core.synth import notes_matrix, render_chords, to_pcm
+from app.core.theory import chord_key_notes, parse_asset_path
+
+class ChordRenderer:
+    """Renders chords missing from the bank and caches the encoded WAV"""
+
+    def __init__(self, cache_bytes: int = 16 * 1024 * 1024,
+                 disk_cache_dir: Optional[str] = None,
+                 duration_sec: float = 1.5, sample_rate: int = 44100,
+                 bit_depth: int = 16, channels: int = 2):
+        self.cache = SampleCache(cache_bytes)
+        self.disk_cache_dir = Path(disk_cache_dir) if disk_cache_dir else None
+        self.duration_sec = duration_sec
+        self.sample_rate = sample_rate
+        self.format = BankFormat(sample_rate, bit_depth, channels)
+        self.renders = 0
+
+        if self.disk_cache_dir:
+            self.disk_cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _disk_path(self, notes: Tuple[int, ...]) -> Path:
+        notes_str = "-".join(map(str, notes))
+        fmt = self.format
+        return self.disk_cache_dir / (f"{notes_str}_{self.duration_sec}s_{fmt.sample_rate}_"
+                                      f"{fmt.bit_depth}bit_{fmt.channels}ch.wav")
+
+    def render(self, path: str) -> Optional[str]:
+        """Return a base64 WAV for the chord named by path, rendering it if needed
+
+        Renders are keyed by sorted note set, so chord names sounding the
+        same notes share one render.
+        """
+        key = parse_asset_path(path)
+        if key is None:
+            return None
+        try:
+            notes = tuple(sorted(chord_key_notes(key)))
+        except ValueError:
+            return None
+
+        data = self.cache.get(notes)
+        if data is not None:
+            return data
+
+        raw = None
+        if self.disk_cache_dir:
+            disk_path = self._disk_path(notes)
+            if disk_path.exists():
+                raw = disk_path.read_bytes()
+
+        if raw is None:
+            raw = self._render(notes)
+            if self.disk_cache_dir:
+                disk_path.write_bytes(raw)
+
+        data = base64.b64encode(raw).decode("ascii")
+        self.cache.put(notes, data)
+        return data
+
+    def _render(self, notes: Tuple[int, ...]) -> bytes:
+        """Synthesize one chord as WAV bytes"""
+        audio = render_chords(notes_matrix([list(notes)]), duration_sec=self.duration_sec,
+                              sample_rate=self.sample_rate)
+        self.renders += 1
+        return wav_file_bytes(to_pcm(audio[0], self.format.bit_depth, self.format.channels),
+                              self.format)
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Sized
+
+class SampleCache:
+    """Thread-safe LRU cache of loaded samples bounded by a byte budget
+
+    Values are base64 payloads or anything else whose len() is its size,
+    such as the audio engine's sample sources.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Sized]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, record: bool = True) -> Optional[Sized]:
+        """Return a cached sample and mark it most recently used
+
+        record=False leaves the hit/miss counters alone (for preloading).
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                if record:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if record:
+                self.hits += 1
+            return data
+
+    def contains(self, key: Hashable) -> bool:
+        """Check membership without touching LRU order or counters"""
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key: Hashable, data: Sized):
+        """Insert a sample, evicting least recently used entries over budget"""
+        size = len(data)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes_used -= len(old)
+
+            self._entries[key] = data
+            self.bytes_used += size
+
+            while self.bytes_used > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes_used -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached sample"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes_used = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and memory usage"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes_used,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import re
+import threading
+import uuid
+from typing import Dict, Optional
+
+# Client storage key of an anonymous browser's user id
+USER_ID_KEY = "diatonic.user_id"
+
+# User ids name directories under data/users, so they are kept path-safe
+_USER_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+def valid_user_id(user_id) -> bool:
+    return isinstance(user_id, str) and _USER_ID.fullmatch(user_id) is not None
+
+def _hashed_id(prefix: str, value: str) -> str:
+    return f"{prefix}-{hashlib.sha1(value.encode()).hexdigest()[:16]}"
+
+async def resolve_user_id(page) -> Optional[str]:
+    """Id of the user whose progressions a session reads and writes
+
+    None for the desktop app, which has a single local user. In web mode a
+    signed-in user's id is used; anonymous browsers get a random id kept in
+    their client storage, so they find their progressions again on the next
+    visit.
+    """
+    if not getattr(page, "web", False):
+        return None
+    auth = getattr(page, "auth", None)
+    if auth is not None and auth.user is not None and auth.user.id:
+        return _hashed_id("auth", str(auth.user.id))
+    try:
+        user_id = await page.client_storage.get_async(USER_ID_KEY)
+        if not valid_user_id(user_id):
+            user_id = uuid.uuid4().hex
+            await page.client_storage.set_async(USER_ID_KEY, user_id)
+        return user_id
+    except Exception as e:
+        print(f"Warning: client storage unavailable ({e}); saves last for this session only")
+        return _hashed_id("session", str(page.session_id))
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process, where /proc reports it"""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class SessionRegistry:
+    """Live sessions of this process and the memory each one adds
+
+    Sessions register once their subsystems are built, with the SharedAssets
+    they use, and unregister when they close. The first registration takes a
+    baseline after imports and shared structures exist; per_session_bytes is
+    then the RSS growth beyond it, minus growth of the shared caches, spread
+    over the sessions that came after the first.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Optional[str]] = {}
+        self._assets: Dict[int, object] = {}
+        self.peak = 0
+        self._baseline: Optional[int] = None
+
+    def _shared_bytes(self) -> int:
+        total = 0
+        for assets in self._assets.values():
+            memory = assets.memory()
+            total += memory["sample_cache_bytes"] + memory["render_cache_bytes"]
+        return total
+
+    def register(self, session_id: str, user_id: Optional[str] = None, assets=None):
+        """Record a live session and the SharedAssets it plays from"""
+        with self._lock:
+            if assets is not None:
+                self._assets.setdefault(id(assets), assets)
+            self._sessions[session_id] = user_id
+            self.peak = max(self.peak, len(self._sessions))
+            if self._baseline is None:
+                rss = rss_bytes()
+                if rss is not None:
+                    self._baseline = rss - self._shared_bytes()
+
+    def unregister(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        """Session counts, process RSS, shared cache bytes and per-session overhead"""
+        with self._lock:
+            sessions = len(self._sessions)
+            shared = self._shared_bytes()
+            rss = rss_bytes()
+            per_session = None
+            if rss is not None and self._baseline is not None and sessions > 1:
+                per_session = max(rss - shared - self._baseline, 0) // (sessions - 1)
+            return {
+                "sessions": sessions,
+                "peak_sessions": self.peak,
+                "users": len(set(self._sessions.values())),
+                "rss_bytes": rss,
+                "shared_bytes": shared,
+                "per_session_bytes": per_session,
+            }
+
+def format_sessions(stats: Dict[str, Optional[int]]) -> str:
+    """One-line summary of SessionRegistry.stats()"""
+    per_session = stats["per_session_bytes"]
+    each = f"~{per_session / 1024:.0f} KB each" if per_session is not None else "overhead n/a"
+    return (f"Sessions: {stats['sessions']} live (peak {stats['peak_sessions']}), {each}, "
+            f"shared caches {stats['shared_bytes'] / (1024 * 1024):.1f} MB")
+
+# The process-wide registry; in web mode every session of the server shares it
+sessions = SessionRegistry()
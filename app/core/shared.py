@@ -0,0 +1,87 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.core.bank import BANK_NAME, BankFormat, PackedBank
+from app.core.manifest import AssetManifest, bank_formats, choose_bank
+from app.core.renderer import ChordRenderer
+from app.core.sample_cache import SampleCache
+
+class SharedAssets:
+    """Read-only sample data used by every AudioEngine at one output rate
+
+    The packed bank mapping, asset manifest, sample cache and chord renderer
+    are built once and shared by all sessions. Cached samples are immutable,
+    so a sample loaded for one session is served to the others without a
+    copy. Warm-ups from every session run on one background thread. The
+    chord tables in app.core.theory are module-level caches and are shared
+    already.
+    """
+
+    def __init__(self, assets_dir: str = "assets", output_rate: int = 44100,
+                 cache_bytes: int = 32 * 1024 * 1024, render_missing: bool = True,
+                 render_cache_dir: Optional[str] = None):
+        self.assets_dir = Path(assets_dir)
+        self.output_rate = output_rate
+        # Play from the bank variant generated at the output rate, if there is one
+        self.bank_dir, self.bank_format = choose_bank(bank_formats(assets_dir), output_rate)
+        if self.bank_format.sample_rate != output_rate:
+            print(f"Warning: no {output_rate} Hz sample bank; {self.bank_dir} "
+                  f"({self.bank_format.sample_rate} Hz) will be resampled on playback")
+        # Chords missing from the bank are rendered natively at the output rate
+        self.render_format = BankFormat(output_rate, self.bank_format.bit_depth,
+                                        self.bank_format.channels)
+        self.sample_cache = SampleCache(cache_bytes)
+        self.bank = self._open_bank()
+        # WAV files are played by URL; a bank shipped without them plays inline
+        self.manifest = AssetManifest.scan(assets_dir, self.bank_dir)
+        if len(self.manifest) == 0 and self.bank is not None:
+            self.manifest = AssetManifest.from_bank(self.bank, self.bank_dir)
+        self.renderer = ChordRenderer(
+            disk_cache_dir=render_cache_dir, sample_rate=self.render_format.sample_rate,
+            bit_depth=self.render_format.bit_depth, channels=self.render_format.channels,
+        ) if render_missing else None
+        self.warmer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sample-warmup")
+
+    def _open_bank(self) -> Optional[PackedBank]:
+        """Map the packed bank if one was generated"""
+        bank_path = self.assets_dir / self.bank_dir / BANK_NAME
+        if not bank_path.exists():
+            return None
+        try:
+            return PackedBank(str(bank_path))
+        except ValueError as e:
+            print(f"Warning: ignoring packed bank: {e}")
+            return None
+
+    def memory(self) -> Dict[str, int]:
+        """Bytes held once for all sessions: cached payloads and the bank mapping"""
+        return {
+            "sample_cache_bytes": self.sample_cache.bytes_used,
+            "render_cache_bytes": self.renderer.cache.bytes_used if self.renderer else 0,
+            "bank_bytes": self.bank.nbytes if self.bank is not None else 0,
+            "manifest_entries": len(self.manifest),
+        }
+
+# (resolved assets directory, output rate) -> assets shared by the whole process
+_shared: Dict[Tuple[str, int], SharedAssets] = {}
+_shared_lock = threading.Lock()
+
+def shared_assets(assets_dir: str = "assets", output_rate: int = 44100) -> SharedAssets:
+    """The process-wide SharedAssets for a directory and output rate, built on first use
+
+    Sessions asking while the first build is running wait for it rather than
+    building their own.
+    """
+    key = (str(Path(assets_dir).resolve()), output_rate)
+    with _shared_lock:
+        assets = _shared.get(key)
+        if assets is None:
+            assets = _shared[key] = SharedAssets(assets_dir, output_rate)
+        return assets
+
+def all_shared_assets() -> List[SharedAssets]:
+    """Every SharedAssets built so far"""
+    with _shared_lock:
+        return list(_shared.values())
@@ -0,0 +1,78 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+# perf_counter() when this module was first imported; main.py imports it
+# before anything heavy, so this is as close to launch as Python gets
+LAUNCHED_AT = time.perf_counter()
+
+class StartupProfile:
+    """Startup timeline of one session: marks since an origin and durations of named phases
+
+    The origin defaults to the moment the profile is created; pass
+    LAUNCHED_AT to time a cold start from launch. Phases may be timed from
+    background threads.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter,
+                 origin: Optional[float] = None, marks: Optional[Dict[str, float]] = None):
+        self.clock = clock
+        self.origin = clock() if origin is None else origin
+        self.marks: Dict[str, float] = dict(marks or {})
+        self.phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def mark(self, name: str) -> float:
+        """Record ms elapsed since the origin under name"""
+        elapsed = (self.clock() - self.origin) * 1000
+        with self._lock:
+            self.marks[name] = elapsed
+        return elapsed
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the block in ms; repeated names accumulate"""
+        start = self.clock()
+        try:
+            yield
+        finally:
+            elapsed = (self.clock() - start) * 1000
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def finish(self, name: str = "interactive") -> float:
+        """Record the final mark and wake anyone in wait()"""
+        elapsed = self.mark(name)
+        self._done.set()
+        return elapsed
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until finish() was called"""
+        return self._done.wait(timeout)
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {"marks": dict(self.marks), "phases": dict(self.phases)}
+
+    def format(self) -> str:
+        """Marks in launch order, then phases slowest first"""
+        report = self.report()
+        lines = ["Startup (ms since start):"]
+        lines += [f"  {name:<22}{ms:>9.1f}" for name, ms in
+                  sorted(report["marks"].items(), key=lambda item: item[1])]
+        lines.append("Phases (ms):")
+        lines += [f"  {name:<22}{ms:>9.1f}" for name, ms in
+                  sorted(report["phases"].items(), key=lambda item: -item[1])]
+        return "\n".join(lines)
+
+    def dump(self, path: str) -> Path:
+        """Write the report as JSON"""
+        out = Path(path)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        return out
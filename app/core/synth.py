@@ -0,0 +1,156 @@
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+# Padding value for unused note slots in a MIDI matrix
+NO_NOTE = -1
+
+# Samples per block in the angle-addition renderer
+_BLOCK_SAMPLES = 512
+
+@dataclass
+class Envelope:
+    """ADSR amplitude envelope (times in milliseconds)"""
+    attack_ms: float = 5.0
+    decay_ms: float = 0.0
+    sustain_level: float = 1.0
+    release_ms: float = 80.0
+
+@dataclass
+class Timbre:
+    """Additive partials as (frequency ratio, amplitude) or a single-cycle wavetable"""
+    partials: Sequence[Tuple[float, float]] = ((1.0, 1.0),)
+    wavetable: Optional[np.ndarray] = None
+
+SINE = Timbre()
+SOFT_PIANO = Timbre(partials=((1.0, 1.0), (2.0, 0.45), (3.0, 0.2), (4.0, 0.1), (5.0, 0.05)))
+
+def midi_to_freq(notes: np.ndarray) -> np.ndarray:
+    """Convert MIDI note numbers to frequencies (A4=440, 12-TET)"""
+    return 440.0 * 2.0 ** ((np.asarray(notes, dtype=np.float64) - 69.0) / 12.0)
+
+def notes_matrix(chords: Sequence[Sequence[int]]) -> np.ndarray:
+    """Pack ragged note lists into an (N, max notes) matrix padded with NO_NOTE"""
+    width = max((len(c) for c in chords), default=0)
+    matrix = np.full((len(chords), max(width, 1)), NO_NOTE, dtype=np.int16)
+    for i, chord in enumerate(chords):
+        matrix[i, :len(chord)] = chord
+    return matrix
+
+def adsr(num_samples: int, sample_rate: int, envelope: Envelope) -> np.ndarray:
+    """Build an ADSR curve whose release ends on the last sample"""
+    env = np.full(num_samples, envelope.sustain_level, dtype=np.float32)
+
+    attack = min(int(envelope.attack_ms * sample_rate / 1000), num_samples)
+    decay = min(int(envelope.decay_ms * sample_rate / 1000), num_samples - attack)
+    release = min(int(envelope.release_ms * sample_rate / 1000), num_samples)
+
+    if attack:
+        env[:attack] = np.linspace(0.0, 1.0, attack, endpoint=False, dtype=np.float32)
+    if decay:
+        env[attack:attack + decay] = np.linspace(1.0, envelope.sustain_level, decay,
+                                                 endpoint=False, dtype=np.float32)
+    if release:
+        start = num_samples - release
+        level = env[start]
+        env[start:] = np.linspace(level, 0.0, release, dtype=np.float32)
+
+    return env
+
+def timbre_partials(timbre: Timbre, max_partials: int = 64) -> Tuple[np.ndarray, np.ndarray]:
+    """Resolve a timbre to (frequency ratios, amplitudes) arrays
+
+    Wavetables are decomposed into their harmonic series, so both timbre
+    kinds share the same additive renderer.
+    """
+    if timbre.wavetable is None:
+        ratios, amps = zip(*timbre.partials)
+        return np.asarray(ratios, dtype=np.float64), np.asarray(amps, dtype=np.float64)
+
+    table = np.asarray(timbre.wavetable, dtype=np.float64)
+    spectrum = np.fft.rfft(table)[1:max_partials + 1] * (2.0 / len(table))
+    keep = np.abs(spectrum) > 1e-4 * max(np.abs(spectrum).max(), 1e-12)
+    harmonics = np.arange(1, len(spectrum) + 1, dtype=np.float64)[keep]
+    # Harmonic phases are discarded; only the magnitudes shape the timbre
+    return harmonics, np.abs(spectrum[keep])
+
+def render_chords(notes: np.ndarray, duration_sec: float = 1.5,
+                  sample_rate: int = 44100, timbre: Timbre = SINE,
+                  envelope: Optional[Envelope] = None,
+                  normalize_peak_db: Optional[float] = -1.0) -> np.ndarray:
+    """Render an (N, max notes) MIDI matrix into an (N, samples) float32 array
+
+    Slots holding NO_NOTE are silent. Each buffer is peak-normalized to
+    normalize_peak_db, or scaled by 1/note count when it is None.
+
+    Every oscillator is split as sin(w(n0 + k)) = sin(w n0)cos(w k) + cos(w n0)sin(w k)
+    over fixed-size blocks, so summing all notes and partials becomes a single
+    batched float32 matrix product instead of one sin() per note.
+    """
+    notes = np.atleast_2d(np.asarray(notes))
+    envelope = envelope or Envelope()
+    num_chords = notes.shape[0]
+    num_samples = int(sample_rate * duration_sec)
+
+    if num_chords == 0 or num_samples == 0:
+        return np.zeros((num_chords, num_samples), dtype=np.float32)
+
+    valid = notes != NO_NOTE
+    ratios, amps = timbre_partials(timbre)
+    # (N, notes * partials) oscillator frequencies and gains
+    freqs = (midi_to_freq(np.where(valid, notes, 69))[:, :, None] * ratios).reshape(num_chords, -1)
+    gains = (valid[:, :, None] * amps).reshape(num_chords, -1)
+    gains = np.where(freqs < sample_rate / 2.0, gains, 0.0)
+
+    block = _BLOCK_SAMPLES
+    num_blocks = -(-num_samples // block)
+    omega = (2.0 * np.pi / sample_rate) * freqs
+    starts = np.arange(num_blocks, dtype=np.float64) * block
+    offsets = np.arange(block, dtype=np.float64)
+
+    # A: (N, blocks, 2 * osc) block-start terms, B: (N, 2 * osc, block) in-block terms
+    start_angle = omega[:, None, :] * starts[None, :, None]
+    a = np.concatenate([np.sin(start_angle) * gains[:, None, :],
+                        np.cos(start_angle) * gains[:, None, :]], axis=2).astype(np.float32)
+    in_angle = omega[:, :, None] * offsets[None, None, :]
+    b = np.concatenate([np.cos(in_angle), np.sin(in_angle)], axis=1).astype(np.float32)
+
+    out = np.matmul(a, b).reshape(num_chords, num_blocks * block)[:, :num_samples]
+    out = np.ascontiguousarray(out)
+    out *= adsr(num_samples, sample_rate, envelope)
+
+    if normalize_peak_db is None:
+        counts = np.maximum(valid.sum(axis=1), 1).astype(np.float32)
+        out /= counts[:, None]
+    else:
+        target = np.float32(10.0 ** (normalize_peak_db / 20.0))
+        peaks = np.abs(out).max(axis=1)
+        scale = np.divide(target, peaks, out=np.zeros_like(peaks), where=peaks > 0)
+        out *= scale[:, None]
+
+    return out
+
+def click(sample_rate: int = 44100, accent: bool = False) -> np.ndarray:
+    """Short decaying sine tick for metronome and click tracks"""
+    frames = int(0.03 * sample_rate)
+    t = np.arange(frames, dtype=np.float32) / sample_rate
+    freq = 1500.0 if accent else 1000.0
+    return (0.5 * np.sin(2 * np.pi * freq * t) * np.exp(-t * 150.0)).astype(np.float32)
+
+def to_pcm(buffers: np.ndarray, bit_depth: int = 16, channels: int = 2) -> np.ndarray:
+    """Convert float buffers to interleavable integer PCM with the given channel count
+
+    A 1-D buffer yields (samples, channels); a 2-D batch yields (N, samples, channels).
+    16-bit PCM is int16; 24-bit PCM is int32 holding values in the 24-bit range.
+    """
+    full_scale = (1 << (bit_depth - 1)) - 1
+    dtype = np.int16 if bit_depth == 16 else np.int32
+    pcm = np.clip(np.rint(buffers * float(full_scale)), -full_scale - 1, full_scale).astype(dtype)
+    if channels == 1:
+        return pcm[..., None]
+    return np.repeat(pcm[..., None], channels, axis=-1)
+
+def to_pcm16(buffers: np.ndarray, channels: int = 2) -> np.ndarray:
+    """Convert float buffers to interleavable int16 PCM with the given channel count"""
+    return to_pcm(buffers, 16, channels)
@@ -1,6 +1,14 @@
-from typing import List, Dict, Tuple
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, Dict, Optional, Sequence, Tuple
+
 from app.models import KeySetting, ChordEvent
 
+# numpy (and the synth) load on first use of the chord table, so the UI can
+# import names and constants from here without them on the startup path
+if TYPE_CHECKING:
+    import numpy as np
+
 KEYS = ["C", "Db", "D", "Eb", "E", "F", "Gb", "G", "Ab", "A", "Bb", "B"]
 MODES = ["Ionian", "Dorian", "Phrygian", "Lydian", "Mixolydian", "Aeolian", "Locrian"]
 
@@ -32,30 +40,151 @@ def note_to_midi(note: str, octave: int) -> int:
                    "Gb": 6, "G": 7, "Ab": 8, "A": 9, "Bb": 10, "B": 11}
     return 12 * (octave + 1) + note_values[note]
 
+TENSIONS = [7, 9, 11, 13]
+VOICINGS = ["closed", "drop2", "root_shell"]
+INVERSIONS = ["root", "1st", "2nd", "3rd"]
+MAX_CHORD_NOTES = 7
+
+# Scale steps above the chord root: triad tones, then each tension
+_TRIAD_STEPS = (0, 2, 4)
+_TENSION_STEPS = {7: 6, 9: 8, 11: 10, 13: 12}
+
+def tension_mask(tensions: Iterable[int]) -> int:
+    """Bitmask of supported tensions (bit i = TENSIONS[i]); others are ignored"""
+    mask = 0
+    for tension in tensions:
+        if tension in TENSIONS:
+            mask |= 1 << TENSIONS.index(tension)
+    return mask
+
+def _scale_step(intervals: List[int], degree_idx: int, step: int) -> int:
+    """Semitones from the degree's root to the given diatonic step above it"""
+    pos = degree_idx + step
+    return intervals[pos % 7] + 12 * (pos // 7) - intervals[degree_idx]
+
+def _voice_chord(intervals: List[int], degree_idx: int, mask: int,
+                 voicing: str, inversion: int) -> List[int]:
+    """Chord tones relative to the root after inversion and voicing"""
+    steps = list(_TRIAD_STEPS) + [_TENSION_STEPS[t] for i, t in enumerate(TENSIONS)
+                                  if mask & (1 << i)]
+    tones = [_scale_step(intervals, degree_idx, step) for step in steps]
+
+    # Inversions rotate the chord tones (root, 3rd, 5th, 7th) into the bass
+    core = 4 if mask & 1 else 3
+    inversion = min(inversion, core - 1)
+    for i in range(inversion):
+        tones[i] += 12
+    fifth = tones[2]
+    tones.sort()
+
+    if voicing == "drop2" and len(tones) >= 3:
+        tones[-2] -= 12
+        tones.sort()
+    elif voicing == "root_shell" and inversion != 2:
+        tones.remove(fifth)
+
+    return tones
+
+@lru_cache(maxsize=None)
+def chord_table() -> Tuple["np.ndarray", "np.ndarray"]:
+    """Notes of every diatonic chord shape, relative to the tonic at octave -1
+
+    Returns (notes, lengths): notes is int8 with shape
+    (mode, degree, tension mask, voicing, inversion, MAX_CHORD_NOTES) and
+    lengths holds the note count of each shape; slots past the count are
+    NO_NOTE, but since relative notes can be negative, use lengths to mask. Built once on
+    first use; transposing to a tonic and octave is a single addition.
+    """
+    import numpy as np
+    from app.core.synth import NO_NOTE
+
+    shape = (len(MODES), 7, 1 << len(TENSIONS), len(VOICINGS), len(INVERSIONS))
+    notes = np.full(shape + (MAX_CHORD_NOTES,), NO_NOTE, dtype=np.int8)
+    lengths = np.zeros(shape, dtype=np.int8)
+
+    for mode_idx, mode in enumerate(MODES):
+        intervals = MODE_INTERVALS[mode]
+        for degree_idx in range(7):
+            root = intervals[degree_idx]
+            for mask in range(shape[2]):
+                for voicing_idx, voicing in enumerate(VOICINGS):
+                    for inversion_idx in range(len(INVERSIONS)):
+                        tones = _voice_chord(intervals, degree_idx, mask, voicing, inversion_idx)
+                        index = (mode_idx, degree_idx, mask, voicing_idx, inversion_idx)
+                        notes[index][:len(tones)] = [root + t for t in tones]
+                        lengths[index] = len(tones)
+
+    notes.setflags(write=False)
+    lengths.setflags(write=False)
+    return notes, lengths
+
+def chord_index(key_setting: KeySetting, degree_idx: int) -> Tuple[int, ...]:
+    """Integer table index (tonic, mode, degree, tension mask, voicing, inversion, octave)"""
+    return (
+        KEYS.index(key_setting.tonic),
+        MODES.index(key_setting.mode),
+        degree_idx,
+        tension_mask(key_setting.tensions),
+        VOICINGS.index(key_setting.voicing),
+        INVERSIONS.index(key_setting.inversion),
+        key_setting.octave_base,
+    )
+
+def chord_notes(tonic_idx: int, mode_idx: int, degree_idx: int, mask: int,
+                voicing_idx: int, inversion_idx: int, octave: int) -> List[int]:
+    """MIDI notes of one chord by table index (O(1))"""
+    notes, lengths = chord_table()
+    index = (mode_idx, degree_idx, mask, voicing_idx, inversion_idx)
+    offset = 12 * (octave + 1) + tonic_idx
+    return [int(n) + offset for n in notes[index][:lengths[index]]]
+
+def chord_matrix(indices: "np.ndarray") -> "np.ndarray":
+    """MIDI note matrix for many chords at once
+
+    indices is an (N, 7) integer array of chord_index tuples. Returns an
+    (N, MAX_CHORD_NOTES) int16 matrix padded with NO_NOTE, ready for
+    synth.render_chords.
+    """
+    import numpy as np
+    from app.core.synth import NO_NOTE
+
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1, 7)
+    notes, lengths = chord_table()
+    shape = (indices[:, 1], indices[:, 2], indices[:, 3], indices[:, 4], indices[:, 5])
+    # Relative notes may be negative, so padding is found by length, not by value
+    present = np.arange(MAX_CHORD_NOTES) < lengths[shape][:, None]
+    # KEYS is ordered by pitch class, so the tonic index is its semitone offset
+    offset = 12 * (indices[:, 6] + 1) + indices[:, 0]
+    absolute = notes[shape].astype(np.int16) + offset[:, None].astype(np.int16)
+    return np.where(present, absolute, NO_NOTE).astype(np.int16)
+
+def chord_quality(mode: str, degree_idx: int, tensions: Sequence[int]) -> str:
+    """Quality label used in chord specs and asset names, e.g. min7"""
+    quality = MODE_QUALITIES[mode][degree_idx]
+    return quality + "7" if 7 in tensions else quality
+
+# (third, fifth[, seventh]) in semitones above the root -> chord symbol suffix
+_CHORD_SYMBOLS = {
+    (4, 7): "maj", (3, 7): "min", (3, 6): "dim", (4, 8): "aug",
+    (4, 7, 11): "maj7", (4, 7, 10): "7", (3, 7, 10): "min7", (3, 7, 11): "minmaj7",
+    (3, 6, 10): "min7b5", (3, 6, 9): "dim7", (4, 8, 11): "augmaj7",
+}
+
+def chord_symbol(mode: str, degree_idx: int, tensions: Sequence[int]) -> str:
+    """Quality named by the chord's intervals, e.g. 7 vs maj7, min7b5 vs dim7
+
+    Unlike chord_quality, which asset names keep, two chords with different
+    notes never share a symbol. Tensions above the 7th are not named.
+    """
+    intervals = MODE_INTERVALS[mode]
+    steps = (2, 4, 6) if 7 in tensions else (2, 4)
+    return _CHORD_SYMBOLS[tuple(_scale_step(intervals, degree_idx, step) for step in steps)]
+
 def degree_to_chord(key_setting: KeySetting, degree_idx: int) -> Dict:
     """Generate chord specification from key and degree index (0-6)"""
-    intervals = MODE_INTERVALS[key_setting.mode]
-    
-    tonic_midi = note_to_midi(key_setting.tonic, key_setting.octave_base)
-    root_midi = tonic_midi + intervals[degree_idx]
-    
-    quality = MODE_QUALITIES[key_setting.mode][degree_idx]
-    
-    third_interval = 3 if quality == "min" or quality == "dim" else 4
-    fifth_interval = 6 if quality == "dim" else 7
-    
-    notes = [root_midi, root_midi + third_interval, root_midi + fifth_interval]
-    
-    if 7 in key_setting.tensions:
-        seventh_interval = 10 if quality == "maj" or quality == "min" else 11
-        if quality == "dim":
-            seventh_interval = 9
-        notes.append(root_midi + seventh_interval)
-        quality += "7"
-    
     return {
-        "notes": notes,
-        "quality": quality,
+        "notes": chord_notes(*chord_index(key_setting, degree_idx)),
+        "quality": chord_quality(key_setting.mode, degree_idx, key_setting.tensions),
         "degree": DEGREE_NAMES[degree_idx],
         "tensions": key_setting.tensions,
         "voicing": key_setting.voicing,
@@ -64,13 +193,142 @@ def degree_to_chord(key_setting: KeySetting, degree_idx: int) -> Dict:
 
 def chord_to_asset_path(key_setting: KeySetting, degree_idx: int) -> str:
     """Map chord to audio asset filename"""
-    chord = degree_to_chord(key_setting, degree_idx)
+    quality = chord_quality(key_setting.mode, degree_idx, key_setting.tensions)
     
     tensions_str = "-".join(map(str, key_setting.tensions)) if key_setting.tensions else ""
     
     filename = (f"{key_setting.tonic}_{key_setting.mode}_"
-                f"{chord['degree']}_{chord['quality']}_"
+                f"{DEGREE_NAMES[degree_idx]}_{quality}_"
                 f"{key_setting.voicing}_{key_setting.inversion}_"
                 f"{tensions_str}_oct{key_setting.octave_base}.wav")
     
     return f"audio/{filename}"
+
+# (tonic, mode, degree_idx, voicing, inversion, tensions, octave)
+ChordKey = Tuple[str, str, int, str, str, Tuple[int, ...], int]
+
+def parse_asset_path(path: str) -> Optional[ChordKey]:
+    """Recover chord parameters from a chord_to_asset_path filename
+
+    The voicing may itself contain underscores (root_shell), so fields are
+    taken from both ends of the name.
+    """
+    parts = Path(path).stem.split("_")
+    if len(parts) < 8 or not parts[-1].startswith("oct"):
+        return None
+
+    tonic, mode, degree = parts[0], parts[1], parts[2]
+    tensions_str, octave_str = parts[-2], parts[-1][3:]
+    inversion = parts[-3]
+    voicing = "_".join(parts[4:-3])
+
+    if degree not in DEGREE_NAMES or not octave_str.lstrip("-").isdigit():
+        return None
+    try:
+        tensions = tuple(int(t) for t in tensions_str.split("-")) if tensions_str else ()
+    except ValueError:
+        return None
+
+    return (tonic, mode, DEGREE_NAMES.index(degree), voicing, inversion,
+            tensions, int(octave_str))
+
+def chord_key_notes(key: ChordKey) -> List[int]:
+    """MIDI notes of a parsed asset chord key (ValueError on unknown names)"""
+    tonic, mode, degree_idx, voicing, inversion, tensions, octave = key
+    return chord_notes(KEYS.index(tonic), MODES.index(mode), degree_idx,
+                       tension_mask(tensions), VOICINGS.index(voicing),
+                       INVERSIONS.index(inversion), octave)
+
+# (tonic, mode, degree_idx, tensions) of a chord within a key
+ChordLocation = Tuple[str, str, int, Tuple[int, ...]]
+# (root, quality, parallel modes that build the chord on the degree)
+Interchange = Tuple[str, str, Tuple[str, ...]]
+
+def pitch_class_set(notes: Iterable[int]) -> int:
+    """12-bit mask of the pitch classes in notes (bit 0 = C)"""
+    mask = 0
+    for note in notes:
+        mask |= 1 << (int(note) % 12)
+    return mask
+
+@lru_cache(maxsize=None)
+def chord_locations() -> Tuple[Dict[int, Tuple[ChordLocation, ...]],
+                               Dict[Tuple[str, str], Tuple[ChordLocation, ...]]]:
+    """Inverted chord index: (by pitch-class set, by (root, quality)) -> locations
+
+    Covers every tonic, mode, degree and tension combination; voicing and
+    inversion don't change the pitch classes. The (root, quality) map is keyed
+    by chord_symbol and only holds triads and 7ths, since symbols don't name
+    9ths and up. Built once on first use.
+    """
+    notes, lengths = chord_table()
+    by_pitch_classes: Dict[int, List[ChordLocation]] = {}
+    by_root_quality: Dict[Tuple[str, str], List[ChordLocation]] = {}
+    closed, root_position = VOICINGS.index("closed"), INVERSIONS.index("root")
+
+    for mode_idx, mode in enumerate(MODES):
+        intervals = MODE_INTERVALS[mode]
+        for degree_idx in range(7):
+            for mask in range(1 << len(TENSIONS)):
+                index = (mode_idx, degree_idx, mask, closed, root_position)
+                relative = pitch_class_set(notes[index][:lengths[index]])
+                tensions = tuple(t for i, t in enumerate(TENSIONS) if mask & (1 << i))
+                quality = chord_symbol(mode, degree_idx, tensions)
+                for tonic_idx, tonic in enumerate(KEYS):
+                    # Rotating the relative mask transposes it to the tonic
+                    pcs = ((relative << tonic_idx) | (relative >> (12 - tonic_idx))) & 0xFFF
+                    location = (tonic, mode, degree_idx, tensions)
+                    by_pitch_classes.setdefault(pcs, []).append(location)
+                    if mask <= 1:
+                        root = KEYS[(tonic_idx + intervals[degree_idx]) % 12]
+                        by_root_quality.setdefault((root, quality), []).append(location)
+
+    return ({k: tuple(v) for k, v in by_pitch_classes.items()},
+            {k: tuple(v) for k, v in by_root_quality.items()})
+
+def keys_containing(notes: Iterable[int]) -> Tuple[ChordLocation, ...]:
+    """Every key, mode and degree whose chord has exactly these pitch classes"""
+    return chord_locations()[0].get(pitch_class_set(notes), ())
+
+def keys_containing_chord(root: str, quality: str) -> Tuple[ChordLocation, ...]:
+    """Every key, mode and degree that builds the chord, e.g. ("Eb", "maj7") or ("G", "7")
+
+    quality is a chord_symbol.
+    """
+    return chord_locations()[1].get((root, quality), ())
+
+def interchange_candidates(key_setting: KeySetting) -> Tuple[Tuple[Interchange, ...], ...]:
+    """Modal-interchange suggestions for all 7 degrees at once
+
+    For each degree, the distinct chords the parallel modes build on it that
+    differ from the current mode's, each with the modes that provide it and
+    named by chord_symbol.
+    Cached per tonic, mode and tensions, so refreshing on a key change is a lookup.
+    """
+    return _interchange_table(key_setting.tonic, key_setting.mode,
+                              tension_mask(key_setting.tensions))
+
+@lru_cache(maxsize=None)
+def _interchange_table(tonic: str, mode: str, mask: int) -> Tuple[Tuple[Interchange, ...], ...]:
+    tonic_idx = KEYS.index(tonic)
+    tensions = tuple(t for i, t in enumerate(TENSIONS) if mask & (1 << i))
+    table = []
+    for degree_idx in range(7):
+        own = _location_pitch_classes(tonic_idx, MODES.index(mode), degree_idx, mask)
+        seen = {own}
+        candidates = []
+        for mode_idx, other in enumerate(MODES):
+            pcs = _location_pitch_classes(tonic_idx, mode_idx, degree_idx, mask)
+            if pcs in seen:
+                continue
+            seen.add(pcs)
+            modes = tuple(m for t, m, d, ts in chord_locations()[0][pcs]
+                          if t == tonic and d == degree_idx and ts == tensions)
+            root = KEYS[(tonic_idx + MODE_INTERVALS[other][degree_idx]) % 12]
+            candidates.append((root, chord_symbol(other, degree_idx, tensions), modes))
+        table.append(tuple(candidates))
+    return tuple(table)
+
+def _location_pitch_classes(tonic_idx: int, mode_idx: int, degree_idx: int, mask: int) -> int:
+    return pitch_class_set(chord_notes(tonic_idx, mode_idx, degree_idx, mask,
+                                       VOICINGS.index("closed"), INVERSIONS.index("root"), 0))
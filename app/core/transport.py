@@ -0,0 +1,201 @@
+import base64
+import threading
+import time
+from collections import deque
+from dataclasses import replace
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.models import KeySetting, ChordEvent
+from app.core.audio import AudioEngine
+from app.core.metrics import LatencyMetrics
+from app.core.bank import wav_file_bytes
+from app.core.synth import click, to_pcm
+from app.core.theory import DEGREE_NAMES, chord_to_asset_path
+
+# The last stretch before a due time is spun instead of slept, for sub-ms accuracy
+_SPIN_SEC = 0.002
+
+CHORD = "chord"
+CLICK = "click"
+
+# (beat, kind, asset path or accent flag)
+ScheduledItem = Tuple[float, str, object]
+
+class Transport:
+    """Plays chord events at KeySetting.bpm from a dedicated clock thread
+
+    Due times are computed from each item's beat position against a single
+    monotonic start time, so waits never accumulate drift and the UI thread
+    or page updates can't push later items back. Items entering the
+    lookahead window are prefetched into the sample cache ahead of time,
+    leaving only voice binding on the trigger path, and each trigger is sent
+    to the client immediately instead of waiting for the next UI frame. How
+    late each trigger fires is recorded as "transport_jitter".
+    """
+
+    def __init__(self, audio_engine: AudioEngine, lookahead_sec: float = 0.25,
+                 beats_per_bar: int = 4, start_delay_sec: float = 0.05,
+                 click_gain: float = 0.6, clock: Callable[[], float] = time.monotonic):
+        self.audio_engine = audio_engine
+        self.lookahead_sec = lookahead_sec
+        self.beats_per_bar = beats_per_bar
+        self.start_delay_sec = start_delay_sec
+        self.click_gain = click_gain
+        self.clock = clock
+        self.jitter = LatencyMetrics(window=4096)
+        self.triggers = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._clicks: Dict[bool, str] = {}
+
+    @property
+    def playing(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def play(self, events: Sequence[ChordEvent], key_setting: KeySetting,
+             loop: bool = False, metronome: bool = False,
+             on_finished: Optional[Callable[[], None]] = None) -> bool:
+        """Start playback of events (and/or the metronome), replacing any current playback
+
+        The events and key setting are copied, so later edits don't affect
+        what is playing. Returns False if there is nothing to play.
+        """
+        self.stop()
+        events = [e for e in events if e.duration_beats > 0]
+        if not events and not metronome:
+            return False
+
+        setting = replace(key_setting, tensions=list(key_setting.tensions))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(events, setting, loop, metronome, on_finished, self._stop),
+            name="transport", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Stop playback and silence the voices still sounding"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        if thread is not threading.current_thread():
+            thread.join()
+        self._thread = None
+        self.audio_engine.stop_all()
+
+    def jitter_stats(self) -> Dict[str, float]:
+        """Trigger lateness percentiles in ms over recent playback"""
+        return self.jitter.snapshot().get("transport_jitter", {})
+
+    def _event_paths(self, events: List[ChordEvent], key_setting: KeySetting) -> List[str]:
+        """Asset path of each event in the progression's key"""
+        paths = []
+        for event in events:
+            setting = replace(key_setting, voicing=event.voicing, inversion=event.inversion,
+                              tensions=list(event.tension))
+            paths.append(chord_to_asset_path(setting, DEGREE_NAMES.index(event.degree)))
+        return paths
+
+    def _schedule(self, events: List[ChordEvent], paths: List[str], loop: bool,
+                  metronome: bool) -> Iterator[ScheduledItem]:
+        """Chord and click items in beat order; endless when looping or metronome-only"""
+        next_click = 0
+        beat = 0.0
+        while True:
+            for event, path in zip(events, paths):
+                while metronome and next_click <= beat:
+                    yield float(next_click), CLICK, next_click % self.beats_per_bar == 0
+                    next_click += 1
+                yield beat, CHORD, path
+                beat += event.duration_beats
+            if events and not loop:
+                break
+            if not events:
+                yield float(next_click), CLICK, next_click % self.beats_per_bar == 0
+                next_click += 1
+        while metronome and next_click < beat:
+            yield float(next_click), CLICK, next_click % self.beats_per_bar == 0
+            next_click += 1
+
+    def _click_data(self, accent: bool) -> str:
+        data = self._clicks.get(accent)
+        if data is None:
+            # Rendered like the engine's samples, at the output rate
+            fmt = self.audio_engine.render_format
+            raw = wav_file_bytes(to_pcm(click(fmt.sample_rate, accent), fmt.bit_depth, fmt.channels),
+                                 fmt)
+            data = self._clicks[accent] = base64.b64encode(raw).decode("ascii")
+        return data
+
+    def _wait_until(self, due: float, stop: threading.Event) -> bool:
+        """Sleep, then spin, until due; returns False if stopped first"""
+        while True:
+            remaining = due - self.clock()
+            if stop.is_set():
+                return False
+            if remaining <= 0:
+                return True
+            if remaining > _SPIN_SEC:
+                stop.wait(remaining - _SPIN_SEC)
+            else:
+                time.sleep(0)
+
+    def _run(self, events: List[ChordEvent], key_setting: KeySetting, loop: bool,
+             metronome: bool, on_finished: Optional[Callable[[], None]],
+             stop: threading.Event):
+        seconds_per_beat = 60.0 / key_setting.bpm
+        paths = self._event_paths(events, key_setting)
+        items = self._schedule(events, paths, loop, metronome)
+        window: Deque[Tuple[float, str, object]] = deque()
+        exhausted = False
+        # Warm everything up front so first-use costs land before the clock starts
+        for path in set(paths):
+            self.audio_engine.prefetch(path)
+        if metronome:
+            self._click_data(True)
+            self._click_data(False)
+        start = self.clock() + self.start_delay_sec
+
+        while not stop.is_set():
+            horizon = self.clock() + self.lookahead_sec
+            while not exhausted and (not window or window[-1][0] < horizon):
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                beat, kind, payload = item
+                if kind == CHORD:
+                    self.audio_engine.prefetch(payload)
+                else:
+                    self._click_data(payload)
+                window.append((start + beat * seconds_per_beat, kind, payload))
+
+            if not window:
+                break
+            due = window[0][0]
+            if not self._wait_until(due, stop):
+                return
+
+            # Items sharing a due time (a chord on a click) go out in one update
+            lateness_ms = (self.clock() - due) * 1000
+            with self.audio_engine.scheduler.batch():
+                while window and window[0][0] <= due:
+                    _, kind, payload = window.popleft()
+                    if kind == CHORD:
+                        self.audio_engine.play_sample(payload)
+                    else:
+                        self.audio_engine.play_data("metronome", self._click_data(payload),
+                                                    self.click_gain)
+                    self.triggers += 1
+            self.jitter.record("transport_jitter", lateness_ms)
+            self.audio_engine.metrics.record("transport_jitter", lateness_ms)
+
+        if stop.is_set():
+            return
+        # Let the last chord ring for its duration before reporting the end
+        total_beats = sum(e.duration_beats for e in events)
+        if not self._wait_until(start + total_beats * seconds_per_beat, stop):
+            return
+        if on_finished is not None:
+            on_finished()
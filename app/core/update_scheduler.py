@@ -0,0 +1,116 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import flet as ft
+
+from app.core.metrics import LatencyMetrics
+
+class UpdateScheduler:
+    """Coalesces page.update() calls into at most one flush per frame
+
+    The first request after a quiet frame flushes immediately, so a tap's
+    audio reaches the client without waiting. Requests arriving within the
+    same frame only mark the page dirty and are sent together by one trailing
+    flush when the frame interval has passed.
+    """
+
+    def __init__(self, page: ft.Page, interval: float = 1 / 60,
+                 metrics: Optional[LatencyMetrics] = None):
+        self.page = page
+        self.interval = interval
+        self.metrics = metrics or LatencyMetrics(enabled=False)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self._after_flush: List[Callable[[], None]] = []
+        self._batch_depth = 0
+        self._last_flush = 0.0
+        self.requests = 0
+        self.flushes = 0
+        self.unchanged_skips = 0
+
+    def request(self):
+        """Mark the page dirty; flush now or at the end of the current frame"""
+        with self._lock:
+            self.requests += 1
+            self._dirty = True
+            if self._timer is not None or self._batch_depth:
+                return
+            delay = self._last_flush + self.interval - time.monotonic()
+            if delay > 0:
+                self._timer = threading.Timer(delay, self._flush_deferred)
+                self._timer.daemon = True
+                self._timer.start()
+                return
+        self.flush()
+
+    @contextmanager
+    def batch(self):
+        """Collect the requests made inside the block and flush them together
+        immediately on exit, regardless of the frame interval (for changes that
+        must reach the client at a precise time)"""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                outermost = self._batch_depth == 0
+            if outermost:
+                self.flush()
+
+    def after_flush(self, callback: Callable[[], None]):
+        """Run callback right after the next flush, e.g. a method call that
+        needs a control to be on the client already"""
+        with self._lock:
+            self._after_flush.append(callback)
+
+    def flush(self):
+        """Send pending changes to the client now, if there are any"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            self._last_flush = time.monotonic()
+            self.flushes += 1
+            callbacks, self._after_flush = self._after_flush, []
+        with self.metrics.phase("page_update"):
+            self.page.update()
+        for callback in callbacks:
+            callback()
+
+    def _flush_deferred(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def set_value(self, control: ft.Control, value) -> bool:
+        """Set a control's value and request an update only if it changed"""
+        if control.value == value:
+            self.unchanged_skips += 1
+            return False
+        control.value = value
+        self.request()
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """Request/flush counters; coalesced is requests that did not cause their own flush"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "flushes": self.flushes,
+                "coalesced": self.requests - self.flushes,
+                "unchanged_skips": self.unchanged_skips,
+                "pending": int(self._dirty),
+            }
+
+    def close(self):
+        """Cancel any deferred flush and send what is pending"""
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        self.flush()
@@ -0,0 +1,337 @@
+"""Verification pass over a rendered sample bank
+
+Checks every unique sample against the spec's audio_validation and
+sample_format: detected pitches within 1 cent of the notes its filenames
+spell, peak at the normalization target without clipping, and silent
+head/tail edges from the attack and release fades.
+
+Examples:
+    python -m app.core.verify
+    python -m app.core.verify --bank assets/audio/bank.dpb --jobs 8
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import scipy.fft
+
+from app.core.bank import PackedBank, read_wav
+from app.core.manifest import MANIFEST_NAME
+from app.core.synth import midi_to_freq
+from app.core.theory import chord_key_notes, parse_asset_path
+
+# audio_validation: frequency error < 1 cent
+MAX_CENTS = 1.0
+# sample_format.normalize_peak_db, with room for 16-bit rounding
+PEAK_TARGET_DB = -1.0
+PEAK_TOLERANCE_DB = 0.1
+# A faded edge: first/last sample near silence, first/last ms well below the peak
+EDGE_SAMPLE_DB = -60.0
+EDGE_MS = 1.0
+EDGE_MAX_DB = -12.0
+# Analysis skips the attack and release so the spectrum sees steady tones
+ANALYSIS_SKIP_HEAD_MS = 20.0
+ANALYSIS_SKIP_TAIL_MS = 100.0
+# Peaks are searched within this far of each expected note
+SEARCH_CENTS = 50.0
+# Expected notes must reach this level relative to the loudest one
+MIN_NOTE_DB = -30.0
+# Other spectral peaks this loud (relative to the loudest) count as stray tones
+STRAY_PEAK_DB = -20.0
+MAX_HARMONIC = 8
+
+def _db(ratio: np.ndarray) -> np.ndarray:
+    return 20.0 * np.log10(np.maximum(ratio, 1e-12))
+
+def expected_notes(filename: str) -> Optional[List[int]]:
+    """Sorted MIDI notes a chord filename spells, as degree_to_chord builds them"""
+    key = parse_asset_path(filename)
+    if key is None:
+        return None
+    try:
+        return sorted(chord_key_notes(key))
+    except ValueError:
+        return None
+
+def collect_samples(bank_dir: str = "assets/audio",
+                    bank_file: Optional[str] = None) -> Tuple[List[Dict], List[Dict]]:
+    """Unique samples to analyse and alias problems found without any audio
+
+    Each sample is {"id", "file", "notes", "aliases"}: file is a WAV path
+    relative to bank_dir, or a sample name when bank_file is given. notes come
+    from the aliases' filenames; aliases spelling other notes than the rest
+    of their sample's, and manifest notes that disagree, are reported.
+    """
+    problems: List[Dict] = []
+    if bank_file is not None:
+        bank = PackedBank(bank_file)
+        try:
+            aliases = dict(bank.aliases) or {name: name for name in bank.names()}
+            files = {name: name for name in bank.names()}
+            params: Dict[str, Dict] = {}
+        finally:
+            bank.close()
+    else:
+        manifest_path = Path(bank_dir) / MANIFEST_NAME
+        manifest = {}
+        if manifest_path.exists():
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+        params = manifest.get("samples", {})
+        aliases = manifest.get("aliases", {})
+        if not aliases:
+            # One file per chord name, as before content addressing
+            names = sorted(p.name for p in Path(bank_dir).glob("*.wav"))
+            aliases = {name: name for name in names}
+            params = {name: {"file": name} for name in names}
+        files = {digest: entry["file"] for digest, entry in params.items()}
+
+    spellings: Dict[str, Dict[Tuple[int, ...], List[str]]] = {}
+    for alias, digest in sorted(aliases.items()):
+        if digest not in files:
+            problems.append({"alias": alias, "failures": ["missing_sample"]})
+            continue
+        notes = expected_notes(alias)
+        if notes is None:
+            problems.append({"alias": alias, "failures": ["unparsable_name"]})
+            continue
+        spellings.setdefault(digest, {}).setdefault(tuple(notes), []).append(alias)
+
+    samples: List[Dict] = []
+    for digest, by_notes in spellings.items():
+        # The spelling most aliases agree on is what the sample should sound
+        notes = max(by_notes, key=lambda spelled: len(by_notes[spelled]))
+        for other, names in by_notes.items():
+            if other != notes:
+                problems += [{"alias": alias, "sample": digest, "expected": list(other),
+                              "failures": ["alias_notes"]} for alias in names]
+        listed = params.get(digest, {}).get("notes")
+        if listed is not None and sorted(listed) != list(notes):
+            problems.append({"sample": digest, "listed": listed, "expected": list(notes),
+                             "failures": ["manifest_notes"]})
+        samples.append({"id": digest, "file": files[digest], "notes": list(notes),
+                        "aliases": sum(len(names) for names in by_notes.values())})
+
+    return samples, problems
+
+def _read(source: str, sample: Dict, bank: Optional[PackedBank]) -> Tuple[int, np.ndarray]:
+    """(sample rate, mono float32 in [-1, 1]) via a memory-mapped read"""
+    if bank is not None:
+        fmt, pcm = bank.format, bank.frames(sample["file"])
+    else:
+        fmt, pcm = read_wav(str(Path(source) / sample["file"]))
+    return fmt.sample_rate, pcm.mean(axis=1, dtype=np.float32) / np.float32(fmt.full_scale)
+
+def analyse(buffers: np.ndarray, sample_rate: int, notes: List[List[int]]) -> List[Dict]:
+    """Pitch, level and fade measurements for equal-length mono buffers
+
+    All buffers go through one batched FFT. Each expected note's peak is
+    found within SEARCH_CENTS and refined by parabolic interpolation of the
+    log magnitude, which is accurate to well under 0.1 cent with a Hann
+    window and 2x zero padding.
+    """
+    count, length = buffers.shape
+    peaks = np.abs(buffers).max(axis=1)
+    clipped = (np.abs(buffers) >= 1.0).any(axis=1)
+    edge = max(1, int(EDGE_MS * sample_rate / 1000))
+    head_db = _db(np.abs(buffers[:, :edge]).max(axis=1) / np.maximum(peaks, 1e-12))
+    tail_db = _db(np.abs(buffers[:, -edge:]).max(axis=1) / np.maximum(peaks, 1e-12))
+    first_db = _db(np.abs(buffers[:, 0]))
+    last_db = _db(np.abs(buffers[:, -1]))
+
+    start = int(ANALYSIS_SKIP_HEAD_MS * sample_rate / 1000)
+    stop = length - int(ANALYSIS_SKIP_TAIL_MS * sample_rate / 1000)
+    segment = buffers[:, start:stop] if stop - start > sample_rate // 20 else buffers
+    nfft = 1 << (int(np.ceil(np.log2(segment.shape[1]))) + 1)
+    window = np.hanning(segment.shape[1]).astype(np.float32)
+    spectrum = np.abs(scipy.fft.rfft(segment * window, n=nfft, axis=1))
+    log_spectrum = np.log(spectrum + 1e-12)
+    bins = spectrum.shape[1]
+
+    # One row per (buffer, note) pair
+    rows = np.repeat(np.arange(count), [len(n) for n in notes])
+    expected = midi_to_freq(np.concatenate([np.asarray(n, dtype=np.float64) for n in notes]))
+    centre = expected * nfft / sample_rate
+    half = np.ceil(centre * (2.0 ** (SEARCH_CENTS / 1200.0) - 1.0)).astype(np.int64)
+    offsets = np.arange(-half.max(), half.max() + 1)
+    candidates = np.clip(np.rint(centre).astype(np.int64)[:, None] + offsets, 1, bins - 2)
+    magnitudes = np.where(np.abs(offsets) <= half[:, None], spectrum[rows[:, None], candidates], -1.0)
+    peak_bin = candidates[np.arange(len(rows)), magnitudes.argmax(axis=1)]
+
+    a = log_spectrum[rows, peak_bin - 1]
+    b = log_spectrum[rows, peak_bin]
+    c = log_spectrum[rows, peak_bin + 1]
+    denominator = a - 2.0 * b + c
+    delta = np.divide(0.5 * (a - c), denominator, out=np.zeros_like(a), where=denominator != 0)
+    detected = (peak_bin + delta) * sample_rate / nfft
+    cents = 1200.0 * np.log2(np.maximum(detected, 1e-9) / expected)
+    levels = spectrum[rows, peak_bin]
+
+    # Local maxima loud enough to be a tone, for the stray-peak check
+    local_max = ((spectrum[:, 1:-1] > spectrum[:, :-2]) & (spectrum[:, 1:-1] >= spectrum[:, 2:]))
+
+    results = []
+    offset = 0
+    for i in range(count):
+        n = len(notes[i])
+        note_cents = cents[offset:offset + n]
+        note_levels = levels[offset:offset + n]
+        loudest = note_levels.max() if n else 0.0
+        note_db = _db(note_levels / max(loudest, 1e-12))
+        freqs = expected[offset:offset + n]
+        offset += n
+
+        threshold = loudest * 10.0 ** (STRAY_PEAK_DB / 20.0)
+        stray_bins = np.nonzero(local_max[i] & (spectrum[i, 1:-1] > threshold))[0] + 1
+        stray = []
+        if n:
+            harmonics = (freqs[:, None] * np.arange(1, MAX_HARMONIC + 1)).ravel()
+            for freq in stray_bins * sample_rate / nfft:
+                if np.abs(1200.0 * np.log2(freq / harmonics)).min() > SEARCH_CENTS:
+                    stray.append(round(float(freq), 1))
+
+        results.append({
+            "cents": [round(float(c), 4) for c in note_cents],
+            "note_db": [round(float(d), 1) for d in note_db],
+            "stray_hz": stray,
+            "peak_db": round(float(_db(peaks[i])), 3),
+            "clipped": bool(clipped[i]),
+            "head_db": round(float(head_db[i]), 1),
+            "tail_db": round(float(tail_db[i]), 1),
+            "first_db": round(float(first_db[i]), 1),
+            "last_db": round(float(last_db[i]), 1),
+        })
+    return results
+
+def failures(result: Dict) -> List[str]:
+    """Names of the checks a sample's measurements fail"""
+    failed = []
+    if any(abs(c) >= MAX_CENTS for c in result["cents"]):
+        failed.append("pitch")
+    if any(d < MIN_NOTE_DB for d in result["note_db"]):
+        failed.append("missing_note")
+    if result["stray_hz"]:
+        failed.append("stray_tone")
+    if result["clipped"]:
+        failed.append("clipping")
+    if abs(result["peak_db"] - PEAK_TARGET_DB) > PEAK_TOLERANCE_DB:
+        failed.append("peak_level")
+    if result["head_db"] > EDGE_MAX_DB or result["first_db"] > EDGE_SAMPLE_DB:
+        failed.append("head_fade")
+    if result["tail_db"] > EDGE_MAX_DB or result["last_db"] > EDGE_SAMPLE_DB:
+        failed.append("tail_fade")
+    return failed
+
+def _verify_batch(source: str, samples: List[Dict], packed: bool) -> List[Dict]:
+    """Read and analyse a batch of samples (runs in a worker process)
+
+    Samples are grouped by length and rate so each group is one FFT call.
+    """
+    bank = PackedBank(source) if packed else None
+    try:
+        groups: Dict[Tuple[int, int], List[Tuple[Dict, np.ndarray]]] = {}
+        reports = []
+        for sample in samples:
+            try:
+                rate, mono = _read(source, sample, bank)
+            except (OSError, ValueError) as e:
+                reports.append(dict(sample, failures=["unreadable"], error=str(e)))
+                continue
+            groups.setdefault((rate, len(mono)), []).append((sample, mono))
+
+        for (rate, _), group in groups.items():
+            measured = analyse(np.stack([mono for _, mono in group]), rate,
+                               [sample["notes"] for sample, _ in group])
+            for (sample, _), result in zip(group, measured):
+                result = dict(sample, sample_rate=rate, **result)
+                result["failures"] = failures(result)
+                reports.append(result)
+        return reports
+    finally:
+        if bank is not None:
+            bank.close()
+
+def verify_bank(bank_dir: str = "assets/audio", bank_file: Optional[str] = None,
+                jobs: Optional[int] = None, report_path: Optional[str] = None) -> Dict:
+    """Verify every unique sample of a WAV bank directory or packed bank
+
+    Work is spread over a process pool in batches. Returns the report (and
+    writes it as JSON to report_path when given).
+    """
+    start = time.perf_counter()
+    samples, problems = collect_samples(bank_dir, bank_file)
+    source = bank_file if bank_file is not None else bank_dir
+    packed = bank_file is not None
+
+    workers = jobs or os.cpu_count() or 1
+    batch_size = max(1, min(64, len(samples) // (workers * 4) or 1))
+    batches = [samples[i:i + batch_size] for i in range(0, len(samples), batch_size)]
+
+    results: List[Dict] = []
+    if workers == 1:
+        for batch in batches:
+            results += _verify_batch(source, batch, packed)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for done in executor.map(_verify_batch, [source] * len(batches), batches,
+                                     [packed] * len(batches)):
+                results += done
+
+    results.sort(key=lambda r: r["id"])
+    by_check: Dict[str, int] = {}
+    for entry in results + problems:
+        for name in entry["failures"]:
+            by_check[name] = by_check.get(name, 0) + 1
+    cents = [abs(c) for r in results for c in r.get("cents", [])]
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "source": str(source),
+        "limits": {"max_cents": MAX_CENTS, "peak_target_db": PEAK_TARGET_DB,
+                   "peak_tolerance_db": PEAK_TOLERANCE_DB, "edge_max_db": EDGE_MAX_DB},
+        "summary": {
+            "samples": len(results),
+            "aliases": sum(r.get("aliases", 0) for r in results),
+            "failed": sum(1 for r in results if r["failures"]) + len(problems),
+            "by_check": by_check,
+            "max_abs_cents": round(max(cents), 4) if cents else None,
+            "elapsed_sec": round(time.perf_counter() - start, 3),
+            "jobs": workers,
+        },
+        "problems": problems,
+        "samples": results,
+    }
+
+    if report_path:
+        out = Path(report_path)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Verify pitch, level and fades of the sample bank")
+    parser.add_argument("--bank-dir", default="assets/audio", help="WAV bank directory")
+    parser.add_argument("--bank", default=None, help="packed bank file to verify instead")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--report", default="data/bank_verification.json", help="JSON report path")
+    args = parser.parse_args()
+
+    report = verify_bank(args.bank_dir, args.bank, args.jobs, args.report)
+    summary = report["summary"]
+    for entry in report["problems"] + [r for r in report["samples"] if r["failures"]]:
+        name = entry.get("file") or entry.get("alias") or entry.get("sample")
+        print(f"FAILED {name}: {', '.join(entry['failures'])}")
+    print(f"Verified {summary['samples']} samples ({summary['aliases']} aliases) in "
+          f"{summary['elapsed_sec']:.2f}s with {summary['jobs']} jobs: "
+          f"{summary['failed']} failed, max pitch error {summary['max_abs_cents']} cents")
+    print(f"Report written to {args.report}")
+    sys.exit(1 if summary["failed"] else 0)
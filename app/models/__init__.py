@@ -3,7 +3,7 @@ from typing import List, Optional
 from datetime import datetime
 import uuid
 
-@dataclass
+@dataclass(slots=True)
 class KeySetting:
     """Musical context configuration"""
     tonic: str
@@ -14,7 +14,7 @@ class KeySetting:
     inversion: str = "root"
     tensions: List[int] = field(default_factory=list)
 
-@dataclass
+@dataclass(slots=True)
 class ChordEvent:
     """Single chord play event"""
     degree: str
@@ -25,7 +25,7 @@ class ChordEvent:
     duration_beats: float = 1.0
     sustain: bool = False
 
-@dataclass
+@dataclass(slots=True)
 class Progression:
     """Complete chord sequence"""
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
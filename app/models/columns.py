@@ -0,0 +1,230 @@
+import json
+import struct
+import sys
+from array import array
+from dataclasses import asdict, replace
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+from app.models import ChordEvent, KeySetting, Progression
+
+# Bumped whenever the byte layout changes; decode() rejects versions it doesn't know
+ENCODING_VERSION = 1
+
+EVENTS_MAGIC = b"DPEV"
+PROGRESSION_MAGIC = b"DPPG"
+
+# magic, version, event count, string table size
+_EVENTS_HEADER = struct.Struct("<4sBIH")
+# magic, version, metadata length
+_PROGRESSION_HEADER = struct.Struct("<4sBI")
+_STRING_LENGTH = struct.Struct("<H")
+# Limits of the "H" string count in the header and length before each string
+_MAX_STRINGS = 0xFFFF
+_MAX_STRING_BYTES = 0xFFFF
+
+# Column typecodes: string codes, tension bitmask, beats, flags
+_CODE, _MASK, _BEATS, _FLAG = "H", "I", "d", "B"
+_STRING_COLUMNS = ("degree", "quality", "inversion", "voicing")
+_COLUMNS = _STRING_COLUMNS + ("tension", "duration_beats", "sustain")
+_MAX_TENSION = 31
+
+def tension_bits(tensions: Iterable[int]) -> int:
+    """Bitmask with bit n set for tension n (0-31)"""
+    mask = 0
+    for tension in tensions:
+        if not 0 <= tension <= _MAX_TENSION:
+            raise ValueError(f"Tension {tension} can't be stored in a bitmask")
+        mask |= 1 << tension
+    return mask
+
+def tension_list(mask: int) -> List[int]:
+    """Tensions of a tension_bits mask, ascending"""
+    return list(_tensions(mask))
+
+@lru_cache(maxsize=256)
+def _tensions(mask: int) -> Tuple[int, ...]:
+    return tuple(n for n in range(_MAX_TENSION + 1) if mask & (1 << n))
+
+class EventColumns:
+    """Array-backed store of chord events, one typed column per field
+
+    Strings are held once in a shared table and referenced by code, tensions
+    as a bitmask, so an event costs about 21 bytes instead of a dataclass
+    instance plus its tension list. Events are materialized as ChordEvent
+    only when read.
+    """
+
+    __slots__ = ("strings", "_codes", "degree", "quality", "inversion", "voicing",
+                 "tension", "duration_beats", "sustain")
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self.degree = array(_CODE)
+        self.quality = array(_CODE)
+        self.inversion = array(_CODE)
+        self.voicing = array(_CODE)
+        self.tension = array(_MASK)
+        self.duration_beats = array(_BEATS)
+        self.sustain = array(_FLAG)
+
+    @classmethod
+    def from_events(cls, events: Iterable[ChordEvent]) -> "EventColumns":
+        columns = cls()
+        for event in events:
+            columns.append(event)
+        return columns
+
+    @classmethod
+    def from_dicts(cls, events: Iterable[dict]) -> "EventColumns":
+        """Build from serialized (asdict) events"""
+        return cls.from_events(ChordEvent(**e) for e in events)
+
+    def _code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            if len(self.strings) >= _MAX_STRINGS:
+                raise ValueError("Too many distinct strings for one event store")
+            size = len(value.encode("utf-8"))
+            if size > _MAX_STRING_BYTES:
+                raise ValueError(f"String of {size} bytes is too long for an event store")
+            code = self._codes[value] = len(self.strings)
+            self.strings.append(sys.intern(value))
+        return code
+
+    def append(self, event: ChordEvent):
+        """Add an event at the end"""
+        # Everything that can raise runs first, so a rejected event leaves no partial row
+        codes = [self._code(getattr(event, name)) for name in _STRING_COLUMNS]
+        mask = tension_bits(event.tension)
+        for name, code in zip(_STRING_COLUMNS, codes):
+            getattr(self, name).append(code)
+        self.tension.append(mask)
+        self.duration_beats.append(event.duration_beats)
+        self.sustain.append(int(event.sustain))
+
+    def __len__(self) -> int:
+        return len(self.degree)
+
+    def __getitem__(self, index: int) -> ChordEvent:
+        strings = self.strings
+        return ChordEvent(
+            degree=strings[self.degree[index]],
+            quality=strings[self.quality[index]],
+            tension=tension_list(self.tension[index]),
+            inversion=strings[self.inversion[index]],
+            voicing=strings[self.voicing[index]],
+            duration_beats=self.duration_beats[index],
+            sustain=bool(self.sustain[index]),
+        )
+
+    def __iter__(self):
+        strings = self.strings
+        for degree, quality, inversion, voicing, mask, beats, sustain in zip(
+                self.degree, self.quality, self.inversion, self.voicing,
+                self.tension, self.duration_beats, self.sustain):
+            yield ChordEvent(strings[degree], strings[quality], list(_tensions(mask)),
+                             strings[inversion], strings[voicing], beats, bool(sustain))
+
+    def to_events(self) -> List[ChordEvent]:
+        return list(self)
+
+    def degrees(self) -> List[str]:
+        """Degree of each event, without materializing the events"""
+        strings = self.strings
+        return [strings[code] for code in self.degree]
+
+    def to_dicts(self) -> List[dict]:
+        """Events in their serialized (asdict) form"""
+        return [asdict(event) for event in self]
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the columns themselves, excluding the string table"""
+        return sum(getattr(self, name).itemsize * len(self) for name in _COLUMNS)
+
+    def encode(self) -> bytes:
+        """Versioned little-endian binary form; see decode()"""
+        parts = [_EVENTS_HEADER.pack(EVENTS_MAGIC, ENCODING_VERSION, len(self), len(self.strings))]
+        for value in self.strings:
+            raw = value.encode("utf-8")
+            parts.append(_STRING_LENGTH.pack(len(raw)))
+            parts.append(raw)
+        for name in _COLUMNS:
+            column = getattr(self, name)
+            if sys.byteorder == "big":
+                column = array(column.typecode, column)
+                column.byteswap()
+            parts.append(column.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def decode(cls, data: bytes) -> "EventColumns":
+        """Parse encode() output (ValueError on a bad, truncated or newer encoding)"""
+        view = memoryview(data)
+        if len(view) < _EVENTS_HEADER.size:
+            raise ValueError("Truncated event data")
+        magic, version, count, string_count = _EVENTS_HEADER.unpack_from(view)
+        if magic != EVENTS_MAGIC:
+            raise ValueError("Not an event encoding")
+        if version > ENCODING_VERSION:
+            raise ValueError(f"Unsupported event encoding version {version}")
+
+        columns = cls()
+        offset = _EVENTS_HEADER.size
+        try:
+            for _ in range(string_count):
+                (length,) = _STRING_LENGTH.unpack_from(view, offset)
+                offset += _STRING_LENGTH.size
+                if offset + length > len(view):
+                    raise ValueError("Truncated event data")
+                value = sys.intern(bytes(view[offset:offset + length]).decode("utf-8"))
+                # Codes index the table as stored, even if a corrupt table repeats a string
+                columns._codes.setdefault(value, len(columns.strings))
+                columns.strings.append(value)
+                offset += length
+            for name in _COLUMNS:
+                column = getattr(columns, name)
+                end = offset + column.itemsize * count
+                if end > len(view):
+                    raise ValueError("Truncated event data")
+                column.frombytes(view[offset:end])
+                if sys.byteorder == "big":
+                    column.byteswap()
+                offset = end
+        except struct.error as e:
+            raise ValueError("Truncated event data") from e
+        for name in _STRING_COLUMNS:
+            column = getattr(columns, name)
+            if column and max(column) >= string_count:
+                raise ValueError(f"Event {name} code out of range of the string table")
+        return columns
+
+def encode_progression(progression: Progression) -> bytes:
+    """Progression as versioned bytes: a JSON metadata header, then its event columns"""
+    meta = asdict(replace(progression, events=[]))
+    del meta["events"]
+    raw = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    return (_PROGRESSION_HEADER.pack(PROGRESSION_MAGIC, ENCODING_VERSION, len(raw)) + raw
+            + EventColumns.from_events(progression.events).encode())
+
+def decode_progression(data: bytes) -> Progression:
+    """Inverse of encode_progression (ValueError on a bad or newer encoding)"""
+    view = memoryview(data)
+    if len(view) < _PROGRESSION_HEADER.size:
+        raise ValueError("Truncated progression data")
+    magic, version, length = _PROGRESSION_HEADER.unpack_from(view)
+    if magic != PROGRESSION_MAGIC:
+        raise ValueError("Not a progression encoding")
+    if version > ENCODING_VERSION:
+        raise ValueError(f"Unsupported progression encoding version {version}")
+
+    start = _PROGRESSION_HEADER.size
+    meta = json.loads(bytes(view[start:start + length]))
+    key_setting = meta.pop("key_setting")
+    return Progression(
+        key_setting=KeySetting(**key_setting) if key_setting else None,
+        events=EventColumns.decode(view[start + length:]).to_events(),
+        **meta,
+    )
@@ -1,20 +1,241 @@
-from pathlib import Path
-from app.models import Progression
+import os
 import shutil
+import subprocess
+import tempfile
+import time
+import wave
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.models import Progression, KeySetting, ChordEvent
+from app.core.synth import Envelope, click, notes_matrix, render_chords
+from app.core.theory import DEGREE_NAMES, degree_to_chord
+
+# (start frame, buffer) of one sound placed on the output timeline
+Placement = Tuple[int, np.ndarray]
 
 class ExportService:
     """Handles audio export"""
-    
-    def export_wav(self, progression: Progression, output_path: str) -> bool:
-        """Export progression to WAV file (simplified for MVP)"""
-        dummy_sample = Path("assets/audio/C_Ionian_I_maj_drop2_root__oct4.wav")
-        if dummy_sample.exists():
-            shutil.copy(dummy_sample, output_path)
-            print(f"Exported (placeholder): {output_path}")
-            return True
-        return False
-    
-    def export_m4a(self, progression: Progression, output_path: str) -> bool:
-        """Export progression to M4A file (not implemented in MVP)"""
-        print("M4A export not yet implemented")
-        return False
+
+    def __init__(self, sample_rate: int = 44100, block_frames: int = 8192,
+                 normalize_peak_db: float = -1.0, head_fade_ms: float = 5.0,
+                 tail_fade_ms: float = 50.0, beats_per_bar: int = 4):
+        self.sample_rate = sample_rate
+        self.block_frames = block_frames
+        self.normalize_peak_db = normalize_peak_db
+        self.head_fade_ms = head_fade_ms
+        self.tail_fade_ms = tail_fade_ms
+        self.beats_per_bar = beats_per_bar
+        self.envelope = Envelope()
+        self.last_stats: Dict[str, float] = {}
+
+    def _timeline(self, progression: Progression, length_bars: Optional[int],
+                  loop: bool) -> Tuple[List[Tuple[float, ChordEvent]], float]:
+        """Place events on a beat timeline and return (start beat, event) pairs and total beats"""
+        events = [e for e in progression.events if e.duration_beats > 0]
+        if length_bars is None:
+            total_beats = sum(e.duration_beats for e in events)
+        else:
+            total_beats = float(length_bars * self.beats_per_bar)
+
+        timeline = []
+        beat = 0.0
+        while events and beat < total_beats:
+            for event in events:
+                if beat >= total_beats:
+                    break
+                timeline.append((beat, event))
+                beat += event.duration_beats
+            if not loop:
+                break
+        return timeline, total_beats
+
+    def _chord_notes(self, key_setting: KeySetting, event: ChordEvent) -> List[int]:
+        """MIDI notes an event sounds in the progression's key"""
+        setting = KeySetting(
+            tonic=key_setting.tonic,
+            mode=key_setting.mode,
+            bpm=key_setting.bpm,
+            octave_base=key_setting.octave_base,
+            voicing=event.voicing,
+            inversion=event.inversion,
+            tensions=list(event.tension),
+        )
+        return degree_to_chord(setting, DEGREE_NAMES.index(event.degree))["notes"]
+
+    def _placements(self, progression: Progression, length_bars: Optional[int],
+                    loop: bool, click_track: bool) -> Tuple[List[Placement], int]:
+        """Render each distinct chord once and place it at its event positions"""
+        key_setting = progression.key_setting or KeySetting(tonic="C", mode="Ionian")
+        seconds_per_beat = 60.0 / key_setting.bpm
+        release_sec = self.envelope.release_ms / 1000.0
+        timeline, total_beats = self._timeline(progression, length_bars, loop)
+
+        # Group distinct (notes, duration) pairs by duration so each group is one batch
+        wanted: Dict[float, Dict[Tuple[int, ...], None]] = {}
+        specs = []
+        for start_beat, event in timeline:
+            beats = min(event.duration_beats, total_beats - start_beat)
+            notes = tuple(self._chord_notes(key_setting, event))
+            duration = beats * seconds_per_beat + release_sec
+            wanted.setdefault(duration, {})[notes] = None
+            specs.append((start_beat, notes, duration))
+
+        buffers: Dict[Tuple[Tuple[int, ...], float], np.ndarray] = {}
+        for duration, chords in wanted.items():
+            chords = list(chords)
+            audio = render_chords(notes_matrix(chords), duration_sec=duration,
+                                  sample_rate=self.sample_rate, envelope=self.envelope)
+            for notes, buffer in zip(chords, audio):
+                buffers[(notes, duration)] = buffer
+
+        placements = [(int(round(start_beat * seconds_per_beat * self.sample_rate)),
+                       buffers[(notes, duration)])
+                      for start_beat, notes, duration in specs]
+
+        if click_track:
+            accent, tick = click(self.sample_rate, True), click(self.sample_rate)
+            for beat in range(int(np.ceil(total_beats))):
+                buffer = accent if beat % self.beats_per_bar == 0 else tick
+                placements.append((int(round(beat * seconds_per_beat * self.sample_rate)), buffer))
+
+        placements.sort(key=lambda p: p[0])
+        total_frames = int(round((total_beats * seconds_per_beat + release_sec) * self.sample_rate))
+        return placements, total_frames
+
+    def _mix_blocks(self, placements: List[Placement], total_frames: int) -> Iterator[np.ndarray]:
+        """Yield the mono mix in fixed-size blocks, touching only overlapping sounds"""
+        active: List[Placement] = []
+        next_idx = 0
+
+        for block_start in range(0, total_frames, self.block_frames):
+            block_end = min(block_start + self.block_frames, total_frames)
+            block = np.zeros(block_end - block_start, dtype=np.float32)
+
+            while next_idx < len(placements) and placements[next_idx][0] < block_end:
+                active.append(placements[next_idx])
+                next_idx += 1
+
+            still_active = []
+            for start, buffer in active:
+                lo = max(block_start, start)
+                hi = min(block_end, start + len(buffer))
+                if lo < hi:
+                    block[lo - block_start:hi - block_start] += buffer[lo - start:hi - start]
+                if start + len(buffer) > block_end:
+                    still_active.append((start, buffer))
+            active = still_active
+
+            yield block
+
+    def _fade_gain(self, block_start: int, length: int, total_frames: int) -> np.ndarray:
+        """Head/tail fade curve for one block"""
+        frames = np.arange(block_start, block_start + length, dtype=np.float32)
+        head = max(1, int(self.head_fade_ms * self.sample_rate / 1000))
+        tail = max(1, int(self.tail_fade_ms * self.sample_rate / 1000))
+        fade_in = np.clip(frames / head, 0.0, 1.0)
+        fade_out = np.clip((total_frames - 1 - frames) / tail, 0.0, 1.0)
+        return fade_in * fade_out
+
+    def render_wav(self, progression: Progression, output_path: str,
+                   length_bars: Optional[int] = None, loop: bool = False,
+                   click_track: bool = False,
+                   progress: Optional[Callable[[float], None]] = None) -> Dict[str, float]:
+        """Render a progression to a 16-bit stereo WAV and return render statistics
+
+        The mix is produced twice in fixed-size blocks: once to find the peak,
+        once to normalize and write. Peak memory is one block plus one buffer per
+        distinct chord, independent of progression length.
+
+        progress, if given, is called with the completed fraction after every
+        block; an exception it raises (e.g. to cancel) aborts the export and
+        leaves no partial file behind.
+        """
+        started = time.perf_counter()
+        placements, total_frames = self._placements(progression, length_bars, loop, click_track)
+        if total_frames <= 0 or not placements:
+            raise ValueError("Progression has no events to export")
+
+        # Each frame is mixed twice; report both passes on one 0..1 scale
+        passes_frames = 2 * total_frames
+
+        peak = 0.0
+        block_start = 0
+        for block in self._mix_blocks(placements, total_frames):
+            peak = max(peak, float(np.abs(block).max(initial=0.0)))
+            block_start += len(block)
+            if progress is not None:
+                progress(block_start / passes_frames)
+        target = 10.0 ** (self.normalize_peak_db / 20.0)
+        scale = target / peak if peak > 0 else 0.0
+
+        output = Path(output_path)
+        tmp_path = output.with_name(output.name + ".tmp")
+        try:
+            with wave.open(str(tmp_path), "wb") as wav:
+                wav.setnchannels(2)
+                wav.setsampwidth(2)
+                wav.setframerate(self.sample_rate)
+
+                block_start = 0
+                for block in self._mix_blocks(placements, total_frames):
+                    block *= scale * self._fade_gain(block_start, len(block), total_frames)
+                    pcm = np.clip(np.rint(block * 32767.0), -32768, 32767).astype("<i2")
+                    wav.writeframes(np.repeat(pcm, 2).tobytes())
+                    block_start += len(block)
+                    if progress is not None:
+                        progress((total_frames + block_start) / passes_frames)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        os.replace(tmp_path, output)
+
+        elapsed = time.perf_counter() - started
+        audio_seconds = total_frames / self.sample_rate
+        self.last_stats = {
+            "audio_seconds": audio_seconds,
+            "render_seconds": elapsed,
+            "speed_factor": audio_seconds / elapsed if elapsed > 0 else float("inf"),
+        }
+        return self.last_stats
+
+    def export_wav(self, progression: Progression, output_path: str,
+                   length_bars: Optional[int] = None, loop: bool = False,
+                   click_track: bool = False,
+                   progress: Optional[Callable[[float], None]] = None) -> bool:
+        """Export progression to WAV file"""
+        try:
+            stats = self.render_wav(progression, output_path, length_bars, loop, click_track,
+                                    progress)
+        except ValueError as e:
+            print(f"Export failed: {e}")
+            return False
+
+        print(f"Exported: {output_path} ({stats['audio_seconds']:.1f}s audio, "
+              f"{stats['speed_factor']:.0f}x real time)")
+        return True
+
+    def export_m4a(self, progression: Progression, output_path: str,
+                   length_bars: Optional[int] = None, loop: bool = False,
+                   click_track: bool = False) -> bool:
+        """Export progression to M4A file (AAC encoding requires ffmpeg on PATH)"""
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            print("M4A export requires ffmpeg, which was not found")
+            return False
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            wav_path = os.path.join(tmp_dir, "export.wav")
+            if not self.export_wav(progression, wav_path, length_bars, loop, click_track):
+                return False
+            result = subprocess.run(
+                [ffmpeg, "-y", "-loglevel", "error", "-i", wav_path, "-c:a", "aac", output_path],
+                capture_output=True,
+            )
+
+        if result.returncode != 0:
+            print(f"M4A encoding failed: {result.stderr.decode(errors='replace').strip()}")
+            return False
+        return True
@@ -1,38 +1,142 @@
-from typing import List
+import weakref
+from collections import deque
+from collections.abc import Sequence
+from itertools import islice
+from typing import Deque, Iterable, List, Optional, Tuple
 from app.models import ChordEvent
 
+class EventsView(Sequence):
+    """Read-only, zero-copy view of the first n events of a history buffer"""
+
+    __slots__ = ("_events", "_length", "__weakref__")
+
+    def __init__(self, events: List[ChordEvent], length: int):
+        self._events = events
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._events[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("history view index out of range")
+        return self._events[index]
+
+    def __iter__(self):
+        return islice(self._events, self._length)
+
+    def __repr__(self) -> str:
+        return f"EventsView({list(self)!r})"
+
 class HistoryService:
-    """Manages chord event history with undo/redo"""
-    
-    def __init__(self):
+    """Manages chord event history with undo/redo
+
+    push/undo/redo are amortized O(1) and get_current_events returns a
+    zero-copy view. Views stay valid: if a push after undo would overwrite
+    events a live view still covers, the buffer is copied first
+    (copy-on-write) instead of truncated in place.
+    """
+
+    def __init__(self, max_depth: Optional[int] = None, keep_branches: bool = False,
+                 max_branches: int = 16):
         self.events: List[ChordEvent] = []
         self.current_index = -1
-    
+        self.max_depth = max_depth
+        self.keep_branches = keep_branches
+        # (fork index, events from it) of redo tails discarded by a push after
+        # undo, newest last
+        self.branches: Deque[Tuple[int, List[ChordEvent]]] = deque(maxlen=max_branches)
+        self._views: "weakref.WeakSet[EventsView]" = weakref.WeakSet()
+
     def push_event(self, event: ChordEvent):
         """Add new event to history"""
-        self.events = self.events[:self.current_index + 1]
+        if self.current_index < len(self.events) - 1:
+            self._discard_redo()
+
         self.events.append(event)
         self.current_index += 1
-    
+
+        if self.max_depth is not None:
+            # Trim in batches so dropping old events stays amortized O(1)
+            slack = max(1, self.max_depth // 4)
+            if len(self.events) > self.max_depth + slack:
+                excess = len(self.events) - self.max_depth
+                self.events = self.events[excess:]
+                self.current_index -= excess
+                # Branches forking inside the dropped events can't be re-attached
+                kept = [(fork - excess, tail) for fork, tail in self.branches if fork >= excess]
+                self.branches.clear()
+                self.branches.extend(kept)
+
+    def _discard_redo(self):
+        """Drop (or stash as a branch) the events after the current index"""
+        self._truncate(self.current_index + 1)
+
+    def _truncate(self, cut: int):
+        """Drop (or stash as a branch) the events from index cut on"""
+        if cut >= len(self.events):
+            return
+        if self.keep_branches:
+            # Branches forking after cut also need the events being dropped
+            # before their fork, so they are rebased onto cut
+            self.branches = deque(
+                ((cut, self.events[cut:fork] + tail) if fork > cut else (fork, tail)
+                 for fork, tail in self.branches),
+                maxlen=self.branches.maxlen)
+            self.branches.append((cut, self.events[cut:]))
+
+        if any(view._events is self.events and len(view) > cut for view in self._views):
+            self.events = self.events[:cut]
+        else:
+            del self.events[cut:]
+
     def undo(self) -> bool:
         """Undo last event"""
         if self.current_index >= 0:
             self.current_index -= 1
             return True
         return False
-    
+
     def redo(self) -> bool:
         """Redo next event"""
         if self.current_index < len(self.events) - 1:
             self.current_index += 1
             return True
         return False
-    
-    def get_current_events(self) -> List[ChordEvent]:
+
+    def restore_branch(self, index: int = -1) -> bool:
+        """Re-attach a stashed redo branch where it was cut off
+
+        The events it replaces are stashed in turn, and the current position
+        moves back to the fork if it was past it, so the branch can be redone.
+        """
+        if not self.branches:
+            return False
+        fork, tail = self.branches[index]
+        del self.branches[index]
+        self._truncate(fork)
+        self.events.extend(tail)
+        self.current_index = min(self.current_index, fork - 1)
+        return True
+
+    def get_current_events(self) -> EventsView:
         """Get events up to current index"""
-        return self.events[:self.current_index + 1]
-    
+        view = EventsView(self.events, self.current_index + 1)
+        self._views.add(view)
+        return view
+
+    def load(self, events: Iterable[ChordEvent]):
+        """Replace the history with a loaded event list"""
+        self.events = list(events)
+        self.current_index = len(self.events) - 1
+        self.branches.clear()
+
     def clear(self):
         """Clear all history"""
         self.events = []
         self.current_index = -1
+        self.branches.clear()
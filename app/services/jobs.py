@@ -0,0 +1,117 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation was requested"""
+
+class Job:
+    """Handle on a background job: progress, cancellation and result
+
+    Job functions receive the job and call report() as they go; report()
+    is also the cancellation point, raising JobCancelled once cancel() was
+    called.
+    """
+
+    def __init__(self, name: str, on_progress: Optional[Callable[["Job"], None]] = None):
+        self.name = name
+        self.progress = 0.0
+        self.on_progress = on_progress
+        self.future: Optional[Future] = None
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """Ask the job to stop at its next report()"""
+        self._cancel.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def report(self, fraction: float):
+        """Record progress in [0, 1], raising JobCancelled if the job was cancelled"""
+        if self._cancel.is_set():
+            raise JobCancelled(self.name)
+        self.progress = min(max(fraction, 0.0), 1.0)
+        if self.on_progress is not None:
+            self.on_progress(self)
+
+    async def wait(self) -> Any:
+        """Await the job's result from the event loop"""
+        try:
+            return await asyncio.wrap_future(self.future)
+        except asyncio.CancelledError:
+            if self.cancelled:
+                raise JobCancelled(self.name)
+            raise
+
+_shared_executor: Optional[ThreadPoolExecutor] = None
+_shared_lock = threading.Lock()
+
+def shared_executor(max_workers: int = 4) -> ThreadPoolExecutor:
+    """Process-wide worker pool for JobRunners of many sessions, created on first use"""
+    global _shared_executor
+    with _shared_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(max_workers=max_workers,
+                                                  thread_name_prefix="job")
+        return _shared_executor
+
+class JobRunner:
+    """Runs slow work (saving, loading, exporting) off the UI event loop
+
+    Given an executor (see shared_executor()), jobs run on it instead of on
+    workers of the runner's own; cancellation and shutdown then only touch
+    this runner's jobs.
+    """
+
+    def __init__(self, max_workers: int = 2, executor: Optional[ThreadPoolExecutor] = None):
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers,
+                                                        thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self.active: Dict[int, Job] = {}
+
+    def submit(self, name: str, fn: Callable[..., Any], *args,
+               on_progress: Optional[Callable[[Job], None]] = None, **kwargs) -> Job:
+        """Start fn(job, *args, **kwargs) on a worker thread"""
+        job = Job(name, on_progress)
+
+        def run():
+            if job.cancelled:
+                raise JobCancelled(name)
+            return fn(job, *args, **kwargs)
+
+        with self._lock:
+            job.future = self._executor.submit(run)
+            self.active[id(job)] = job
+        job.future.add_done_callback(lambda _: self._forget(job))
+        return job
+
+    def _forget(self, job: Job):
+        with self._lock:
+            self.active.pop(id(job), None)
+
+    def cancel_all(self) -> int:
+        """Cancel every running or queued job, returning how many there were"""
+        with self._lock:
+            jobs = list(self.active.values())
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+    async def drain(self):
+        """Wait until no job of this runner is running (cancel_all() first to stop queued ones)"""
+        with self._lock:
+            futures = [asyncio.wrap_future(job.future) for job in self.active.values()]
+        if futures:
+            await asyncio.gather(*futures, return_exceptions=True)
+
+    def shutdown(self):
+        """Cancel outstanding jobs and stop the workers, unless they are shared"""
+        self.cancel_all()
+        if self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,51 +1,295 @@
 import json
+import os
+import sqlite3
+import threading
 from pathlib import Path
-from typing import List
-from app.models import Progression, KeySetting, ChordEvent
-from dataclasses import asdict
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from app.models import Progression, KeySetting
+from app.models.columns import EventColumns
+from app.core.sessions import valid_user_id
+from app.services.search import SIMILARITY_GRAM_SIZES, degree_ngrams, degree_text
+from dataclasses import asdict, replace
+
+# persistence.schema_version 1 is the spec's local_json file; 2 is the SQLite
+# store; 3 adds the degree n-gram search index; 4 moves events out of the JSON
+# body into a binary EventColumns blob
+SCHEMA_VERSION = 4
+
+SUMMARY_COLUMNS = ("id", "name", "tonic", "mode", "updated_at")
+
+# Web users each get a database under here; the desktop app keeps data/progressions.db
+USERS_DIR = "data/users"
+
+def user_data_file(user_id: str, users_dir: str = USERS_DIR) -> Path:
+    """Database of one user: <users_dir>/<user_id>/progressions.db"""
+    if not valid_user_id(user_id):
+        raise ValueError(f"Invalid user id {user_id!r}")
+    return Path(users_dir) / user_id / "progressions.db"
 
 class PersistenceService:
-    """Manages saving/loading progressions"""
-    
-    def __init__(self, data_file: str = "data/progressions.json"):
-        self.data_file = Path(data_file)
+    """Manages saving/loading progressions
+
+    Progressions live in a SQLite database in WAL mode: each save is a single
+    atomic transaction, loads are primary-key lookups, and concurrent writers
+    are serialized by SQLite's own locking. A legacy progressions.json next
+    to the database is migrated on first open.
+    """
+
+    def __init__(self, data_file: str = "data/progressions.db"):
+        path = Path(data_file)
+        if path.suffix == ".json":
+            path = path.with_suffix(".db")
+        self.data_file = path
+        self.legacy_file = path.with_suffix(".json")
         self.data_file.parent.mkdir(parents=True, exist_ok=True)
-    
+        self._local = threading.local()
+        # Every thread's connection, so close_all() can reach them; bumping the
+        # generation makes threads reconnect afterwards
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._generation = 0
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Per-thread connection, since sqlite3 connections are not shareable"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.generation != self._generation:
+            conn = sqlite3.connect(self.data_file, timeout=30.0, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            with self._connections_lock:
+                self._connections.append(conn)
+                self._local.conn, self._local.generation = conn, self._generation
+        return conn
+
+    def _transaction(self):
+        """Write transaction that takes the database lock up front"""
+        return _Transaction(self._connect())
+
+    def _init_db(self):
+        """Create or upgrade the schema and migrate legacy JSON data if needed"""
+        migrated = False
+        with self._transaction() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
+
+            if version < 2:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS progressions (
+                        id TEXT PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        tonic TEXT,
+                        mode TEXT,
+                        created_at TEXT,
+                        updated_at TEXT,
+                        body TEXT NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_progressions_updated "
+                             "ON progressions(updated_at)")
+
+            if version < 3:
+                conn.execute("ALTER TABLE progressions ADD COLUMN degrees TEXT NOT NULL DEFAULT ''")
+                conn.execute("ALTER TABLE progressions ADD COLUMN gram_count INTEGER NOT NULL DEFAULT 0")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS progression_grams (
+                        gram TEXT NOT NULL,
+                        prog_id TEXT NOT NULL,
+                        PRIMARY KEY (gram, prog_id)
+                    ) WITHOUT ROWID
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_grams_prog "
+                             "ON progression_grams(prog_id)")
+
+            if version < 4:
+                conn.execute("ALTER TABLE progressions ADD COLUMN events BLOB")
+                # Rewriting each row also (re)builds its search index entries
+                rows = conn.execute("SELECT body FROM progressions").fetchall()
+                for (body,) in rows:
+                    self._upsert(conn, json.loads(body))
+
+            if version < 2 and self.legacy_file.exists():
+                with open(self.legacy_file, 'r') as f:
+                    for prog_dict in json.load(f):
+                        self._upsert(conn, prog_dict)
+                migrated = True
+
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        if migrated:
+            os.replace(self.legacy_file, self.legacy_file.with_suffix(".json.migrated"))
+            print(f"Migrated {self.legacy_file} to {self.data_file}")
+
+    @staticmethod
+    def _upsert(conn: sqlite3.Connection, prog_dict: dict,
+                events: Optional[EventColumns] = None):
+        """Write a progression's metadata and events; events default to prog_dict's serialized ones"""
+        if events is None:
+            events = EventColumns.from_dicts(prog_dict.get("events", []))
+        meta = {k: v for k, v in prog_dict.items() if k != "events"}
+        key_setting = prog_dict.get("key_setting") or {}
+        degrees = events.degrees()
+        grams = degree_ngrams(degrees)
+        similarity_grams = sum(1 for g in grams if g.count(" ") + 1 in SIMILARITY_GRAM_SIZES)
+
+        conn.execute(
+            """
+            INSERT INTO progressions (id, name, tonic, mode, created_at, updated_at, body,
+                                      events, degrees, gram_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                name = excluded.name, tonic = excluded.tonic, mode = excluded.mode,
+                created_at = excluded.created_at, updated_at = excluded.updated_at,
+                body = excluded.body, events = excluded.events,
+                degrees = excluded.degrees, gram_count = excluded.gram_count
+            """,
+            (prog_dict["id"], prog_dict["name"], key_setting.get("tonic"),
+             key_setting.get("mode"), prog_dict["created_at"], prog_dict["updated_at"],
+             json.dumps(meta), events.encode(), degree_text(degrees), similarity_grams),
+        )
+        conn.execute("DELETE FROM progression_grams WHERE prog_id = ?", (prog_dict["id"],))
+        conn.executemany("INSERT INTO progression_grams (gram, prog_id) VALUES (?, ?)",
+                         [(gram, prog_dict["id"]) for gram in grams])
+
     def save_progression(self, progression: Progression):
-        """Save a progression to JSON"""
-        progressions = self.list_progressions()
-        
-        existing_idx = next((i for i, p in enumerate(progressions) 
-                           if p["id"] == progression.id), None)
-        
-        prog_dict = asdict(progression)
-        if existing_idx is not None:
-            progressions[existing_idx] = prog_dict
-        else:
-            progressions.append(prog_dict)
-        
-        with open(self.data_file, 'w') as f:
-            json.dump(progressions, f, indent=2)
-    
+        """Save a progression atomically"""
+        prog_dict = self._to_dict(progression)
+        events = EventColumns.from_events(progression.events)
+        with self._transaction() as conn:
+            self._upsert(conn, prog_dict, events)
+
     def list_progressions(self) -> List[dict]:
         """List all saved progressions"""
-        if not self.data_file.exists():
-            return []
-        
-        with open(self.data_file, 'r') as f:
-            return json.load(f)
-    
+        rows = self._connect().execute("SELECT body, events FROM progressions ORDER BY rowid")
+        progressions = []
+        for body, events in rows:
+            prog_dict = json.loads(body)
+            prog_dict["events"] = EventColumns.decode(events).to_dicts()
+            progressions.append(prog_dict)
+        return progressions
+
     def load_progression(self, prog_id: str) -> Progression:
         """Load a specific progression"""
-        progressions = self.list_progressions()
-        prog_dict = next((p for p in progressions if p["id"] == prog_id), None)
-        
-        if not prog_dict:
+        row = self._connect().execute(
+            "SELECT body, events FROM progressions WHERE id = ?", (prog_id,)).fetchone()
+
+        if not row:
             raise ValueError(f"Progression {prog_id} not found")
-        
-        key_setting = KeySetting(**prog_dict["key_setting"])
-        events = [ChordEvent(**e) for e in prog_dict["events"]]
-        
+
+        return self._from_dict(json.loads(row[0]), EventColumns.decode(row[1]))
+
+    def list_progression_summaries(self, limit: Optional[int] = None, offset: int = 0,
+                                   newest_first: bool = False) -> List[dict]:
+        """List id/name/key/updated_at of saved progressions without decoding events"""
+        order = "updated_at DESC, rowid DESC" if newest_first else "rowid"
+        rows = self._connect().execute(
+            f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM progressions "
+            f"ORDER BY {order} LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        )
+        return [dict(zip(SUMMARY_COLUMNS, row)) for row in rows]
+
+    def count_progressions(self) -> int:
+        """Number of saved progressions"""
+        return self._connect().execute("SELECT COUNT(*) FROM progressions").fetchone()[0]
+
+    def find_containing(self, degrees: Sequence[str], limit: int = 100) -> List[dict]:
+        """Summaries of progressions containing a contiguous degree sequence, in any key
+
+        The sequence's first trigram (or the whole sequence if shorter) is an
+        index lookup; longer sequences are then confirmed by substring match.
+        """
+        degrees = list(degrees)
+        if not degrees:
+            return []
+
+        columns = ", ".join(f"p.{c}" for c in SUMMARY_COLUMNS)
+        rows = self._connect().execute(
+            f"""
+            SELECT {columns} FROM progression_grams g
+            JOIN progressions p ON p.id = g.prog_id
+            WHERE g.gram = ? AND instr(p.degrees, ?) > 0
+            LIMIT ?
+            """,
+            (" ".join(degrees[:3]), degree_text(degrees), limit),
+        )
+        return [dict(zip(SUMMARY_COLUMNS, row)) for row in rows]
+
+    def find_similar(self, query: Union[str, Sequence[str]], k: int = 10) -> List[dict]:
+        """Top-k progressions by Jaccard similarity of their degree bigrams/trigrams
+
+        query is a progression id or a degree sequence. Scoring is limited to a
+        shortlist of progressions sharing the most of the query's longest grams.
+        Each summary carries a "score" in [0, 1]; the query itself is excluded.
+        """
+        exclude = None
+        if isinstance(query, str):
+            row = self._connect().execute(
+                "SELECT degrees FROM progressions WHERE id = ?", (query,)).fetchone()
+            if not row:
+                raise ValueError(f"Progression {query} not found")
+            exclude = query
+            degrees = row[0].split()
+        else:
+            degrees = list(query)
+
+        grams = sorted(degree_ngrams(degrees, SIMILARITY_GRAM_SIZES))
+        if not grams:
+            return []
+
+        # Shortlist by overlap on the longest gram size present, which is far more
+        # selective than bigrams, then score the shortlist exactly
+        longest = max(g.count(" ") for g in grams)
+        seeds = [g for g in grams if g.count(" ") == longest]
+        shortlist = max(50, k * 10)
+
+        columns = ", ".join(f"p.{c}" for c in SUMMARY_COLUMNS)
+        rows = self._connect().execute(
+            f"""
+            WITH candidates AS (
+                SELECT prog_id FROM progression_grams
+                WHERE gram IN ({", ".join("?" * len(seeds))}) AND prog_id IS NOT ?
+                GROUP BY prog_id
+                ORDER BY COUNT(*) DESC
+                LIMIT ?
+            )
+            SELECT {columns}, CAST(m.shared AS REAL) / (? + p.gram_count - m.shared) AS score
+            FROM (
+                SELECT g.prog_id, COUNT(*) AS shared
+                FROM candidates c JOIN progression_grams g ON g.prog_id = c.prog_id
+                WHERE g.gram IN ({", ".join("?" * len(grams))})
+                GROUP BY g.prog_id
+            ) m
+            JOIN progressions p ON p.id = m.prog_id
+            ORDER BY score DESC
+            LIMIT ?
+            """,
+            (*seeds, exclude, shortlist, len(grams), *grams, k),
+        )
+        return [dict(zip(SUMMARY_COLUMNS + ("score",), row)) for row in rows]
+
+    def delete_progression(self, prog_id: str) -> bool:
+        """Delete a progression, returning whether it existed"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM progression_grams WHERE prog_id = ?", (prog_id,))
+            cursor = conn.execute("DELETE FROM progressions WHERE id = ?", (prog_id,))
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def _to_dict(progression: Progression) -> dict:
+        """Progression metadata; events are stored separately as EventColumns"""
+        # events may be a history view rather than a list, which asdict can't recurse into
+        prog_dict = asdict(replace(progression, events=[]))
+        del prog_dict["events"]
+        return prog_dict
+
+    @staticmethod
+    def _from_dict(prog_dict: dict, events: EventColumns) -> Progression:
+        key_setting = KeySetting(**prog_dict["key_setting"]) if prog_dict.get("key_setting") else None
+        events = events.to_events()
+
         return Progression(
             id=prog_dict["id"],
             name=prog_dict["name"],
@@ -54,3 +298,126 @@ class PersistenceService:
             created_at=prog_dict["created_at"],
             updated_at=prog_dict["updated_at"],
         )
+
+    def close(self):
+        """Close this thread's database connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            with self._connections_lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            conn.close()
+            self._local.conn = None
+
+    def close_all(self):
+        """Close every thread's connection; must not overlap other calls on this service
+
+        Threads that use the service again get a new connection.
+        """
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._generation += 1
+        for conn in connections:
+            conn.close()
+
+def read_library(data_file: str) -> List[Progression]:
+    """Every progression in a database or legacy JSON file, opened read-only
+
+    Nothing is created, migrated or renamed, so a missing or mistyped path
+    raises ValueError instead of leaving an empty database behind. Corrupt
+    rows are reported and skipped.
+    """
+    path = Path(data_file)
+    if not path.is_file():
+        raise ValueError(f"Library {path} not found")
+
+    if path.suffix == ".json":
+        with open(path, 'r') as f:
+            return [PersistenceService._from_dict(prog_dict,
+                                                  EventColumns.from_dicts(prog_dict.get("events", [])))
+                    for prog_dict in json.load(f)]
+
+    conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 2:
+            raise ValueError(f"{path} is not a progression library")
+        if version < 4:
+            # Events were still part of the JSON body
+            rows = conn.execute("SELECT body, NULL FROM progressions ORDER BY rowid").fetchall()
+        else:
+            rows = conn.execute("SELECT body, events FROM progressions ORDER BY rowid").fetchall()
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"Can't read library {path}: {e}")
+    finally:
+        conn.close()
+
+    progressions = []
+    for row, (body, events) in enumerate(rows, 1):
+        try:
+            prog_dict = json.loads(body)
+            columns = (EventColumns.decode(events) if events is not None
+                       else EventColumns.from_dicts(prog_dict.get("events", [])))
+            progressions.append(PersistenceService._from_dict(prog_dict, columns))
+        except (ValueError, TypeError, KeyError) as e:
+            print(f"Warning: skipping unreadable progression {row} in {path}: {e}")
+    return progressions
+
+class PersistencePool:
+    """One PersistenceService per user, shared by all of that user's sessions
+
+    Services are reference counted: the last session to release a user's
+    service closes its connections, so idle users hold no file handles.
+    user_id None is the desktop app's single local user.
+    """
+
+    def __init__(self, users_dir: str = USERS_DIR, local_file: str = "data/progressions.db"):
+        self.users_dir = users_dir
+        self.local_file = local_file
+        self._lock = threading.Lock()
+        self._services: Dict[Path, Tuple[PersistenceService, int]] = {}
+
+    def acquire(self, user_id: Optional[str] = None) -> PersistenceService:
+        """The user's service, opened (and migrated) on first use"""
+        path = Path(self.local_file) if user_id is None else user_data_file(user_id, self.users_dir)
+        with self._lock:
+            service, count = self._services.get(path, (None, 0))
+            if service is None:
+                service = PersistenceService(str(path))
+            self._services[path] = (service, count + 1)
+            return service
+
+    def release(self, service: PersistenceService):
+        """Give back a service from acquire(), closing it when no session uses it"""
+        with self._lock:
+            current, count = self._services.get(service.data_file, (None, 0))
+            if current is not service:
+                return
+            if count > 1:
+                self._services[service.data_file] = (service, count - 1)
+                return
+            del self._services[service.data_file]
+        service.close_all()
+
+    def __len__(self) -> int:
+        return len(self._services)
+
+# Process-wide; in web mode every session of the server shares it
+user_stores = PersistencePool()
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK context manager"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
@@ -0,0 +1,20 @@
+from typing import Iterable, Sequence, Set
+
+# Gram sizes stored in the index; similarity ignores unigrams, which nearly every progression shares
+INDEX_GRAM_SIZES = (1, 2, 3)
+SIMILARITY_GRAM_SIZES = (2, 3)
+
+def degree_ngrams(degrees: Sequence[str], sizes: Iterable[int] = INDEX_GRAM_SIZES) -> Set[str]:
+    """Distinct contiguous degree n-grams, e.g. "ii V I"
+
+    Degrees are relative to the progression's key, so grams match in any key.
+    """
+    grams = set()
+    for n in sizes:
+        for i in range(len(degrees) - n + 1):
+            grams.add(" ".join(degrees[i:i + n]))
+    return grams
+
+def degree_text(degrees: Sequence[str]) -> str:
+    """Space-delimited sequence with sentinels so substring search respects token bounds"""
+    return f" {' '.join(degrees)} "
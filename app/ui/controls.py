@@ -1,6 +1,7 @@
 import flet as ft
 from typing import Callable
 from app.core.theory import KEYS, MODES
+from app.ui.handlers import bind, bind_value
 
 class KeyModeControls(ft.Container):
     """Key and mode selection controls"""
@@ -12,14 +13,14 @@ class KeyModeControls(ft.Container):
             label="Key",
             options=[ft.dropdown.Option(key) for key in KEYS],
             value="C",
-            on_change=lambda e: on_key_change(e.control.value),
+            on_change=bind_value(on_key_change),
         )
         
         self.mode_dropdown = ft.Dropdown(
             label="Mode",
             options=[ft.dropdown.Option(mode) for mode in MODES],
             value="Ionian",
-            on_change=lambda e: on_mode_change(e.control.value),
+            on_change=bind_value(on_mode_change),
         )
         
         self.content = ft.Row(
@@ -34,9 +35,9 @@ class OptionPanel(ft.Container):
         super().__init__()
         
         self.tension_7 = ft.Checkbox(label="7th", value=False, 
-                                     on_change=lambda e: on_tension_change())
+                                     on_change=bind(on_tension_change))
         self.tension_9 = ft.Checkbox(label="9th", value=False,
-                                     on_change=lambda e: on_tension_change())
+                                     on_change=bind(on_tension_change))
         
         self.voicing_dropdown = ft.Dropdown(
             label="Voicing",
@@ -46,7 +47,7 @@ class OptionPanel(ft.Container):
                 ft.dropdown.Option("root_shell"),
             ],
             value="drop2",
-            on_change=lambda e: on_voicing_change(e.control.value),
+            on_change=bind_value(on_voicing_change),
         )
         
         self.content = ft.Column(
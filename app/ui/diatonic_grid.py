@@ -1,6 +1,7 @@
 import flet as ft
-from typing import Callable
-from app.core.theory import DEGREE_NAMES
+from typing import Callable, Sequence
+from app.core.theory import DEGREE_NAMES, Interchange
+from app.ui.handlers import bind
 
 class DiatonicGrid(ft.Container):
     """Main chord pad grid with 7 diatonic degrees"""
@@ -9,18 +10,24 @@ class DiatonicGrid(ft.Container):
         super().__init__()
         self.on_pad_click = on_pad_click
         
-        pads = []
+        self.pads = []
         for i, degree in enumerate(DEGREE_NAMES):
             pad = ft.ElevatedButton(
                 text=degree,
                 width=100,
                 height=100,
-                on_click=lambda e, idx=i: self.on_pad_click(idx),
+                on_click=bind(self.on_pad_click, i),
             )
-            pads.append(pad)
+            self.pads.append(pad)
         
         self.content = ft.Row(
-            controls=pads,
+            controls=self.pads,
             alignment=ft.MainAxisAlignment.CENTER,
             spacing=10,
         )
+    
+    def set_interchange(self, candidates: Sequence[Sequence[Interchange]]):
+        """Show each degree's borrowed chords as its pad tooltip"""
+        for pad, borrowed in zip(self.pads, candidates):
+            pad.tooltip = "\n".join(f"{root}{quality} ({', '.join(modes)})"
+                                    for root, quality, modes in borrowed) or None
@@ -0,0 +1,26 @@
+import asyncio
+from typing import Callable
+
+def bind(callback: Callable, *args) -> Callable:
+    """Event handler calling callback(*args)
+
+    Flet awaits coroutine handlers on its event loop but runs plain ones on
+    worker threads, so the handler matches the kind of callback it wraps.
+    """
+    if asyncio.iscoroutinefunction(callback):
+        async def handler(e):
+            await callback(*args)
+    else:
+        def handler(e):
+            callback(*args)
+    return handler
+
+def bind_value(callback: Callable) -> Callable:
+    """Event handler calling callback(e.control.value), sync or async like bind"""
+    if asyncio.iscoroutinefunction(callback):
+        async def handler(e):
+            await callback(e.control.value)
+    else:
+        def handler(e):
+            callback(e.control.value)
+    return handler
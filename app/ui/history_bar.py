@@ -1,22 +1,71 @@
 import flet as ft
-from typing import Callable
+from typing import Callable, Optional
+from app.ui.handlers import bind, bind_value
 
 class HistoryBar(ft.Container):
     """Transport controls and history management"""
     
     def __init__(self, on_undo: Callable, on_redo: Callable,
-                 on_save: Callable, on_load: Callable, on_export: Callable):
+                 on_save: Callable, on_load: Callable, on_export: Callable,
+                 on_cancel: Optional[Callable] = None,
+                 on_play: Optional[Callable] = None,
+                 on_bpm_change: Optional[Callable[[float], None]] = None, bpm: int = 100):
         super().__init__()
         
-        self.content = ft.Row(
+        self.play_button = ft.ElevatedButton("Play", icon=ft.Icons.PLAY_ARROW,
+                                             on_click=bind(on_play) if on_play else None,
+                                             visible=on_play is not None)
+        self.metronome = ft.Checkbox(label="Metronome", value=False, visible=on_play is not None)
+        self.bpm_slider = ft.Slider(min=20, max=280, divisions=260, value=bpm, width=200,
+                                    label="{value} BPM",
+                                    on_change_end=bind_value(on_bpm_change) if on_bpm_change else None,
+                                    visible=on_bpm_change is not None)
+        
+        self.progress_label = ft.Text("", size=12)
+        self.progress_bar = ft.ProgressBar(width=200, value=0)
+        self.cancel_button = ft.TextButton("Cancel", on_click=bind(on_cancel) if on_cancel else None,
+                                           visible=on_cancel is not None)
+        self.progress_row = ft.Row(
+            controls=[self.progress_label, self.progress_bar, self.cancel_button],
+            alignment=ft.MainAxisAlignment.CENTER,
+            visible=False,
+        )
+        
+        self.content = ft.Column(
             controls=[
-                ft.ElevatedButton("Undo", icon=ft.Icons.UNDO, on_click=lambda e: on_undo()),
-                ft.ElevatedButton("Redo", icon=ft.Icons.REDO, on_click=lambda e: on_redo()),
-                ft.VerticalDivider(),
-                ft.ElevatedButton("Save", icon=ft.Icons.SAVE, on_click=lambda e: on_save()),
-                ft.ElevatedButton("Load", icon=ft.Icons.FOLDER_OPEN, on_click=lambda e: on_load()),
-                ft.ElevatedButton("Export", icon=ft.Icons.DOWNLOAD, on_click=lambda e: on_export()),
+                ft.Row(
+                    controls=[
+                        ft.ElevatedButton("Undo", icon=ft.Icons.UNDO, on_click=bind(on_undo)),
+                        ft.ElevatedButton("Redo", icon=ft.Icons.REDO, on_click=bind(on_redo)),
+                        ft.VerticalDivider(),
+                        ft.ElevatedButton("Save", icon=ft.Icons.SAVE, on_click=bind(on_save)),
+                        ft.ElevatedButton("Load", icon=ft.Icons.FOLDER_OPEN, on_click=bind(on_load)),
+                        ft.ElevatedButton("Export", icon=ft.Icons.DOWNLOAD, on_click=bind(on_export)),
+                    ],
+                    alignment=ft.MainAxisAlignment.CENTER,
+                    spacing=10,
+                ),
+                ft.Row(
+                    controls=[self.play_button, self.metronome, self.bpm_slider],
+                    alignment=ft.MainAxisAlignment.CENTER,
+                    spacing=10,
+                ),
+                self.progress_row,
             ],
-            alignment=ft.MainAxisAlignment.CENTER,
-            spacing=10,
+            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
         )
+
+    def set_playing(self, playing: bool):
+        """Toggle the transport button between Play and Stop"""
+        self.play_button.text = "Stop" if playing else "Play"
+        self.play_button.icon = ft.Icons.STOP if playing else ft.Icons.PLAY_ARROW
+    
+    def show_progress(self, label: str, fraction: float):
+        """Show a background job's progress; sent with the next page update"""
+        self.progress_label.value = label
+        self.progress_bar.value = fraction
+        self.progress_row.visible = True
+
+    def hide_progress(self):
+        """Hide the progress row once no job is running"""
+        self.progress_row.visible = False
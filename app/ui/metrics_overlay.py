@@ -0,0 +1,76 @@
+import time
+from datetime import datetime
+from typing import Optional
+import flet as ft
+from app.core.metrics import LatencyMetrics, MAX_MS, TARGET_MS, format_stats
+from app.core.sessions import SessionRegistry, format_sessions
+
+class MetricsOverlay(ft.Container):
+    """Debug panel showing rolling tap latency percentiles"""
+
+    def __init__(self, metrics: LatencyMetrics, refresh_interval: float = 0.5,
+                 dump_dir: str = "data", sessions: Optional[SessionRegistry] = None):
+        super().__init__()
+        self.metrics = metrics
+        self.sessions = sessions
+        self.refresh_interval = refresh_interval
+        self.dump_dir = dump_dir
+        self._last_refresh = 0.0
+
+        self.table = ft.Text("No samples yet", font_family="monospace", size=11)
+        self.budget = ft.Text(f"Budget: {TARGET_MS:.0f} ms target / {MAX_MS:.0f} ms max", size=11)
+        self.session_text = ft.Text("", size=11, visible=sessions is not None)
+
+        self.content = ft.Column(
+            controls=[
+                ft.Row(
+                    controls=[
+                        ft.Text("Latency (ms)", weight=ft.FontWeight.BOLD),
+                        ft.TextButton("Dump", on_click=lambda e: self.dump()),
+                        ft.TextButton("Reset", on_click=lambda e: self.reset()),
+                    ],
+                    spacing=10,
+                ),
+                self.table,
+                self.budget,
+                self.session_text,
+            ],
+            spacing=5,
+        )
+        self.padding = 10
+        self.border = ft.border.all(1, ft.Colors.OUTLINE)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Recompute the table, at most once per refresh_interval
+
+        Returns whether it was recomputed; the change is sent with the next
+        page update.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return False
+        self._last_refresh = now
+
+        stats = self.metrics.snapshot()
+        self.table.value = format_stats(stats) if stats else "No samples yet"
+        over = self.metrics.over_budget()
+        self.budget.value = (f"p95 over {MAX_MS:.0f} ms: {', '.join(over)}" if over
+                             else f"Budget: {TARGET_MS:.0f} ms target / {MAX_MS:.0f} ms max")
+        self.budget.color = ft.Colors.RED if over else None
+        if self.sessions is not None:
+            self.session_text.value = format_sessions(self.sessions.stats())
+        return True
+
+    def dump(self):
+        """Write the current snapshot as JSON and CSV"""
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        for suffix in ("json", "csv"):
+            path = self.metrics.dump(f"{self.dump_dir}/metrics_{stamp}.{suffix}")
+            print(f"Metrics written to {path}")
+
+    def reset(self):
+        """Clear samples and the table"""
+        self.metrics.reset()
+        self.refresh(force=True)
+        if self.page:
+            self.page.update()
@@ -0,0 +1,699 @@
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from dataclasses import replace
+from io import StringIO
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.models import KeySetting, ChordEvent, Progression
+from app.models.columns import EventColumns
+from app.core.theory import (KEYS, MODES, _interchange_table, chord_locations, chord_to_asset_path,
+                             degree_to_chord, interchange_candidates, keys_containing,
+                             pitch_class_set)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# name -> benchmark function(quick) returning result rows
+BENCHMARKS: Dict[str, Callable[[bool], List[Dict]]] = {}
+
+def benchmark(name: str):
+    """Register a benchmark function under name"""
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+def result(name: str, value: float, unit: str, higher_is_better: bool) -> Dict:
+    return {"name": name, "value": float(value), "unit": unit,
+            "higher_is_better": higher_is_better}
+
+def best_of(fn: Callable[[], None], repeat: int = 3) -> float:
+    """Fastest wall time of several runs, in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def quiet(fn: Callable, *args, **kwargs):
+    """Call fn with its progress output suppressed"""
+    with redirect_stdout(StringIO()):
+        return fn(*args, **kwargs)
+
+def sample_progression(length: int, tonic: str = "C", mode: str = "Ionian",
+                       seed: Optional[int] = None) -> Progression:
+    """Progression with a seventh on every other chord
+
+    Degrees cycle by fourths, or are drawn at random when a seed is given.
+    """
+    key_setting = KeySetting(tonic=tonic, mode=mode)
+    rng = np.random.default_rng(seed) if seed is not None else None
+    events = []
+    for i in range(length):
+        degree_idx = int(rng.integers(7)) if rng is not None else (i * 3) % 7
+        spec = degree_to_chord(key_setting, degree_idx)
+        events.append(ChordEvent(degree=spec["degree"], quality=spec["quality"],
+                                 tension=[7] if i % 2 else []))
+    return Progression(name=f"bench_{length}", key_setting=key_setting, events=events)
+
+@benchmark("theory")
+def bench_theory(quick: bool) -> List[Dict]:
+    settings = [KeySetting(tonic=key, mode=mode, tensions=tensions)
+                for key in KEYS for mode in MODES for tensions in ([], [7], [7, 9])]
+    calls = len(settings) * 7
+
+    def spell():
+        for setting in settings:
+            for degree_idx in range(7):
+                degree_to_chord(setting, degree_idx)
+
+    def paths():
+        for setting in settings:
+            for degree_idx in range(7):
+                chord_to_asset_path(setting, degree_idx)
+
+    chords = [degree_to_chord(setting, degree_idx)["notes"]
+              for setting in settings for degree_idx in range(7)]
+
+    def lookups():
+        for notes in chords:
+            keys_containing(notes)
+
+    def interchange():
+        # Cold cache, as after a key change nobody has visited yet
+        _interchange_table.cache_clear()
+        for setting in settings:
+            interchange_candidates(setting)
+
+    by_pitch_classes, by_root_quality = chord_locations()
+    pcs_of = {location: pcs for pcs, locations in by_pitch_classes.items()
+              for location in locations}
+    # A (root, quality) pair names one chord: Gmaj7 and G7 must not share an entry
+    for chord, locations in by_root_quality.items():
+        assert len({pcs_of[location] for location in locations}) == 1, chord
+    # A pad never offers its own chord as a borrowing
+    for setting in settings:
+        own = [degree_to_chord(setting, degree_idx) for degree_idx in range(7)]
+        for degree_idx, borrowed in enumerate(interchange_candidates(setting)):
+            own_pcs = pitch_class_set(own[degree_idx]["notes"])
+            for root, quality, modes in borrowed:
+                location = (setting.tonic, modes[0], degree_idx, tuple(setting.tensions))
+                assert pcs_of[location] != own_pcs, (setting, degree_idx, root, quality)
+                assert setting.mode not in modes, (setting, degree_idx, root, quality)
+
+    return [
+        result("theory.degree_to_chord", calls / best_of(spell), "ops/s", True),
+        result("theory.chord_to_asset_path", calls / best_of(paths), "ops/s", True),
+        result("theory.keys_containing", len(chords) / best_of(lookups), "ops/s", True),
+        result("theory.interchange_refresh", best_of(interchange) / len(settings) * 1000,
+               "ms", False),
+    ]
+
+@benchmark("generation")
+def bench_generation(quick: bool) -> List[Dict]:
+    from app.core.audio_generator import (convert_bank, generate_all_chord_samples,
+                                          generate_chord_sample, pack_bank)
+    from app.core.bank import BankFormat
+    from app.core.manifest import AssetManifest
+    from app.core.verify import verify_bank
+
+    count = 20 if quick else 100
+    notes = [48, 55, 64, 71]
+    single = best_of(lambda: [generate_chord_sample(notes, 1.5) for _ in range(count)], 1)
+
+    only = [("C", None)] if quick else None
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        rendered = quiet(generate_all_chord_samples, jobs=1, only=only,
+                         output_dir=f"{tmp}/audio")
+        elapsed = time.perf_counter() - start
+        coverage = AssetManifest.scan(tmp).coverage()
+        report = verify_bank(f"{tmp}/audio", jobs=1)
+
+        # Offline conversion to a 48 kHz mono variant
+        variant = BankFormat(48000, 16, 1)
+        start = time.perf_counter()
+        converted = quiet(convert_bank, f"{tmp}/audio", variant, f"{tmp}/{variant.subdir}")
+        convert_elapsed = time.perf_counter() - start
+        converted_report = verify_bank(f"{tmp}/{variant.subdir}", jobs=1)
+        sizes = []
+        for subdir in ("audio", variant.subdir):
+            quiet(pack_bank, f"{tmp}/{subdir}")
+            sizes.append(Path(f"{tmp}/{subdir}/bank.dpb").stat().st_size)
+
+    summary = report["summary"]
+    assert summary["failed"] == 0, summary["by_check"]
+    converted_summary = converted_report["summary"]
+    assert converted_summary["failed"] == 0, converted_summary["by_check"]
+    return [
+        result("generation.generate_chord_sample", count / single, "samples/s", True),
+        result("generation.bank", rendered / elapsed, "files/s", True),
+        result("generation.dedup_ratio", coverage["dedup_ratio"], "x", True),
+        result("generation.verify", summary["samples"] / summary["elapsed_sec"], "samples/s", True),
+        result("generation.max_pitch_error", summary["max_abs_cents"], "cents", False),
+        result("generation.convert_48k_mono", converted / convert_elapsed, "files/s", True),
+        result("generation.converted_max_pitch_error", converted_summary["max_abs_cents"],
+               "cents", False),
+        # 48 kHz mono bank size relative to the 44.1 kHz stereo one
+        result("generation.mono_48k_size_ratio", sizes[1] / sizes[0], "x", False),
+    ]
+
+@benchmark("history")
+def bench_history(quick: bool) -> List[Dict]:
+    from app.services.history import HistoryService
+
+    count = 10000
+    events = sample_progression(count).events
+
+    def push():
+        history = HistoryService()
+        for event in events:
+            history.push_event(event)
+
+    history = HistoryService()
+    for event in events:
+        history.push_event(event)
+
+    def undo_redo():
+        for _ in range(count):
+            history.undo()
+        for _ in range(count):
+            history.redo()
+
+    def view():
+        for _ in range(count):
+            len(history.get_current_events())
+
+    return [
+        result("history.push_10k", count / best_of(push), "ops/s", True),
+        result("history.undo_redo_10k", 2 * count / best_of(undo_redo), "ops/s", True),
+        result("history.current_events", count / best_of(view), "ops/s", True),
+    ]
+
+# Runs main() headlessly in a fresh interpreter and prints its startup report,
+# which the session dumps once it is interactive
+_STARTUP_SCRIPT = """
+import asyncio, json, os
+import main
+from benchmarks.stub_page import StubPage
+
+report = os.environ[main.STARTUP_REPORT_ENV]
+
+async def run():
+    await main.main(StubPage())
+    for _ in range(6000):
+        if os.path.exists(report):
+            return
+        await asyncio.sleep(0.01)
+    raise TimeoutError("session never became interactive")
+
+asyncio.run(run())
+with open(report) as f:
+    print(json.dumps(json.load(f)))
+"""
+
+@benchmark("startup")
+def bench_startup(quick: bool) -> List[Dict]:
+    """Cold start of the app: imports, first frame and time until pads sound"""
+    import json
+    import os
+    import subprocess
+    import sys
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # A scratch working directory keeps the app's data/ out of the repo
+        Path(tmp, "assets").symlink_to(REPO_ROOT / "assets")
+        env = dict(os.environ, PYTHONPATH=str(REPO_ROOT),
+                   DIATONIC_STARTUP_REPORT=str(Path(tmp, "startup.json")))
+        for _ in range(1 if quick else 3):
+            Path(env["DIATONIC_STARTUP_REPORT"]).unlink(missing_ok=True)
+            proc = subprocess.run([sys.executable, "-W", "ignore", "-c", _STARTUP_SCRIPT],
+                                  cwd=tmp, env=env, capture_output=True, text=True, timeout=120)
+            assert proc.returncode == 0, proc.stderr
+            runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    marks = {name: min(run["marks"][name] for run in runs)
+             for name in ("imports", "first_frame", "interactive")}
+    return [result(f"startup.{name}", ms, "ms", False) for name, ms in marks.items()]
+
+@benchmark("models")
+def bench_models(quick: bool) -> List[Dict]:
+    import json
+    from dataclasses import asdict
+
+    count = 10000
+    # As loaded from disk: every event and tension list is its own object
+    dicts = [asdict(e) for e in sample_progression(count, seed=0).events]
+
+    def allocated(build: Callable[[], object]) -> float:
+        tracemalloc.start()
+        kept = build()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del kept
+        return size / count
+
+    columns = EventColumns.from_dicts(dicts)
+    blob = columns.encode()
+    text = json.dumps(dicts)
+
+    # Truncated or corrupt blobs are rejected with ValueError, never IndexError
+    small = EventColumns.from_dicts(dicts[:8]).encode()
+    corrupt = bytearray(small)
+    # The first degree code, just past the header and string table, names a missing string
+    strings_end = len(small) - 8 * (4 * 2 + 4 + 8 + 1)
+    corrupt[strings_end:strings_end + 2] = (0xFFFF).to_bytes(2, "little")
+    for bad in [small[:n] for n in range(len(small))] + [bytes(corrupt)]:
+        try:
+            EventColumns.decode(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"decoded a bad {len(bad)}-byte blob")
+
+    return [
+        result("models.bytes_per_event@dataclass",
+               allocated(lambda: [ChordEvent(**d) for d in json.loads(text)]), "B", False),
+        result("models.bytes_per_event@columns",
+               allocated(lambda: EventColumns.decode(blob)), "B", False),
+        result("models.encoded_bytes_per_event@json", len(text) / count, "B", False),
+        result("models.encoded_bytes_per_event@binary", len(blob) / count, "B", False),
+        result("models.encode_10k@json", best_of(lambda: json.dumps(
+            [asdict(e) for e in columns])) * 1000, "ms", False),
+        result("models.encode_10k@binary", best_of(lambda: EventColumns.from_events(
+            columns).encode()) * 1000, "ms", False),
+        result("models.decode_10k@json", best_of(lambda: [
+            ChordEvent(**d) for d in json.loads(text)]) * 1000, "ms", False),
+        result("models.decode_10k@binary", best_of(lambda: EventColumns.decode(
+            blob).to_events()) * 1000, "ms", False),
+    ]
+
+@benchmark("persistence")
+def bench_persistence(quick: bool) -> List[Dict]:
+    from app.services.persistence import PersistenceService, read_library
+
+    sizes = [1000] if quick else [1000, 10000, 100000]
+    samples = 50 if quick else 200
+    rows = []
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            service = quiet(PersistenceService, f"{tmp}/progressions.db")
+            # Populate in one transaction; the timed saves below are one per transaction
+            with service._transaction() as conn:
+                for i in range(size):
+                    prog = sample_progression(8 + i % 9, KEYS[i % 12], MODES[i % 7], seed=i)
+                    service._upsert(conn, service._to_dict(prog), EventColumns.from_events(prog.events))
+
+            progressions = [sample_progression(16, seed=size + i) for i in range(samples)]
+            start = time.perf_counter()
+            for prog in progressions:
+                service.save_progression(prog)
+            save_rate = samples / (time.perf_counter() - start)
+
+            ids = [prog.id for prog in progressions]
+            load_ms = []
+            for prog_id in ids:
+                start = time.perf_counter()
+                service.load_progression(prog_id)
+                load_ms.append((time.perf_counter() - start) * 1000)
+
+            list_ms = best_of(lambda: service.list_progression_summaries(
+                limit=50, newest_first=True)) * 1000
+            similar_ms = best_of(lambda: service.find_similar(ids[0], k=10)) * 1000
+
+            if size == sizes[0]:
+                # An export reading the library reports and skips a truncated row
+                with service._transaction() as conn:
+                    conn.execute("UPDATE progressions SET events = substr(events, 1, 20) "
+                                 "WHERE id = ?", (ids[0],))
+                library = quiet(read_library, f"{tmp}/progressions.db")
+                assert len(library) == size + samples - 1, len(library)
+                assert ids[0] not in {prog.id for prog in library}
+            service.close()
+
+        label = f"{size // 1000}k"
+        rows += [
+            result(f"persistence.save@{label}", save_rate, "saves/s", True),
+            result(f"persistence.load_p50@{label}", np.percentile(load_ms, 50), "ms", False),
+            result(f"persistence.list_page@{label}", list_ms, "ms", False),
+            result(f"persistence.find_similar@{label}", similar_ms, "ms", False),
+        ]
+    return rows
+
+@benchmark("export")
+def bench_export(quick: bool) -> List[Dict]:
+    from app.services.export import ExportService
+
+    progression = sample_progression(16)
+    bars = 16 if quick else 64
+    service = ExportService()
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [service.render_wav(progression, f"{tmp}/bench.wav", length_bars=bars, loop=True)
+                for _ in range(3)]
+
+    return [
+        result("export.speed_factor", max(r["speed_factor"] for r in runs), "x realtime", True),
+    ]
+
+@benchmark("runner")
+def bench_runner(quick: bool) -> List[Dict]:
+    """Checks the regression gate itself: over tolerance fails, no baseline is not a pass"""
+    import json
+    from benchmarks.run import FAILED, NO_BASELINE, check
+
+    def run(value: float) -> Dict:
+        return {"quick": quick, "failures": {},
+                "results": [result("gate.rate", value, "ops/s", True),
+                            result("gate.time", 100.0, "ms", False)]}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = Path(tmp, "baseline.json")
+        assert quiet(check, run(100.0), baseline, 0.25) == NO_BASELINE
+        baseline.write_text(json.dumps(run(100.0)))
+        assert quiet(check, run(80.0), baseline, 0.25) == 0
+        assert quiet(check, run(70.0), baseline, 0.25) == FAILED
+        slower = run(100.0)
+        slower["results"][1]["value"] = 130.0
+        assert quiet(check, slower, baseline, 0.25) == FAILED
+        failed = dict(run(100.0), failures={"gate": "Traceback"})
+        assert quiet(check, failed, baseline, 0.25) == FAILED
+    return []
+
+@benchmark("soak")
+def bench_soak(quick: bool) -> List[Dict]:
+    """2,000 taps through AudioEngine on a stub page, with voices finishing as they would"""
+    from app.core.audio import AudioEngine
+    from app.core.metrics import LatencyMetrics
+    from app.core.update_scheduler import UpdateScheduler
+    from benchmarks.stub_page import StubPage
+
+    taps = 2000
+    # A 1.5 s sample at 8 taps/s is still sounding for the next 12 taps
+    overlap = 12
+    page = StubPage()
+    metrics = LatencyMetrics(window=taps)
+    # Taps here are far closer than a frame apart; flush every one so each
+    # voice reaches the stub client as it would at a human tapping rate
+    scheduler = UpdateScheduler(page, interval=0, metrics=metrics)
+    engine = quiet(AudioEngine, page, metrics=metrics, scheduler=scheduler,
+                   assets_dir=str(REPO_ROOT / "assets"))
+
+    paths = [chord_to_asset_path(KeySetting(tonic=key, mode="Ionian"), degree_idx)
+             for key in ("C", "G", "F") for degree_idx in range(7)]
+    voices = []
+
+    def tap(i: int):
+        with metrics.phase("tap_total"):
+            voices.append(engine.play_sample(paths[i % len(paths)]))
+        if len(voices) > overlap:
+            voice = engine.active_voices.get(voices.pop(0))
+            if voice is not None:
+                page.send_state(voice.audio, "completed")
+
+    for i in range(100):
+        tap(i)
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    for i in range(100, taps):
+        tap(i)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = engine.voice_stats()
+    latency = metrics.snapshot()
+    growth_kb = (current - baseline) / 1024
+
+    assert stats["controls_created"] <= engine.max_voices, stats
+    assert stats["overlay_size"] <= engine.max_voices, stats
+    assert latency["tap_to_playing"]["count"] == taps, latency["tap_to_playing"]
+    assert growth_kb < 1024, f"memory grew {growth_kb:.0f} KB over {taps} taps"
+
+    # A second trigger of a bank chord is served from the sample cache, and
+    # warming a key makes even its first tap a hit
+    page = StubPage()
+    engine = quiet(AudioEngine, page, scheduler=UpdateScheduler(page, interval=0),
+                   assets_dir=str(REPO_ROOT / "assets"))
+    bank_path = chord_to_asset_path(KeySetting(tonic="C", mode="Ionian"), 0)
+    engine.play_sample(bank_path)
+    engine.play_sample(bank_path)
+    cache = engine.cache_stats()
+    assert (cache["misses"], cache["hits"]) == (1, 1), cache
+    engine.preload_assets(KeySetting(tonic="C", mode="Ionian"))
+    engine.play_sample(chord_to_asset_path(KeySetting(tonic="C", mode="Ionian"), 3))
+    assert engine.cache_stats()["hits"] == 2, engine.cache_stats()
+
+    # The stolen sample's "completed" arriving late must not end the new voice
+    page = StubPage(simulate_client=False)
+    engine = quiet(AudioEngine, page, max_voices=1, scheduler=UpdateScheduler(page, interval=0),
+                   assets_dir=str(REPO_ROOT / "assets"))
+    engine.play_sample(paths[0])
+    voice_id = engine.play_sample(paths[1])
+    audio = engine.active_voices[voice_id].audio
+    page.send_state(audio, "completed")
+    assert voice_id in engine.active_voices, "stale completion released a stolen voice"
+    page.send_state(audio, "playing")
+    page.send_state(audio, "completed")
+    assert voice_id not in engine.active_voices, "voice not released on completion"
+
+    return [
+        result("soak.taps_per_sec", (taps - 100) / elapsed, "taps/s", True),
+        result("soak.tap_p95", latency["tap_total"]["p95"], "ms", False),
+        result("soak.tap_p99", latency["tap_total"]["p99"], "ms", False),
+        result("soak.memory_growth", growth_kb, "KB", False),
+        result("soak.controls_created", stats["controls_created"], "controls", False),
+    ]
+
+@benchmark("payload")
+def bench_payload(quick: bool) -> List[Dict]:
+    """Bytes sent to the client per tap, with page updates serialized as flet does"""
+    from app.core.audio import AudioEngine
+    from app.core.update_scheduler import UpdateScheduler
+    from benchmarks.stub_page import StubPage
+
+    taps = 50 if quick else 200
+    key_setting = KeySetting(tonic="C", mode="Ionian")
+    # Degrees the repo's bank has on disk, and ones it must render. Three of
+    # each, so a stolen control never already holds the next tap's chord
+    bank_paths = [chord_to_asset_path(key_setting, degree_idx) for degree_idx in (0, 3, 4)]
+    rendered_paths = [chord_to_asset_path(key_setting, degree_idx) for degree_idx in (1, 2, 6)]
+
+    def measure(paths: List[str]):
+        page = StubPage(serialize=True)
+        scheduler = UpdateScheduler(page, interval=0)
+        engine = quiet(AudioEngine, page, scheduler=scheduler,
+                       assets_dir=str(REPO_ROOT / "assets"))
+        for path in paths:
+            engine.prefetch(path)
+        # Fill the voice pool so every measured tap reuses a control
+        for i in range(engine.max_voices):
+            engine.play_sample(paths[i % len(paths)])
+        sent = page.bytes_sent
+        start = time.perf_counter()
+        for i in range(taps):
+            engine.play_sample(paths[i % len(paths)])
+        elapsed = time.perf_counter() - start
+        scheduler.close()
+        return (page.bytes_sent - sent) / taps, elapsed / taps * 1000
+
+    bank_bytes, bank_ms = measure(bank_paths)
+    rendered_bytes, rendered_ms = measure(rendered_paths)
+
+    assert bank_bytes < 1024, f"bank taps send {bank_bytes:.0f} bytes each"
+
+    return [
+        result("payload.bank_tap_bytes", bank_bytes, "bytes", False),
+        result("payload.bank_tap_ms", bank_ms, "ms", False),
+        result("payload.rendered_tap_bytes", rendered_bytes, "bytes", False),
+        result("payload.rendered_tap_ms", rendered_ms, "ms", False),
+    ]
+
+@benchmark("updates")
+def bench_updates(quick: bool) -> List[Dict]:
+    """Bursts of ten rapid taps plus status updates through the frame scheduler"""
+    from app.core.audio import AudioEngine
+    from app.core.update_scheduler import UpdateScheduler
+    import flet as ft
+    from benchmarks.stub_page import StubPage
+
+    bursts = 10 if quick else 50
+    page = StubPage()
+    scheduler = UpdateScheduler(page)
+    engine = quiet(AudioEngine, page, scheduler=scheduler, assets_dir=str(REPO_ROOT / "assets"))
+    status = ft.Text("")
+    path = chord_to_asset_path(KeySetting(tonic="C", mode="Ionian"), 0)
+
+    for burst in range(bursts):
+        for tap in range(10):
+            engine.play_sample(path)
+            scheduler.set_value(status, f"Events: {burst * 10 + tap}")
+            # Unchanged status, as when only the tensions panel is re-read
+            scheduler.set_value(status, f"Events: {burst * 10 + tap}")
+        time.sleep(scheduler.interval * 2)
+    scheduler.close()
+
+    stats = scheduler.stats()
+    assert stats["unchanged_skips"] == bursts * 10, stats
+
+    return [
+        result("updates.flushes_per_10_taps", page.updates / bursts, "flushes", False),
+        result("updates.coalesced_ratio", stats["coalesced"] / stats["requests"], "ratio", True),
+    ]
+
+@benchmark("transport")
+def bench_transport(quick: bool) -> List[Dict]:
+    """Trigger lateness of progression playback with the metronome at 20-280 BPM"""
+    import threading
+    from app.core.audio import AudioEngine
+    from app.core.transport import Transport
+    from benchmarks.stub_page import StubPage
+
+    tempos = [20, 120, 280] if quick else [20, 60, 120, 200, 280]
+    chords = 4 if quick else 16
+    engine = quiet(AudioEngine, StubPage(), assets_dir=str(REPO_ROOT / "assets"))
+    transport = Transport(engine)
+    progression = sample_progression(chords)
+    for event in progression.events:
+        event.duration_beats = 0.25
+    rows = []
+
+    def play(bpm: int) -> Dict[str, float]:
+        finished = threading.Event()
+        transport.jitter.reset()
+        transport.play(progression.events, replace(progression.key_setting, bpm=bpm),
+                       metronome=True, on_finished=finished.set)
+        finished.wait()
+        transport.stop()
+        return transport.jitter_stats()
+
+    for bpm in tempos:
+        stats = play(bpm)
+        rows.append(result(f"transport.jitter_p95@{bpm}bpm", stats["p95"], "ms", False))
+
+    # The same at a mid tempo while another thread keeps the interpreter busy,
+    # as a UI handler doing heavy work would
+    busy = threading.Event()
+
+    def load():
+        while not busy.is_set():
+            sum(i * i for i in range(10000))
+
+    worker = threading.Thread(target=load, daemon=True)
+    worker.start()
+    try:
+        stats = play(120)
+    finally:
+        busy.set()
+        worker.join()
+    rows.append(result("transport.jitter_p95@120bpm_loaded", stats["p95"], "ms", False))
+    rows.append(result("transport.jitter_max@120bpm_loaded", stats["max"], "ms", False))
+    return rows
+
+# Opens sessions of main() on stub pages in one process: the first builds the
+# shared assets, the heap growth of the rest is the per-session cost. Two
+# sessions per simulated browser, so each user's store is shared once.
+_SESSIONS_SCRIPT = """
+import asyncio, json, sys, tracemalloc
+import main
+from app.core.sessions import sessions
+from app.services.persistence import user_stores
+from benchmarks.stub_page import StubClientStorage, StubPage
+
+count, trace = int(sys.argv[1]), sys.argv[2] == "trace"
+browsers = [StubClientStorage() for _ in range((count + 1) // 2)]
+
+async def open_sessions(indexes):
+    pages = []
+    for i in indexes:
+        pages.append(StubPage(web=True, client_storage=browsers[i // 2]))
+        await main.main(pages[-1])
+    while len(sessions) < indexes[-1] + 1:
+        await asyncio.sleep(0.01)
+    # Warm-ups of every session share one thread; wait for them to settle
+    from app.core.shared import all_shared_assets
+    for assets in all_shared_assets():
+        assets.warmer.submit(lambda: None).result()
+    return pages
+
+async def run():
+    pages = await open_sessions([0])
+    if trace:
+        tracemalloc.start()
+    pages += await open_sessions(list(range(1, count)))
+    heap = tracemalloc.get_traced_memory()[0] / (count - 1) if trace else None
+    tracemalloc.stop()
+    stats, stores = sessions.stats(), len(user_stores)
+    for page in pages:
+        await page.on_close(None)
+    print(json.dumps({"heap_per_session": heap, "stats": stats, "stores": stores,
+                      "sessions_left": len(sessions), "stores_left": len(user_stores)}))
+
+asyncio.run(run())
+"""
+
+@benchmark("sessions")
+def bench_sessions(quick: bool) -> List[Dict]:
+    """Memory per web session, with sample data shared process-wide, and per-user stores"""
+    import json
+    import os
+    import subprocess
+    import sys
+    from app.core.audio import AudioEngine
+    from app.core.audio_generator import generate_all_chord_samples
+    from app.core.shared import SharedAssets
+    from benchmarks.stub_page import StubPage
+
+    count = 20 if quick else 100
+    engines = 10
+    key_setting = KeySetting(tonic="C", mode="Ionian")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        quiet(generate_all_chord_samples, jobs=1, only=[("C", "Ionian")],
+              output_dir=f"{tmp}/assets/audio")
+
+        def engine_heap(shared: bool) -> float:
+            """Heap per engine once each has preloaded the same key"""
+            tracemalloc.start()
+            assets = SharedAssets(f"{tmp}/assets", 44100) if shared else None
+            kept = [AudioEngine(StubPage(), assets_dir=f"{tmp}/assets", output_rate=44100,
+                                shared=assets) for _ in range(engines)]
+            for engine in kept:
+                engine.preload_assets(key_setting)
+            size, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del kept
+            return size / engines
+
+        private = engine_heap(False)
+        shared = engine_heap(True)
+
+        # main() sessions, run in a scratch working directory so data/ stays out of the repo
+        env = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+        runs, user_dirs = {}, {}
+        for mode in ("trace", "rss"):
+            proc = subprocess.run([sys.executable, "-W", "ignore", "-c", _SESSIONS_SCRIPT,
+                                   str(count), mode],
+                                  cwd=tmp, env=env, capture_output=True, text=True, timeout=300)
+            assert proc.returncode == 0, proc.stderr
+            runs[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+            user_dirs[mode] = len(list(Path(tmp, "data", "users").iterdir())) - sum(user_dirs.values())
+
+    traced = runs["trace"]
+    assert traced["stores"] == (count + 1) // 2 == user_dirs["trace"], (traced, user_dirs)
+    assert traced["sessions_left"] == 0 and traced["stores_left"] == 0, traced
+    rows = [
+        result("sessions.engine_private_assets", private / 1024, "KB", False),
+        result("sessions.engine_shared_assets", shared / 1024, "KB", False),
+        result("sessions.heap_per_session", traced["heap_per_session"] / 1024, "KB", False),
+    ]
+    per_session = runs["rss"]["stats"]["per_session_bytes"]
+    if per_session is not None:
+        rows.append(result("sessions.rss_per_session", per_session / 1024, "KB", False))
+    return rows
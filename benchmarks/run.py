@@ -0,0 +1,140 @@
+"""Headless benchmark suite with baseline comparison
+
+Examples:
+    python -m benchmarks.run --quick
+    python -m benchmarks.run --save-baseline
+    python -m benchmarks.run --only persistence --only soak --tolerance 0.5
+
+Each run is written to benchmarks/results/latest.json and compared with
+benchmarks/baseline.json. The exit status is 1 if a benchmark fails its own
+checks or any result is worse than the baseline by more than the tolerance,
+and 2 if there is no baseline, so an uncompared run never passes silently.
+Baselines are machine-specific, so none is committed; save one on the
+machine that runs the gate.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.cases import BENCHMARKS
+
+BENCH_DIR = Path(__file__).parent
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+RESULTS_DIR = BENCH_DIR / "results"
+
+# Exit statuses besides 0
+FAILED = 1
+NO_BASELINE = 2
+
+def run_benchmarks(names: List[str], quick: bool) -> Dict:
+    """Run the named benchmarks and collect their results and failures"""
+    results: List[Dict] = []
+    failures: Dict[str, str] = {}
+
+    for name in names:
+        print(f"[{name}] running...", flush=True)
+        start = time.perf_counter()
+        try:
+            rows = BENCHMARKS[name](quick)
+        except Exception:
+            failures[name] = traceback.format_exc()
+            print(f"[{name}] FAILED\n{failures[name]}")
+            continue
+        for row in rows:
+            print(f"  {row['name']:<36}{row['value']:>14.3f} {row['unit']}")
+        results += rows
+        print(f"[{name}] {time.perf_counter() - start:.1f}s")
+
+    return {
+        "created_at": datetime.now().isoformat(),
+        "quick": quick,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+        "failures": failures,
+    }
+
+def compare(run: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Names of results worse than the baseline by more than tolerance (a fraction)"""
+    previous = {row["name"]: row for row in baseline.get("results", [])}
+    regressions = []
+
+    print(f"\n{'benchmark':<36}{'baseline':>14}{'current':>14}{'change':>9}")
+    for row in run["results"]:
+        base = previous.get(row["name"])
+        if base is None or base["value"] == 0:
+            continue
+        change = (row["value"] - base["value"]) / base["value"]
+        worse = -change if row["higher_is_better"] else change
+        flag = ""
+        if worse > tolerance:
+            regressions.append(row["name"])
+            flag = "  REGRESSION"
+        print(f"{row['name']:<36}{base['value']:>14.3f}{row['value']:>14.3f}"
+              f"{change * 100:>+8.1f}%{flag}")
+    return regressions
+
+def check(run: Dict, baseline_path: Path, tolerance: float) -> int:
+    """Exit status of a run against the baseline at baseline_path"""
+    status = FAILED if run["failures"] else 0
+    if not baseline_path.exists():
+        print(f"NO BASELINE at {baseline_path}: results were not compared; "
+              f"run with --save-baseline to create one")
+        return status or NO_BASELINE
+
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    if baseline.get("quick") != run["quick"]:
+        print("Warning: baseline and this run differ in --quick; sizes are not comparable")
+    regressions = compare(run, baseline, tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {tolerance:.0%}: "
+              f"{', '.join(regressions)}")
+        status = FAILED
+    return status
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the headless benchmark suite")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS),
+                        help="run only this benchmark (repeatable)")
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller sizes for a fast smoke run")
+    parser.add_argument("--baseline", default=str(BASELINE_FILE),
+                        help="baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown as a fraction of the baseline (default 0.25)")
+    args = parser.parse_args(argv)
+
+    run = run_benchmarks(args.only or list(BENCHMARKS), args.quick)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(RESULTS_DIR / "latest.json", 'w') as f:
+        json.dump(run, f, indent=2)
+
+    baseline_path = Path(args.baseline)
+
+    if args.save_baseline:
+        status = FAILED if run["failures"] else 0
+        if run["failures"]:
+            print("Not saving a baseline from a run with failures")
+        else:
+            with open(baseline_path, 'w') as f:
+                json.dump(run, f, indent=2)
+            print(f"Baseline saved to {baseline_path}")
+    else:
+        status = check(run, baseline_path, args.tolerance)
+
+    if run["failures"]:
+        print(f"Failed: {', '.join(run['failures'])}")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import asyncio
+import itertools
+import json
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from flet.core.protocol import CommandEncoder
+
+_session_ids = itertools.count()
+
+class StubClientStorage:
+    """In-memory stand-in for page.client_storage; share one to simulate one browser"""
+
+    def __init__(self):
+        self.items: Dict[str, object] = {}
+
+    async def get_async(self, key: str):
+        return self.items.get(key)
+
+    async def set_async(self, key: str, value) -> bool:
+        self.items[key] = value
+        return True
+
+class StubPage:
+    """Headless stand-in for ft.Page
+
+    Holds the overlay and counts updates and control method calls. On
+    update, overlay controls are attached to the page so methods like
+    Audio.play() work, and (with simulate_client) every Audio bound to a new
+    voice gets a "playing" state event, as the client would send.
+
+    With serialize, each update also encodes the overlay's add and changed
+    attribute commands the way flet does, so bytes_sent is what a real
+    client would receive.
+    """
+
+    def __init__(self, simulate_client: bool = True, web: bool = False,
+                 client_storage: Optional[StubClientStorage] = None,
+                 serialize: bool = False):
+        self.overlay: List = []
+        self.controls: List = []
+        self.window = SimpleNamespace(width=None, height=None)
+        self.title = ""
+        self.session_id = f"stub-{next(_session_ids)}"
+        self.web = web
+        self.client_storage = client_storage or StubClientStorage()
+        self.on_close = None
+        self.snack_bar = None
+        self.simulate_client = simulate_client
+        self.updates = 0
+        self.method_calls: Dict[str, int] = {}
+        self._voices: Dict[int, Optional[str]] = {}
+        self.serialize = serialize
+        self.bytes_sent = 0
+        self._sent: Dict[int, object] = {}
+        self._uids = itertools.count(1)
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+        self.update()
+
+    def update(self, *controls):
+        self.updates += 1
+        if self.serialize:
+            self.bytes_sent += self._serialize()
+        for control in self.overlay:
+            control.page = self
+            if not self.simulate_client:
+                continue
+            voice_id = getattr(control, "data", None)
+            if voice_id is not None and self._voices.get(id(control)) != voice_id:
+                self._voices[id(control)] = voice_id
+                self.send_state(control, "playing")
+
+    def _serialize(self) -> int:
+        """JSON bytes of the commands page.update would send for the overlay"""
+        commands = []
+        for control in self.overlay:
+            if id(control) in self._sent:
+                command = control._build_command(update=True)
+                if command.attrs:
+                    commands.append(command)
+            else:
+                commands.extend(control._build_add_commands())
+                # As ft.Page does once the client acknowledges the add
+                control._Control__uid = f"_{next(self._uids)}"
+        self._sent = {id(control): control for control in self.overlay}
+        if not commands:
+            return 0
+        return len(json.dumps(commands, cls=CommandEncoder, separators=(",", ":")))
+
+    def run_task(self, handler, *args, **kwargs):
+        """Schedule a coroutine on the running loop, as ft.Page.run_task does"""
+        return asyncio.ensure_future(handler(*args, **kwargs))
+
+    def send_state(self, control, state: str):
+        """Deliver an audio state event to the control's handler"""
+        handler = getattr(control, "on_state_changed", None)
+        if handler is not None:
+            handler(SimpleNamespace(control=control, data=state))
+
+    def _invoke_method(self, control_id, method_name, arguments=None,
+                       wait_for_result=False, wait_timeout=5):
+        self.method_calls[method_name] = self.method_calls.get(method_name, 0) + 1
+        return None
@@ -0,0 +1,142 @@
+"""Headless batch export of saved or text-specified progressions to WAV
+
+Examples:
+    python export_cli.py --library data/progressions.db --jobs 8
+    python export_cli.py --spec "C Ionian: I vi IV V" --spec "A Aeolian: I IV V7 I" --bars 4 --loop
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.models import KeySetting, ChordEvent, Progression
+from app.models.columns import decode_progression, encode_progression
+from app.core.theory import KEYS, MODES, MODE_QUALITIES, DEGREE_NAMES
+from app.services.export import ExportService
+from app.services.persistence import read_library
+
+DEGREE_TOKEN = re.compile(r"^(I|ii|iii|IV|V|vi|vii°?)(7)?$")
+
+def parse_spec(spec: str, bpm: int = 100) -> Progression:
+    """Parse a text progression such as "C Ionian: I vi IV V7"
+
+    A trailing 7 on a degree adds the seventh; "vii" is accepted for "vii°".
+    """
+    header, sep, body = spec.partition(":")
+    fields = header.split()
+    if not sep or len(fields) != 2:
+        raise ValueError(f"Expected 'KEY MODE: DEGREES', got {spec!r}")
+
+    tonic, mode = fields
+    if tonic not in KEYS or mode not in MODES:
+        raise ValueError(f"Unknown key or mode in {spec!r}")
+
+    events = []
+    for token in body.split():
+        match = DEGREE_TOKEN.match(token)
+        if not match:
+            raise ValueError(f"Unknown degree {token!r} in {spec!r}")
+        degree = match.group(1)
+        if degree == "vii":
+            degree = "vii°"
+        quality = MODE_QUALITIES[mode][DEGREE_NAMES.index(degree)]
+        tensions = [7] if match.group(2) else []
+        events.append(ChordEvent(degree=degree, quality=quality + ("7" if tensions else ""),
+                                 tension=tensions))
+
+    if not events:
+        raise ValueError(f"No degrees in {spec!r}")
+
+    return Progression(
+        name=f"{tonic}_{mode}_" + "-".join(e.degree for e in events),
+        key_setting=KeySetting(tonic=tonic, mode=mode, bpm=bpm),
+        events=events,
+    )
+
+def output_name(progression: Progression) -> str:
+    """Filesystem-safe WAV filename for a progression"""
+    stem = re.sub(r"[^A-Za-z0-9_.-]+", "_", progression.name).strip("_") or "progression"
+    return f"{stem}_{progression.id[:8]}.wav"
+
+def _render(encoded: bytes, output_path: str, length_bars: Optional[int],
+            loop: bool, click_track: bool) -> Dict[str, float]:
+    """Render one encode_progression() blob (runs in a worker process)"""
+    return ExportService().render_wav(decode_progression(encoded), output_path,
+                                      length_bars=length_bars, loop=loop, click_track=click_track)
+
+def collect_progressions(args) -> List[Progression]:
+    """Gather progressions from the library and text specs"""
+    progressions = []
+
+    if args.library:
+        progressions += read_library(args.library)
+
+    specs = list(args.spec or [])
+    if args.spec_file:
+        with open(args.spec_file, 'r') as f:
+            specs += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    progressions += [parse_spec(spec, bpm=args.bpm) for spec in specs]
+
+    return progressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Render progressions to WAV without a UI")
+    parser.add_argument("--library", help="saved progression library (.db, or a legacy .json) to export")
+    parser.add_argument("--spec", action="append", help='text progression, e.g. "C Ionian: I vi IV V"')
+    parser.add_argument("--spec-file", help="file with one text progression per line")
+    parser.add_argument("--out-dir", default="data/exports", help="output directory")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--bars", type=int, default=None, help="render length in bars")
+    parser.add_argument("--loop", action="store_true", help="repeat the progression to fill --bars")
+    parser.add_argument("--click", action="store_true", help="mix in a click track")
+    parser.add_argument("--bpm", type=int, default=100, help="tempo for text progressions")
+    args = parser.parse_args(argv)
+
+    try:
+        progressions = collect_progressions(args)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    if not progressions:
+        print("Nothing to export; pass --library, --spec or --spec-file", file=sys.stderr)
+        return 2
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    workers = args.jobs or os.cpu_count() or 1
+
+    started = time.perf_counter()
+    failures = 0
+    audio_seconds = 0.0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_render, encode_progression(p), str(out_dir / output_name(p)),
+                            args.bars, args.loop, args.click): p
+            for p in progressions
+        }
+        for future in as_completed(futures):
+            progression = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"FAILED {progression.name}: {e}", file=sys.stderr)
+                continue
+            audio_seconds += stats["audio_seconds"]
+            print(f"{output_name(progression)}: {stats['render_seconds'] * 1000:.1f} ms "
+                  f"({stats['speed_factor']:.0f}x real time)")
+
+    wall = time.perf_counter() - started
+    rendered = len(progressions) - failures
+    print(f"\nRendered {rendered}/{len(progressions)} progressions "
+          f"({audio_seconds:.1f}s of audio) in {wall:.2f}s wall time with {workers} jobs")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
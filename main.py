@@ -1,123 +1,331 @@
+# Imported first, so its launch timestamp comes before the heavy imports
+from app.core.startup import LAUNCHED_AT, StartupProfile
+import asyncio
+import itertools
+import os
+import time
+from dataclasses import replace
 import flet as ft
 from app.models import KeySetting, ChordEvent, Progression
-from app.core.theory import chord_to_asset_path, degree_to_chord
-from app.core.audio import AudioEngine
+from app.core.theory import chord_to_asset_path, degree_to_chord, interchange_candidates
+from app.core.metrics import LatencyMetrics
+from app.core.sessions import format_sessions, resolve_user_id, sessions
+from app.core.update_scheduler import UpdateScheduler
 from app.services.history import HistoryService
-from app.services.persistence import PersistenceService
-from app.services.export import ExportService
+from app.services.jobs import Job, JobCancelled, JobRunner, shared_executor
 from app.ui.diatonic_grid import DiatonicGrid
 from app.ui.controls import KeyModeControls, OptionPanel
 from app.ui.history_bar import HistoryBar
+from app.ui.metrics_overlay import MetricsOverlay
 from datetime import datetime
 
-def main(page: ft.Page):
+# Time spent importing, since launch; reported by the process's first session
+IMPORTS_MS = (time.perf_counter() - LAUNCHED_AT) * 1000
+
+# Writes each session's startup report as JSON to this path when set
+STARTUP_REPORT_ENV = "DIATONIC_STARTUP_REPORT"
+
+_session_starts = itertools.count()
+
+async def main(page: ft.Page):
+    # The first session is the cold start and is timed from launch; later web
+    # sessions time their own startup
+    if next(_session_starts) == 0:
+        startup = StartupProfile(origin=LAUNCHED_AT, marks={"imports": IMPORTS_MS})
+    else:
+        startup = StartupProfile()
     page.title = "DiatonicPad MVP"
     page.window.width = 1024
     page.window.height = 600
     
-    audio_engine = AudioEngine(page)
+    # DIATONIC_METRICS=1 times every tap phase and shows the latency overlay
+    metrics = LatencyMetrics(enabled=bool(os.environ.get("DIATONIC_METRICS")))
+    # Every page update goes through the scheduler so rapid taps coalesce
+    scheduler = UpdateScheduler(page, metrics=metrics)
     history_service = HistoryService()
-    persistence_service = PersistenceService()
-    export_service = ExportService()
+    # Saving, loading and exporting run here so they never block pad input; the
+    # workers are shared by every session of the process
+    jobs = JobRunner(executor=shared_executor())
+    # Audio, playback and storage (with numpy/scipy/sqlite behind them) are
+    # built by init_subsystems after the first frame; handlers that need them
+    # wait for this
+    subsystems_ready = asyncio.Event()
+    init_failed = False
+    audio_engine = transport = persistence_service = export_service = None
     
     key_setting = KeySetting(tonic="C", mode="Ionian")
     current_progression = Progression(key_setting=key_setting)
     
-    def on_pad_click(degree_idx: int):
-        """Handle chord pad click"""
-        key_setting.tensions = option_panel.get_tensions()
-        
-        path = chord_to_asset_path(key_setting, degree_idx)
-        audio_engine.play_sample(path)
-        
-        chord_spec = degree_to_chord(key_setting, degree_idx)
-        event = ChordEvent(
-            degree=chord_spec["degree"],
-            quality=chord_spec["quality"],
-            tension=key_setting.tensions.copy(),
-            inversion=key_setting.inversion,
-            voicing=key_setting.voicing,
-        )
-        history_service.push_event(event)
-        current_progression.events = history_service.get_current_events()
+    # Taps already sounded, waiting to be recorded in arrival order
+    recorded_taps: asyncio.Queue = asyncio.Queue()
+    
+    async def on_pad_click(degree_idx: int):
+        """Handle chord pad click: sound first, then queue the history update"""
+        if not await subsystems_up():
+            return
+        with metrics.phase("tap_total"):
+            key_setting.tensions = option_panel.get_tensions()
+            
+            with metrics.phase("theory"):
+                path = chord_to_asset_path(key_setting, degree_idx)
+            audio_engine.play_sample(path)
         
-        update_status()
+        # The tension list is replaced on every tap, never mutated, so the snapshot can share it
+        recorded_taps.put_nowait((degree_idx, replace(key_setting)))
     
-    def on_key_change(new_key: str):
+    async def record_taps():
+        """Push queued taps onto the history in order, refreshing status once per batch"""
+        while True:
+            degree_idx, setting = await recorded_taps.get()
+            chord_spec = degree_to_chord(setting, degree_idx)
+            event = ChordEvent(
+                degree=chord_spec["degree"],
+                quality=chord_spec["quality"],
+                tension=setting.tensions,
+                inversion=setting.inversion,
+                voicing=setting.voicing,
+            )
+            history_service.push_event(event)
+            current_progression.events = history_service.get_current_events()
+            
+            if recorded_taps.empty():
+                update_status()
+    
+    async def on_key_change(new_key: str):
         key_setting.tonic = new_key
-        update_status()
+        refresh_key()
     
-    def on_mode_change(new_mode: str):
+    async def on_mode_change(new_mode: str):
         key_setting.mode = new_mode
-        update_status()
+        refresh_key()
     
-    def on_tension_change():
-        update_status()
+    async def on_tension_change():
+        key_setting.tensions = option_panel.get_tensions()
+        refresh_key()
     
-    def on_voicing_change(new_voicing: str):
+    async def on_voicing_change(new_voicing: str):
         key_setting.voicing = new_voicing
+        if subsystems_ready.is_set() and not init_failed:
+            audio_engine.warm(key_setting)
         update_status()
     
-    def on_undo():
+    async def on_undo():
         if history_service.undo():
             current_progression.events = history_service.get_current_events()
             update_status()
     
-    def on_redo():
+    async def on_redo():
         if history_service.redo():
             current_progression.events = history_service.get_current_events()
             update_status()
     
-    def on_save():
+    def show_job_progress(job: Job):
+        """Reflect a background job's progress (called from its worker thread)"""
+        history_bar.show_progress(job.name, job.progress)
+        scheduler.request()
+    
+    def notify(message: str):
+        page.snack_bar = ft.SnackBar(ft.Text(message))
+        page.snack_bar.open = True
+        scheduler.request()
+    
+    async def run_job(name: str, fn, *args):
+        """Run fn(job, *args) in the worker pool while the UI stays responsive"""
+        job = jobs.submit(name, fn, *args, on_progress=show_job_progress)
+        show_job_progress(job)
+        try:
+            return await job.wait()
+        except JobCancelled:
+            notify(f"{name} cancelled")
+            return None
+        finally:
+            if not jobs.active:
+                history_bar.hide_progress()
+                scheduler.request()
+    
+    async def on_save():
         """Save current progression"""
+        if not await subsystems_up():
+            return
         current_progression.name = f"Progression_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         current_progression.updated_at = datetime.now().isoformat()
         current_progression.key_setting = key_setting
-        persistence_service.save_progression(current_progression)
-        page.snack_bar = ft.SnackBar(ft.Text(f"Saved: {current_progression.name}"))
-        page.snack_bar.open = True
-        page.update()
+        # The history view is copy-on-write and the key setting is copied, so
+        # taps recorded while saving don't change what gets written
+        snapshot = replace(current_progression, key_setting=replace(
+            key_setting, tensions=key_setting.tensions.copy()))
+        
+        def save(job: Job, progression: Progression):
+            job.report(0.0)
+            # No report() after the commit, or a late cancel would hide a completed save
+            persistence_service.save_progression(progression)
+            return progression.name
+        
+        name = await run_job("Saving", save, snapshot)
+        if name is not None:
+            notify(f"Saved: {name}")
     
-    def on_load():
+    async def on_load():
         """Load progression (simplified - loads most recent)"""
-        progressions = persistence_service.list_progressions()
-        if progressions:
-            loaded = persistence_service.load_progression(progressions[-1]["id"])
+        if not await subsystems_up():
+            return
+        def load(job: Job):
+            recent = persistence_service.list_progression_summaries(limit=1, newest_first=True)
+            job.report(0.5)
+            return persistence_service.load_progression(recent[0]["id"]) if recent else None
+        
+        loaded = await run_job("Loading", load)
+        if loaded:
             key_setting.tonic = loaded.key_setting.tonic
             key_setting.mode = loaded.key_setting.mode
-            history_service.events = loaded.events
-            history_service.current_index = len(loaded.events) - 1
-            current_progression.events = loaded.events
+            key_setting.bpm = loaded.key_setting.bpm
+            history_service.load(loaded.events)
+            current_progression.events = history_service.get_current_events()
             
             key_mode_controls.key_dropdown.value = key_setting.tonic
             key_mode_controls.mode_dropdown.value = key_setting.mode
+            history_bar.bpm_slider.value = key_setting.bpm
             
-            page.snack_bar = ft.SnackBar(ft.Text(f"Loaded: {loaded.name}"))
-            page.snack_bar.open = True
-            update_status()
+            notify(f"Loaded: {loaded.name}")
+            refresh_key()
     
-    def on_export():
+    async def on_export():
         """Export progression to WAV"""
-        output_path = f"data/export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
-        if export_service.export_wav(current_progression, output_path):
-            page.snack_bar = ft.SnackBar(ft.Text(f"Exported: {output_path}"))
-            page.snack_bar.open = True
-            page.update()
+        if not await subsystems_up():
+            return
+        # Exports go next to the user's progressions
+        output_path = str(persistence_service.data_file.parent /
+                          f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav")
+        snapshot = replace(current_progression, key_setting=replace(
+            key_setting, tensions=key_setting.tensions.copy()))
+        
+        def export(job: Job, progression: Progression):
+            return export_service.export_wav(progression, output_path, progress=job.report)
+        
+        if await run_job("Exporting", export, snapshot):
+            notify(f"Exported: {output_path}")
+    
+    async def on_play():
+        """Start or stop playback of the current history at the key setting's BPM"""
+        if not await subsystems_up():
+            return
+        if transport.playing:
+            transport.stop()
+            history_bar.set_playing(False)
+        else:
+            playing = transport.play(current_progression.events, key_setting,
+                                     metronome=bool(history_bar.metronome.value),
+                                     on_finished=on_playback_finished)
+            history_bar.set_playing(playing)
+        scheduler.request()
+    
+    def on_playback_finished():
+        """Reset the transport button (called from the transport thread)"""
+        history_bar.set_playing(False)
+        scheduler.request()
+    
+    async def on_bpm_change(value: float):
+        key_setting.bpm = int(value)
+        update_status()
+    
+    async def on_cancel():
+        """Cancel running saves, loads and exports"""
+        jobs.cancel_all()
+    
+    def refresh_key():
+        """Warm the new key's samples and refresh the pads' borrowed chords"""
+        # Until startup finishes, init_subsystems picks up the latest key itself
+        if subsystems_ready.is_set() and not init_failed:
+            audio_engine.warm(key_setting)
+            diatonic_grid.set_interchange(interchange_candidates(key_setting))
+            scheduler.request()
+        update_status()
+    
+    async def subsystems_up() -> bool:
+        """Wait for init_subsystems; False if it failed"""
+        await subsystems_ready.wait()
+        return not init_failed
+    
+    async def init_subsystems():
+        """Import and build audio, playback and storage once the pads are on screen"""
+        nonlocal audio_engine, transport, persistence_service, export_service, init_failed
+        user_id = await resolve_user_id(page)
+        
+        def build():
+            with startup.phase("import_audio"):
+                from app.core.audio import AudioEngine, detect_output_rate
+                from app.core.shared import shared_assets
+                from app.core.transport import Transport
+            with startup.phase("audio_engine"):
+                # The bank, manifest and caches are built by the first session and shared
+                assets = shared_assets("assets", detect_output_rate(page))
+                engine = AudioEngine(page, metrics=metrics, scheduler=scheduler, shared=assets)
+            with startup.phase("import_export"):
+                from app.services.export import ExportService
+            with startup.phase("chord_index"):
+                interchange_candidates(key_setting)
+            playback, export = Transport(engine), ExportService()
+            # Acquired last, so a failed build holds no reference to the user's store
+            with startup.phase("persistence"):
+                from app.services.persistence import user_stores
+                persistence = user_stores.acquire(user_id)
+            return engine, playback, persistence, export
+        
+        try:
+            audio_engine, transport, persistence_service, export_service = \
+                await asyncio.to_thread(build)
+            sessions.register(page.session_id, user_id, audio_engine.shared)
+        except Exception as e:
+            init_failed = True
+            print(f"Error: audio and storage failed to start: {e}")
+            notify(f"Audio and storage failed to start: {e}")
+            return
+        finally:
+            # Also on failure, so handlers and on_close waiting for it don't hang
+            subsystems_ready.set()
+        refresh_key()
+        startup.finish()
+        if metrics.enabled:
+            print(startup.format())
+        if os.environ.get(STARTUP_REPORT_ENV):
+            startup.dump(os.environ[STARTUP_REPORT_ENV])
+    
+    async def on_close(e):
+        """Hand back this session's share of the process-wide resources"""
+        tap_recorder.cancel()
+        jobs.cancel_all()
+        await jobs.drain()
+        if not await subsystems_up():
+            return
+        from app.services.persistence import user_stores
+        
+        transport.stop()
+        audio_engine.close()
+        user_stores.release(persistence_service)
+        sessions.unregister(page.session_id)
+        if metrics.enabled:
+            print(format_sessions(sessions.stats()))
     
     def update_status():
-        """Update status text"""
-        tensions_str = ", ".join(map(str, option_panel.get_tensions())) if option_panel.get_tensions() else "none"
-        status_text.value = (f"Key: {key_setting.tonic} {key_setting.mode} | "
-                           f"Voicing: {key_setting.voicing} | "
-                           f"Tensions: {tensions_str} | "
-                           f"Events: {len(current_progression.events)}")
-        page.update()
+        """Update status text, sending it only if it changed"""
+        tensions = option_panel.get_tensions()
+        tensions_str = ", ".join(map(str, tensions)) if tensions else "none"
+        status = (f"Key: {key_setting.tonic} {key_setting.mode} | "
+                  f"BPM: {key_setting.bpm} | "
+                  f"Voicing: {key_setting.voicing} | "
+                  f"Tensions: {tensions_str} | "
+                  f"Events: {len(current_progression.events)}")
+        if metrics_overlay is not None and metrics_overlay.refresh():
+            scheduler.request()
+        scheduler.set_value(status_text, status)
     
     key_mode_controls = KeyModeControls(on_key_change, on_mode_change)
     diatonic_grid = DiatonicGrid(on_pad_click)
     option_panel = OptionPanel(on_tension_change, on_voicing_change)
-    history_bar = HistoryBar(on_undo, on_redo, on_save, on_load, on_export)
+    history_bar = HistoryBar(on_undo, on_redo, on_save, on_load, on_export, on_cancel,
+                             on_play=on_play, on_bpm_change=on_bpm_change, bpm=key_setting.bpm)
     status_text = ft.Text("Ready", size=12)
+    metrics_overlay = MetricsOverlay(metrics, sessions=sessions) if metrics.enabled else None
     
     page.add(
         ft.Container(
@@ -136,7 +344,7 @@ def main(page: ft.Page):
                     ft.Divider(),
                     history_bar,
                     status_text,
-                ],
+                ] + ([metrics_overlay] if metrics_overlay is not None else []),
                 spacing=20,
                 horizontal_alignment=ft.CrossAxisAlignment.CENTER,
             ),
@@ -144,7 +352,11 @@ def main(page: ft.Page):
         )
     )
     
+    page.on_close = on_close
+    startup.mark("first_frame")
     update_status()
+    page.run_task(init_subsystems)
+    tap_recorder = page.run_task(record_taps)
 
 if __name__ == "__main__":
     ft.app(main, assets_dir="assets")